@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la generación del PDF de contrato
+Compara el tiempo por contrato y la memoria pico de contract_pdf con la
+plantilla precompilada (lo que hace docusign_signature_manager en caliente)
+contra compilar la plantilla completa en cada contrato
+"""
+
+import argparse
+import base64
+import os
+import random
+import sys
+import time
+import tracemalloc
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda_functions'))
+
+import contract_pdf
+
+CONTRACT_TYPES = ['BASIC', 'STANDARD', 'PREMIUM', 'ENTERPRISE']
+NAMES = ['María López', 'José Pérez', 'Ana Torres', 'Luis Ramírez', 'Carmen Díaz']
+
+def generate_contracts(count, seed):
+    """Contratos sintéticos con los tipos que devuelve DynamoDB (Decimal)"""
+    rng = random.Random(seed)
+    contracts = []
+    for index in range(count):
+        vehicles = rng.randint(1, 500)
+        fee = Decimal(rng.choice(['15.00', '25.50', '39.90']))
+        months = rng.choice([12, 24, 36])
+        contracts.append({
+            'contract_id': f"CTR-{index:06d}",
+            'customer_name': rng.choice(NAMES),
+            'customer_email': f"cliente{index}@example.com",
+            'company_name': f"Transportes {index} S.A.C.",
+            'contract_type': rng.choice(CONTRACT_TYPES),
+            'vehicle_count': Decimal(vehicles),
+            'monthly_fee': fee,
+            'contract_duration_months': Decimal(months),
+            'total_contract_value': fee * vehicles * months
+        })
+    return contracts
+
+def render_from_scratch(contract_data):
+    """Sin caché: todo el documento se serializa para cada contrato"""
+    return contract_pdf.ContractPdfTemplate().render_base64(contract_data)
+
+def render_cached(contract_data):
+    return contract_pdf.CONTRACT_TEMPLATE.render_base64(contract_data)
+
+def measure(render, contracts):
+    """(ms por contrato, memoria pico en KiB) sobre todos los contratos"""
+    start = time.perf_counter()
+    for contract in contracts:
+        render(contract)
+    elapsed_ms = (time.perf_counter() - start) * 1000 / len(contracts)
+
+    tracemalloc.start()
+    for contract in contracts[:100]:
+        render(contract)
+    peak_kib = tracemalloc.get_traced_memory()[1] / 1024
+    tracemalloc.stop()
+
+    return elapsed_ms, peak_kib
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de la generación del PDF de contrato')
+    parser.add_argument('--contracts', type=int, default=5000, help='Número de contratos sintéticos')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"📄 Generando {args.contracts:,} contratos sintéticos...")
+    contracts = generate_contracts(args.contracts, args.seed)
+
+    sample = base64.b64decode(render_cached(contracts[0]))
+    assert sample.startswith(b'%PDF-') and sample.rstrip().endswith(b'%%EOF'), "PDF inválido"
+    assert render_cached(contracts[0]) == render_from_scratch(contracts[0]), "Las salidas difieren"
+
+    scratch_ms, scratch_kib = measure(render_from_scratch, contracts)
+    cached_ms, cached_kib = measure(render_cached, contracts)
+
+    print(f"\n📋 PDF de {len(sample):,} bytes por contrato")
+    print(f"   Plantilla por contrato:  {scratch_ms * 1000:8.1f} µs/contrato   pico {scratch_kib:8.1f} KiB")
+    print(f"   Plantilla precompilada:  {cached_ms * 1000:8.1f} µs/contrato   pico {cached_kib:8.1f} KiB")
+    print(f"   Aceleración:             {scratch_ms / max(cached_ms, 1e-9):8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark del índice geoespacial por celdas geohash
+Compara búsquedas por radio y bounding box contra un escaneo completo
+usando posiciones simuladas (por defecto 100k vehículos alrededor de Lima)
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda_functions'))
+
+import geo_index
+
+def generate_positions(count, center_lat, center_lng, spread_deg, seed):
+    """Generar posiciones aleatorias alrededor de un centro"""
+    rng = random.Random(seed)
+    return [
+        (f"VH{i:06d}",
+         center_lat + rng.uniform(-spread_deg, spread_deg),
+         center_lng + rng.uniform(-spread_deg, spread_deg))
+        for i in range(count)
+    ]
+
+def build_index(positions):
+    """Simular la tabla vehicle-geo-index en memoria (celda -> entradas)"""
+    index = defaultdict(list)
+    for vehicle_id, lat, lng in positions:
+        index[geo_index.encode(lat, lng)].append((vehicle_id, lat, lng))
+    return index
+
+def radius_scan(positions, lat, lng, radius_m):
+    return [p for p in positions if geo_index.haversine_m(lat, lng, p[1], p[2]) <= radius_m]
+
+def radius_indexed(index, lat, lng, radius_m):
+    cells = geo_index.cells_for_radius(lat, lng, radius_m)
+    candidates = [entry for cell in cells for entry in index.get(cell, ())]
+    matches = [p for p in candidates if geo_index.haversine_m(lat, lng, p[1], p[2]) <= radius_m]
+    return matches, len(cells), len(candidates)
+
+def bbox_scan(positions, bbox):
+    return [p for p in positions if geo_index.in_bbox(p[1], p[2], *bbox)]
+
+def bbox_indexed(index, bbox):
+    cells = geo_index.cells_for_bbox(*bbox)
+    candidates = [entry for cell in cells for entry in index.get(cell, ())]
+    matches = [p for p in candidates if geo_index.in_bbox(p[1], p[2], *bbox)]
+    return matches, len(cells), len(candidates)
+
+def timed(func, *args, repeat=5):
+    """Ejecutar varias veces y devolver (resultado, ms promedio)"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func(*args)
+    return result, (time.perf_counter() - start) * 1000 / repeat
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del índice geoespacial')
+    parser.add_argument('--vehicles', type=int, default=100000, help='Número de posiciones simuladas')
+    parser.add_argument('--spread', type=float, default=1.0, help='Dispersión en grados alrededor del centro')
+    parser.add_argument('--radius', type=float, default=5000, help='Radio de búsqueda en metros')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    center_lat, center_lng = -12.0464, -77.0428
+
+    print(f"📍 Generando {args.vehicles:,} posiciones simuladas...")
+    positions = generate_positions(args.vehicles, center_lat, center_lng, args.spread, args.seed)
+
+    start = time.perf_counter()
+    index = build_index(positions)
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"🗂️  Índice construido en {build_ms:.1f} ms ({len(index):,} celdas, precisión {geo_index.GEO_INDEX_PRECISION})")
+
+    # Búsqueda por radio (despacho de emergencia)
+    scan_result, scan_ms = timed(radius_scan, positions, center_lat, center_lng, args.radius)
+    (idx_result, cells, candidates), idx_ms = timed(radius_indexed, index, center_lat, center_lng, args.radius)
+    assert sorted(scan_result) == sorted(idx_result), "El índice devolvió resultados distintos al escaneo"
+
+    print(f"\n🚨 Radio {args.radius:.0f} m: {len(idx_result):,} vehículos")
+    print(f"   Escaneo completo: {scan_ms:8.2f} ms  ({len(positions):,} posiciones evaluadas)")
+    print(f"   Índice geohash:   {idx_ms:8.2f} ms  ({cells} celdas, {candidates:,} candidatos)")
+    print(f"   Aceleración:      {scan_ms / max(idx_ms, 1e-6):8.1f}x")
+
+    # Búsqueda por viewport del mapa
+    bbox = (center_lat - 0.1, center_lng - 0.15, center_lat + 0.1, center_lng + 0.15)
+    scan_result, scan_ms = timed(bbox_scan, positions, bbox)
+    (idx_result, cells, candidates), idx_ms = timed(bbox_indexed, index, bbox)
+    assert sorted(scan_result) == sorted(idx_result), "El índice devolvió resultados distintos al escaneo"
+
+    print(f"\n🗺️  Viewport {bbox}: {len(idx_result):,} vehículos")
+    print(f"   Escaneo completo: {scan_ms:8.2f} ms  ({len(positions):,} posiciones evaluadas)")
+    print(f"   Índice geohash:   {idx_ms:8.2f} ms  ({cells} celdas, {candidates:,} candidatos)")
+    print(f"   Aceleración:      {scan_ms / max(idx_ms, 1e-6):8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Benchmark de latencia del procesamiento de pánico
+Mide el tiempo hasta la notificación y el tiempo total de panic_processor
+contra sustitutos locales de SNS y DynamoDB con latencias simuladas, y lo
+compara con el flujo en serie anterior (log del evento completo, mensaje con
+indent=2, publicación, auditoría y luego búsqueda de vehículos cercanos)
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from collections import defaultdict
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('SNS_TOPIC_ARN', 'arn:aws:sns:us-east-1:000000000000:panic-alerts')
+os.environ.setdefault('ENVIRONMENT', 'bench')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda_functions'))
+
+import geo_index
+import panic_processor
+
+class LocalSns:
+    """SNS simulado: duerme la latencia configurada y registra cuándo se notificó"""
+
+    def __init__(self, latency_ms):
+        self.latency_s = latency_ms / 1000
+        self.notified_at = None
+        self._lock = threading.Lock()
+        self._count = 0
+
+    def publish(self, **kwargs):
+        time.sleep(self.latency_s)
+        with self._lock:
+            self._count += 1
+            self.notified_at = time.perf_counter()
+            return {'MessageId': f"msg-{self._count}"}
+
+class LocalTable:
+    def __init__(self, latency_ms):
+        self.latency_s = latency_ms / 1000
+
+    def put_item(self, **kwargs):
+        time.sleep(self.latency_s)
+
+    def update_item(self, **kwargs):
+        time.sleep(self.latency_s)
+
+class LocalClient:
+    """Consultas por celda sobre un vehicle-geo-index en memoria"""
+
+    def __init__(self, cells, latency_ms):
+        self.cells = cells
+        self.latency_s = latency_ms / 1000
+
+    def query(self, **kwargs):
+        time.sleep(self.latency_s)
+        return {'Items': self.cells.get(kwargs['ExpressionAttributeValues'][':cell'], [])}
+
+class LocalDynamoDB:
+    def __init__(self, cells, write_latency_ms, query_latency_ms):
+        self._table = LocalTable(write_latency_ms)
+        self.meta = type('Meta', (), {'client': LocalClient(cells, query_latency_ms)})()
+
+    def Table(self, name):
+        return self._table
+
+def build_geo_cells(count, center_lat, center_lng, spread_deg, seed):
+    """Posiciones simuladas agrupadas por celda, como la tabla vehicle-geo-index"""
+    rng = random.Random(seed)
+    cells = defaultdict(list)
+    now_ms = time.time() * 1000
+    for index in range(count):
+        lat = center_lat + rng.uniform(-spread_deg, spread_deg)
+        lng = center_lng + rng.uniform(-spread_deg, spread_deg)
+        cells[geo_index.encode(lat, lng)].append({'vehicle_id': f"VH{index:06d}", 'lat': lat, 'lng': lng,
+                                                  'timestamp': now_ms})
+    return cells
+
+def serial_handler(event, sns, dynamodb):
+    """Flujo anterior: cada etapa espera a la previa"""
+    logging.getLogger().info(f"Procesando evento de pánico: {json.dumps(event)}")
+    location = event['location']
+    alert_message = {
+        "alert_type": "PANIC_BUTTON",
+        "vehicle_id": event['vehicle_id'],
+        "timestamp": event['timestamp'],
+        "location": {"latitude": location['lat'], "longitude": location['lng'],
+                     "address": location.get('address', 'Dirección no disponible')},
+        "panic_type": event.get('panic_type', 'EMERGENCY'),
+        "driver": event.get('driver_info', {}),
+        "priority": "CRITICAL",
+        "requires_immediate_response": True
+    }
+    sns_response = sns.publish(Message=json.dumps(alert_message, indent=2))
+    dynamodb.Table('panic-events').put_item(Item={'alert_data': alert_message,
+                                                  'sns_message_id': sns_response['MessageId']})
+    # La búsqueda de cercanos, si existiera, iría después y celda por celda
+    for cell in geo_index.cells_for_radius(location['lat'], location['lng'], panic_processor.NEARBY_RADIUS_M):
+        dynamodb.meta.client.query(ExpressionAttributeValues={':cell': cell})
+
+def panic_event(index, rng, center_lat, center_lng, spread_deg):
+    return {
+        'vehicle_id': f"VH{index:06d}",
+        'timestamp': '2024-05-01T12:00:00Z',
+        'panic_type': 'EMERGENCY',
+        'location': {
+            'lat': center_lat + rng.uniform(-spread_deg, spread_deg),
+            'lng': center_lng + rng.uniform(-spread_deg, spread_deg),
+            'address': 'Av. Javier Prado Este 123, Lima'
+        },
+        'driver_info': {'name': 'José Pérez', 'license': 'Q12345678'}
+    }
+
+def measure(run, sns, events):
+    """Percentiles (p50, p99) en ms del tiempo hasta notificar y del tiempo total"""
+    notify_ms, total_ms = [], []
+    for event in events:
+        start = time.perf_counter()
+        run(event)
+        end = time.perf_counter()
+        notify_ms.append((sns.notified_at - start) * 1000)
+        total_ms.append((end - start) * 1000)
+
+    def percentiles(values):
+        ordered = sorted(values)
+        return statistics.median(ordered), ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+
+    return percentiles(notify_ms), percentiles(total_ms)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de latencia del procesamiento de pánico')
+    parser.add_argument('--alerts', type=int, default=50, help='Alertas a procesar por variante')
+    parser.add_argument('--vehicles', type=int, default=20000, help='Vehículos en el índice geoespacial')
+    parser.add_argument('--sns-ms', type=float, default=25.0, help='Latencia simulada de SNS Publish')
+    parser.add_argument('--write-ms', type=float, default=8.0, help='Latencia simulada de PutItem/UpdateItem')
+    parser.add_argument('--query-ms', type=float, default=6.0, help='Latencia simulada de Query por celda')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    # Alrededor de Lima, como geo_index_benchmark
+    center_lat, center_lng, spread_deg = -12.0464, -77.0428, 0.3
+    logging.getLogger().setLevel(logging.WARNING)
+
+    cells = build_geo_cells(args.vehicles, center_lat, center_lng, spread_deg, args.seed)
+    rng = random.Random(args.seed)
+    events = [panic_event(index, rng, center_lat, center_lng, spread_deg) for index in range(args.alerts)]
+
+    sns = LocalSns(args.sns_ms)
+    dynamodb = LocalDynamoDB(cells, args.write_ms, args.query_ms)
+    panic_processor.sns = sns
+    panic_processor.dynamodb = dynamodb
+
+    sample = json.loads(panic_processor.handler(events[0], None)['body'])
+    assert 'sns_message_id' in sample, sample
+    print(f"🚨 {args.alerts} alertas, {args.vehicles:,} vehículos en {len(cells):,} celdas, "
+          f"{len(sample['nearby_vehicles'])} cercanos en la primera alerta")
+
+    (serial_notify, serial_total) = measure(lambda event: serial_handler(event, sns, dynamodb), sns, events)
+    (fast_notify, fast_total) = measure(lambda event: panic_processor.handler(event, None), sns, events)
+
+    print(f"\n⏱️  Latencias simuladas: SNS {args.sns_ms} ms, escritura {args.write_ms} ms, query {args.query_ms} ms")
+    print(f"   {'':22} {'notificar p50':>14} {'p99':>8} {'total p50':>11} {'p99':>8}")
+    print(f"   {'En serie (anterior)':22} {serial_notify[0]:11.1f} ms {serial_notify[1]:5.1f} ms "
+          f"{serial_total[0]:8.1f} ms {serial_total[1]:5.1f} ms")
+    print(f"   {'Concurrente':22} {fast_notify[0]:11.1f} ms {fast_notify[1]:5.1f} ms "
+          f"{fast_total[0]:8.1f} ms {fast_total[1]:5.1f} ms")
+    print(f"   Tiempos por etapa (primera alerta): {json.dumps(sample['timings_ms'])}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Benchmark del motor de riesgo de contratos
+Compara la evaluación contrato por contrato con la evaluación por lotes de
+risk_engine (NumPy) sobre contratos sintéticos con los tipos de DynamoDB,
+como hace la re-evaluación de la cartera de contract_validator
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda_functions'))
+
+import risk_engine
+
+def generate_features(count, seed):
+    """(vehículos, valor total, duración) como Decimal, igual que un scan de DynamoDB"""
+    rng = random.Random(seed)
+    vehicle_counts, total_values, durations = [], [], []
+    for _ in range(count):
+        vehicles = rng.randint(1, 500)
+        months = rng.choice([6, 12, 24, 36, 48, 60])
+        fee = Decimal(rng.choice(['15.00', '25.50', '39.90']))
+        vehicle_counts.append(Decimal(vehicles))
+        durations.append(Decimal(months))
+        total_values.append(fee * vehicles * months)
+    return vehicle_counts, total_values, durations
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del motor de riesgo de contratos')
+    parser.add_argument('--contracts', type=int, default=500000, help='Número de contratos sintéticos')
+    parser.add_argument('--page-size', type=int, default=5000, help='Contratos por página del scan')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    if risk_engine.np is None:
+        print("⚠️  NumPy no está instalado: el lote se evalúa contrato por contrato")
+
+    print(f"⚖️  Generando {args.contracts:,} contratos sintéticos...")
+    vehicle_counts, total_values, durations = generate_features(args.contracts, args.seed)
+    engine = risk_engine.RiskEngine()
+
+    start = time.perf_counter()
+    scalar_levels = [engine.level(*values) for values in zip(vehicle_counts, total_values, durations)]
+    scalar_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch_levels = []
+    for offset in range(0, args.contracts, args.page_size):
+        page = slice(offset, offset + args.page_size)
+        batch_levels += engine.levels(vehicle_counts[page], total_values[page], durations[page])
+    batch_seconds = time.perf_counter() - start
+
+    assert batch_levels == scalar_levels, "Los niveles difieren"
+
+    print("\n📋 Niveles: " + ', '.join(f"{label} {batch_levels.count(label):,}" for label in engine.labels))
+    print(f"   Contrato por contrato:  {args.contracts / scalar_seconds * 60:14,.0f} contratos/min")
+    print(f"   Por lotes (páginas):    {args.contracts / batch_seconds * 60:14,.0f} contratos/min")
+    print(f"   Aceleración:            {scalar_seconds / max(batch_seconds, 1e-9):14.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark del post-procesamiento de DetectText
+Compara la clasificación original (regex recompiladas por línea y búsqueda
+lineal de palabras clave) contra text_analysis (patrón combinado compilado
+una vez y conjunto de palabras clave) sobre salidas OCR sintéticas
+"""
+
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda_functions'))
+
+import text_analysis
+
+def legacy_is_license_plate_pattern(text):
+    """Implementación anterior de rekognition_processor"""
+    import re
+
+    patterns = [
+        r'^[A-Z]{3}-\d{3}$',
+        r'^\d{3}-[A-Z]{3}$',
+        r'^[A-Z]{2}\d{4}$',
+        r'^\d{3}[A-Z]{3}$'
+    ]
+
+    for pattern in patterns:
+        if re.match(pattern, text.upper()):
+            return True
+
+    return False
+
+def legacy_classify(text_detections):
+    text_analysis_result = {'license_plates': [], 'traffic_signs': [], 'other_text': []}
+    for text_detection in text_detections:
+        if text_detection['Type'] == 'LINE':
+            detected_text = text_detection['DetectedText']
+            if legacy_is_license_plate_pattern(detected_text):
+                text_analysis_result['license_plates'].append(detected_text)
+            elif any(keyword in detected_text.upper() for keyword in ['STOP', 'SPEED', 'LIMIT', 'YIELD', 'NO']):
+                text_analysis_result['traffic_signs'].append(detected_text)
+            else:
+                text_analysis_result['other_text'].append(detected_text)
+    return text_analysis_result
+
+def random_plate(rng):
+    letters = ''.join(rng.choices(string.ascii_uppercase, k=3))
+    digits = ''.join(rng.choices(string.digits, k=3))
+    return rng.choice([f"{letters}-{digits}", f"{digits}-{letters}", f"{letters[:2]}{digits}{rng.choice(string.digits)}",
+                       f"{digits}{letters}"])
+
+SIGN_LINES = ['STOP', 'SPEED LIMIT 60', 'YIELD', 'NO PARKING', 'NO U TURN', 'LIMIT 40']
+OTHER_WORDS = ['AV', 'JAVIER', 'PRADO', 'FARMACIA', 'BANCO', 'SALIDA', 'LIMA', 'CENTRO', 'KM', 'PEAJE', 'GRIFO', 'NORTE', 'CAMINO']
+
+def generate_detections(count, seed):
+    """Generar detecciones LINE/WORD con placas, señales y texto libre"""
+    rng = random.Random(seed)
+    detections = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.2:
+            text = random_plate(rng)
+        elif roll < 0.4:
+            text = rng.choice(SIGN_LINES)
+        else:
+            text = ' '.join(rng.choices(OTHER_WORDS, k=rng.randint(1, 4)))
+        detections.append({
+            'Type': 'LINE' if rng.random() < 0.5 else 'WORD',
+            'DetectedText': text,
+            'Confidence': rng.uniform(70, 99),
+            'Geometry': {'BoundingBox': {'Width': 0.1, 'Height': 0.05, 'Left': 0.4, 'Top': 0.6}}
+        })
+    return detections
+
+def timed(func, *args, repeat=5):
+    """Ejecutar varias veces y devolver (resultado, ms promedio)"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func(*args)
+    return result, (time.perf_counter() - start) * 1000 / repeat
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del post-procesamiento de DetectText')
+    parser.add_argument('--detections', type=int, default=200000, help='Número de detecciones sintéticas')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"🔤 Generando {args.detections:,} detecciones OCR sintéticas...")
+    detections = generate_detections(args.detections, args.seed)
+
+    legacy_result, legacy_ms = timed(legacy_classify, detections)
+    new_result, new_ms = timed(text_analysis.classify_text_detections, detections)
+
+    new_plates = [item['text'] for item in new_result['license_plates']]
+    assert new_plates == legacy_result['license_plates'], "Las placas detectadas difieren"
+
+    lines = sum(1 for detection in detections if detection['Type'] == 'LINE')
+    print(f"\n📋 {lines:,} líneas: {len(new_plates):,} placas, "
+          f"{len(new_result['traffic_signs']):,} señales, {len(new_result['other_text']):,} otros")
+    print(f"   Original (regex por línea): {legacy_ms:8.2f} ms")
+    print(f"   Patrón combinado + set:     {new_ms:8.2f} ms")
+    print(f"   Aceleración:                {legacy_ms / max(new_ms, 1e-6):8.1f}x")
+
+    # La búsqueda por palabra evita falsos positivos por subcadena ("NO" en "NORTE")
+    legacy_signs = len(legacy_result['traffic_signs'])
+    print(f"   Señales (original / nuevo): {legacy_signs:,} / {len(new_result['traffic_signs']):,}")
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,10 @@ Simula el envío de datos de telemetría, video y alertas de pánico
 """
 
 import json
+import os
+import queue
 import time
+import urllib.request
 import random
 import ssl
 import paho.mqtt.client as mqtt
@@ -27,6 +30,9 @@ class VehicleSimulator:
         self.engine_temp = 70
         self.is_moving = False
         
+        # Respuestas de video_upload_manager
+        self.upload_responses = queue.Queue()
+        
         # Cliente MQTT
         self.client = mqtt.Client(client_id=f"vehicle-{vehicle_id}")
         self.setup_mqtt()
@@ -53,12 +59,17 @@ class VehicleSimulator:
             print(f"✅ Vehículo {self.vehicle_id} conectado exitosamente")
             # Suscribirse a comandos
             client.subscribe(f"vehicles/{self.vehicle_id}/commands")
+            client.subscribe(f"vehicles/{self.vehicle_id}/video/upload/response", qos=1)
         else:
             print(f"❌ Error de conexión: {rc}")
     
     def on_message(self, client, userdata, msg):
         """Procesar comandos recibidos"""
         try:
+            if msg.topic.endswith('/video/upload/response'):
+                self.upload_responses.put(json.loads(msg.payload.decode()))
+                return
+            
             command = json.loads(msg.payload.decode())
             print(f"📨 Comando recibido: {command}")
             self.process_command(command)
@@ -185,6 +196,73 @@ class VehicleSimulator:
         self.client.publish(topic, json.dumps(video_data))
         print(f"📹 Video data enviado: {video_type}")
     
+    def request_upload(self, action, timeout=30, **fields):
+        """Enviar una acción de subida y esperar la respuesta del backend"""
+        request_id = f"{action}-{time.time_ns()}"
+        message = {'action': action, 'request_id': request_id, **fields}
+        self.client.publish(f"vehicles/{self.vehicle_id}/video/upload", json.dumps(message), qos=1)
+        
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                response = self.upload_responses.get(timeout=max(0.1, deadline - time.time()))
+            except queue.Empty:
+                break
+            if response.get('request_id') == request_id:
+                return response
+        raise TimeoutError(f"Sin respuesta para {action}")
+    
+    def upload_video_clip(self, file_path, video_type="EVENT", event_type="UNKNOWN", max_rounds=10):
+        """
+        Subir un clip con URLs prefirmadas multipart (en vez de base64 por MQTT).
+        Ante un corte se pide 'resume' y solo se reenvían las partes faltantes.
+        """
+        size_bytes = os.path.getsize(file_path)
+        upload = self.request_upload(
+            'start',
+            video_type=video_type,
+            event_type=event_type,
+            timestamp=datetime.utcnow().isoformat() + "Z",
+            size_bytes=size_bytes
+        )
+        if upload['status'] != 'STARTED':
+            raise RuntimeError(f"No se pudo iniciar la subida: {upload.get('error')}")
+        
+        reference = {
+            'upload_id': upload['upload_id'],
+            's3_key': upload['s3_key'],
+            'total_parts': upload['total_parts']
+        }
+        part_size = upload['part_size']
+        parts = upload['parts']
+        print(f"📤 Subiendo {size_bytes:,} bytes en {upload['total_parts']} partes → {upload['s3_key']}")
+        
+        with open(file_path, 'rb') as clip:
+            for _ in range(max_rounds):
+                for part in parts:
+                    clip.seek((part['part_number'] - 1) * part_size)
+                    chunk = clip.read(part_size)
+                    try:
+                        request = urllib.request.Request(part['url'], data=chunk, method='PUT')
+                        urllib.request.urlopen(request, timeout=60).close()
+                    except Exception as e:
+                        # Se reintenta en la siguiente ronda vía resume
+                        print(f"⚠️  Parte {part['part_number']} falló: {e}")
+                
+                result = self.request_upload('complete', **reference)
+                if result['status'] == 'COMPLETED':
+                    print(f"✅ Video subido: {result['s3_location']}")
+                    return result
+                if result['status'] == 'ERROR':
+                    raise RuntimeError(result.get('error'))
+                
+                # INCOMPLETE: la respuesta trae URLs nuevas para las partes faltantes
+                print(f"🔁 Retomando subida: faltan {result['missing_parts']} partes")
+                parts = result['parts']
+        
+        self.request_upload('abort', **reference)
+        raise RuntimeError("Subida abortada tras demasiados reintentos")
+    
     def send_diagnostics(self):
         """Enviar datos de diagnóstico del vehículo"""
         diagnostics = {
@@ -285,6 +363,7 @@ def main():
     parser.add_argument('--key', required=True, help='Archivo de clave privada')
     parser.add_argument('--ca', required=True, help='Archivo CA')
     parser.add_argument('--duration', type=int, default=60, help='Duración en minutos')
+    parser.add_argument('--upload-clip', help='Subir un clip MP4 con URLs prefirmadas y salir')
     
     args = parser.parse_args()
     
@@ -301,6 +380,10 @@ def main():
         # Esperar conexión
         time.sleep(2)
         
+        if args.upload_clip:
+            simulator.upload_video_clip(args.upload_clip)
+            return
+        
         # Ejecutar simulación
         simulator.simulate_journey(args.duration)
         
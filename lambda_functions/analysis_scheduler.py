@@ -0,0 +1,96 @@
+"""
+Context-aware scheduling of Rekognition analyses per frame.
+
+Decides which analyses (driver_behavior/faces, labels, text) are worth
+running for a frame from the vehicle's latest telemetry, its recent alerts
+and when each analysis last ran. Emergency frames always get every
+analysis. Bundled with rekognition_processor.
+"""
+
+ANALYSES = ('driver_behavior', 'labels', 'text')
+
+# Minimum seconds between two runs of the same analysis for one vehicle
+DEFAULT_MIN_INTERVALS = {
+    'driver_behavior': 60,
+    'labels': 30,
+    'text': 120
+}
+
+# Parked vehicles only get an occasional label pass (intrusion, fire)
+PARKED_LABELS_INTERVAL = 600
+
+# Telemetry older than this means the vehicle is treated as parked
+STALE_TELEMETRY_SECONDS = 600
+
+MOVING_SPEED_KMH = 5.0
+
+# Recent non-critical alerts halve the intervals for closer monitoring
+RECENT_ALERT_INTERVAL_FACTOR = 0.5
+
+class AnalysisPlan:
+    """
+    Analyses to run for one frame and why
+    """
+
+    __slots__ = ('analyses', 'reason', 'emergency')
+
+    def __init__(self, analyses, reason, emergency=False):
+        self.analyses = tuple(analyses)
+        self.reason = reason
+        self.emergency = emergency
+
+    def __bool__(self):
+        return bool(self.analyses)
+
+    @property
+    def skipped(self):
+        return tuple(name for name in ANALYSES if name not in self.analyses)
+
+class AnalysisScheduler:
+    """
+    Policy engine: frame context in, AnalysisPlan out
+    """
+
+    def __init__(self, min_intervals=None):
+        self.min_intervals = dict(DEFAULT_MIN_INTERVALS)
+        self.min_intervals.update(min_intervals or {})
+
+    def plan(self, now, latest_state, last_runs, recent_alerts=(), emergency=False):
+        """
+        now: epoch seconds; latest_state: vehicle-latest item (or None);
+        last_runs: {analysis: epoch seconds}; recent_alerts: severities of recent alerts
+        """
+        if emergency or 'critical' in recent_alerts:
+            # Panic/emergency path is never throttled
+            return AnalysisPlan(ANALYSES, 'emergency', emergency=True)
+
+        if self._is_parked(now, latest_state):
+            if self._due('labels', now, last_runs, PARKED_LABELS_INTERVAL):
+                return AnalysisPlan(('labels',), 'parked')
+            return AnalysisPlan((), 'parked')
+
+        factor = RECENT_ALERT_INTERVAL_FACTOR if recent_alerts else 1.0
+        due = [
+            name for name in ANALYSES
+            if self._due(name, now, last_runs, self.min_intervals[name] * factor)
+        ]
+        return AnalysisPlan(due, 'recent_alerts' if recent_alerts else 'moving')
+
+    def _is_parked(self, now, latest_state):
+        if not latest_state:
+            # No telemetry: do not assume parked, analyze on intervals
+            return False
+
+        last_seen = latest_state.get('timestamp')
+        if last_seen is not None and now - float(last_seen) / 1000.0 > STALE_TELEMETRY_SECONDS:
+            return True
+
+        if latest_state.get('ignition') is False:
+            return True
+
+        return float(latest_state.get('speed') or 0) < MOVING_SPEED_KMH
+
+    @staticmethod
+    def _due(name, now, last_runs, interval):
+        last_run = last_runs.get(name)
+        return last_run is None or now - float(last_run) >= interval
@@ -0,0 +1,186 @@
+"""
+Carga de trabajo de los aprobadores: aprobaciones pendientes por manager.
+
+Cada aprobador tiene un contador pending_count en la tabla de carga. El
+contador cambia en la misma transacción que crea o resuelve la aprobación,
+así que nunca queda desfasado del estado real. La asignación lee todos los
+contadores con un solo BatchGetItem y elige al manager con menos pendientes;
+el límite de pendientes se vuelve a verificar dentro de la transacción, de
+modo que dos solicitudes simultáneas no pueden superarlo. Se incluye con
+request_manager_approval y contract_management_api.
+"""
+
+import logging
+import os
+
+from boto3.dynamodb.conditions import Key
+
+logger = logging.getLogger()
+
+MAX_PENDING_APPROVALS = int(os.environ.get('MAX_PENDING_APPROVALS', 5))
+BATCH_GET_MAX_KEYS = 100
+
+class ApprovalNotPending(Exception):
+    """La aprobación ya fue resuelta (o no existe) cuando se intentó cambiar su estado"""
+
+class ApproverWorkload:
+    """
+    Contadores de pendientes por aprobador y transacciones que los mantienen
+    """
+
+    def __init__(self, dynamodb, workload_table_name, approvals_table_name,
+                 max_pending=MAX_PENDING_APPROVALS):
+        self._dynamodb = dynamodb
+        self._client = dynamodb.meta.client
+        self._workload_table_name = workload_table_name
+        self._approvals_table_name = approvals_table_name
+        self._max_pending = max_pending
+
+    def pending_counts(self, approver_ids):
+        """
+        {approver_id: pendientes} con un BatchGetItem por cada 100 aprobadores
+        """
+        counts = {approver_id: 0 for approver_id in approver_ids}
+        approver_ids = list(counts)
+
+        for start in range(0, len(approver_ids), BATCH_GET_MAX_KEYS):
+            request = {
+                self._workload_table_name: {
+                    'Keys': [{'approver_id': approver_id}
+                             for approver_id in approver_ids[start:start + BATCH_GET_MAX_KEYS]],
+                    'ProjectionExpression': 'approver_id, pending_count'
+                }
+            }
+            while request:
+                response = self._dynamodb.batch_get_item(RequestItems=request)
+                for item in response.get('Responses', {}).get(self._workload_table_name, []):
+                    # Aprobaciones resueltas antes de existir el contador pueden dejarlo negativo
+                    counts[item['approver_id']] = max(0, int(item.get('pending_count', 0)))
+                request = response.get('UnprocessedKeys')
+
+        return counts
+
+    def least_loaded(self, managers):
+        """
+        Managers con cupo, del menos al más cargado (el orden original desempata)
+        """
+        counts = self.pending_counts([manager['user_id'] for manager in managers])
+        available = [dict(manager, pending_approvals=counts[manager['user_id']])
+                     for manager in managers if counts[manager['user_id']] < self._max_pending]
+        available.sort(key=lambda manager: manager['pending_approvals'])
+        return available
+
+    def assign(self, managers, approval_item):
+        """
+        Crear la aprobación asignada al manager menos cargado con cupo.
+        Devuelve el manager asignado, o None si todos están en el límite.
+        """
+        for manager in self.least_loaded(managers):
+            item = dict(approval_item,
+                        approver_id=manager['user_id'],
+                        approver_name=manager['name'],
+                        approver_email=manager['email'])
+            try:
+                self._client.transact_write_items(TransactItems=[
+                    {
+                        'Put': {
+                            'TableName': self._approvals_table_name,
+                            'Item': item,
+                            'ConditionExpression': 'attribute_not_exists(approval_id)'
+                        }
+                    },
+                    self._counter_update(manager['user_id'], 1, enforce_limit=True)
+                ])
+                approval_item.update(item)
+                return manager
+
+            except self._client.exceptions.TransactionCanceledException as e:
+                if not self._limit_reached(e):
+                    raise
+                # Otra solicitud ocupó el último cupo entre la lectura y la escritura
+                logger.info(f"Manager {manager['user_id']} alcanzó el límite de pendientes; probando el siguiente")
+
+        return None
+
+    def resolve(self, approval, approval_update, extra_items=()):
+        """
+        Cambiar el estado de una aprobación PENDING y descontarla de su aprobador.
+
+        approval_update es el Update de la aprobación sin Key ni TableName; la
+        condición de que siga PENDING se agrega aquí. extra_items se escriben en
+        la misma transacción (p. ej. el estado del contrato). Lanza
+        ApprovalNotPending si la aprobación ya no estaba pendiente.
+        """
+        update = dict(approval_update,
+                      TableName=self._approvals_table_name,
+                      Key={'approval_id': approval['approval_id']},
+                      ConditionExpression='#status = :pending')
+        update['ExpressionAttributeNames'] = dict(update.get('ExpressionAttributeNames', {}), **{'#status': 'status'})
+        update['ExpressionAttributeValues'] = dict(update.get('ExpressionAttributeValues', {}), **{':pending': 'PENDING'})
+
+        try:
+            self._client.transact_write_items(TransactItems=[
+                {'Update': update},
+                self._counter_update(approval['approver_id'], -1),
+                *extra_items
+            ])
+        except self._client.exceptions.TransactionCanceledException as e:
+            reasons = e.response.get('CancellationReasons', [])
+            if reasons and reasons[0].get('Code') == 'ConditionalCheckFailed':
+                raise ApprovalNotPending(approval['approval_id'])
+            raise
+
+    def rebuild(self):
+        """
+        Recalcular todos los contadores desde las aprobaciones PENDING (StatusIndex)
+        """
+        approvals_table = self._dynamodb.Table(self._approvals_table_name)
+        workload_table = self._dynamodb.Table(self._workload_table_name)
+
+        counts = {}
+        query_kwargs = {
+            'IndexName': 'StatusIndex',
+            'KeyConditionExpression': Key('status').eq('PENDING'),
+            'ProjectionExpression': 'approver_id'
+        }
+        while True:
+            response = approvals_table.query(**query_kwargs)
+            for item in response.get('Items', []):
+                counts[item['approver_id']] = counts.get(item['approver_id'], 0) + 1
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+        # Aprobadores sin pendientes vuelven a 0
+        scan_kwargs = {'ProjectionExpression': 'approver_id'}
+        while True:
+            response = workload_table.scan(**scan_kwargs)
+            for item in response.get('Items', []):
+                counts.setdefault(item['approver_id'], 0)
+            if 'LastEvaluatedKey' not in response:
+                break
+            scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+        with workload_table.batch_writer() as batch:
+            for approver_id, pending_count in counts.items():
+                batch.put_item(Item={'approver_id': approver_id, 'pending_count': pending_count})
+
+        logger.info(f"Contadores de carga recalculados para {len(counts)} aprobadores")
+        return counts
+
+    def _counter_update(self, approver_id, delta, enforce_limit=False):
+        update = {
+            'TableName': self._workload_table_name,
+            'Key': {'approver_id': approver_id},
+            'UpdateExpression': 'ADD pending_count :delta',
+            'ExpressionAttributeValues': {':delta': delta}
+        }
+        if enforce_limit:
+            update['ConditionExpression'] = 'attribute_not_exists(pending_count) OR pending_count < :max'
+            update['ExpressionAttributeValues'][':max'] = self._max_pending
+        return {'Update': update}
+
+    @staticmethod
+    def _limit_reached(error):
+        reasons = error.response.get('CancellationReasons', [])
+        return len(reasons) > 1 and reasons[1].get('Code') == 'ConditionalCheckFailed'
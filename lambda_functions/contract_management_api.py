@@ -5,15 +5,34 @@ from datetime import datetime
 import logging
 from decimal import Decimal
 import uuid
+import base64
+
+from boto3.dynamodb.conditions import Attr, Key
+
+from approver_workload import ApprovalNotPending, ApproverWorkload
 
 # Configurar logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Paginación de listados
+MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 100))
+
+# Claves de cada forma de listar contratos (tabla e índice), para armar el cursor
+CONTRACT_KEY = ('contract_id',)
+CUSTOMER_INDEX_KEY = ('contract_id', 'customer_id', 'created_at')
+STATUS_INDEX_KEY = ('contract_id', 'status', 'created_at')
+
 # Clientes AWS
 dynamodb = boto3.resource('dynamodb')
 stepfunctions = boto3.client('stepfunctions')
 
+approver_workload = ApproverWorkload(
+    dynamodb,
+    os.environ.get('APPROVER_WORKLOAD_TABLE', ''),
+    os.environ.get('APPROVALS_TABLE', '')
+)
+
 def handler(event, context):
     """
     API para gestión de contratos y aprobaciones
@@ -136,35 +155,40 @@ def create_contract(user_info, contract_data):
         return create_response(500, {'error': 'Error creando contrato'})
 
 def list_contracts(user_info, query_params):
-    """Listar contratos del usuario"""
+    """Listar contratos del usuario (más recientes primero, paginado con cursor)"""
     try:
         contracts_table = dynamodb.Table(os.environ['CONTRACTS_TABLE'])
         
         # Parámetros de consulta
-        limit = int(query_params.get('limit', 50))
+        limit = max(1, min(int(query_params.get('limit', 50)), MAX_PAGE_SIZE))
         status_filter = query_params.get('status')
+        cursor = query_params.get('cursor')
         
         # Consultar contratos
         if 'FleetManagers' in user_info['groups']:
             # Managers pueden ver todos los contratos
             if status_filter:
-                response = contracts_table.scan(
-                    FilterExpression='#status = :status',
-                    ExpressionAttributeNames={'#status': 'status'},
-                    ExpressionAttributeValues={':status': status_filter},
-                    Limit=limit
+                contracts, next_cursor = query_contracts_page(
+                    contracts_table, limit, cursor, STATUS_INDEX_KEY,
+                    IndexName='StatusIndex',
+                    KeyConditionExpression=Key('status').eq(status_filter),
+                    ScanIndexForward=False
                 )
             else:
-                response = contracts_table.scan(Limit=limit)
+                contracts, next_cursor = query_contracts_page(contracts_table, limit, cursor, CONTRACT_KEY)
         else:
             # Usuarios normales solo ven sus contratos
-            response = contracts_table.scan(
-                FilterExpression='customer_id = :customer_id',
-                ExpressionAttributeValues={':customer_id': user_info['user_id']},
-                Limit=limit
-            )
+            query_kwargs = {
+                'IndexName': 'CustomerIndex',
+                'KeyConditionExpression': Key('customer_id').eq(user_info['user_id']),
+                'ScanIndexForward': False
+            }
+            if status_filter:
+                query_kwargs['FilterExpression'] = Attr('status').eq(status_filter)
+            contracts, next_cursor = query_contracts_page(contracts_table, limit, cursor, CUSTOMER_INDEX_KEY,
+                                                          **query_kwargs)
         
-        contracts = convert_decimals(response.get('Items', []))
+        contracts = convert_decimals(contracts)
         
         # Agregar información de estado del flujo
         for contract in contracts:
@@ -174,13 +198,60 @@ def list_contracts(user_info, query_params):
         return create_response(200, {
             'contracts': contracts,
             'total': len(contracts),
-            'limit': limit
+            'limit': limit,
+            'next_cursor': next_cursor
         })
         
+    except ValueError as e:
+        return create_response(400, {'error': str(e)})
     except Exception as e:
         logger.error(f"Error listando contratos: {str(e)}")
         return create_response(500, {'error': 'Error obteniendo contratos'})
 
+def query_contracts_page(contracts_table, limit, cursor, key_attributes, **query_kwargs):
+    """
+    Una página de contratos y el cursor de la siguiente (None al final).
+    Sin KeyConditionExpression se recorre la tabla. Con FilterExpression se
+    sigue leyendo hasta completar la página; si sobran contratos, el cursor
+    apunta al último devuelto.
+    """
+    operation = contracts_table.query if 'KeyConditionExpression' in query_kwargs else contracts_table.scan
+    start_key = decode_cursor(cursor)
+    items = []
+    
+    while True:
+        request = dict(query_kwargs, Limit=limit)
+        if start_key:
+            request['ExclusiveStartKey'] = start_key
+        
+        response = operation(**request)
+        items.extend(response.get('Items', []))
+        start_key = response.get('LastEvaluatedKey')
+        
+        if len(items) >= limit or not start_key:
+            break
+    
+    if len(items) > limit:
+        items = items[:limit]
+        start_key = {attribute: items[-1][attribute] for attribute in key_attributes}
+    
+    return items, encode_cursor(start_key)
+
+def encode_cursor(start_key):
+    if not start_key:
+        return None
+    raw = json.dumps(convert_decimals(start_key), separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        # Las claves numéricas (created_at) vuelven como Decimal para DynamoDB
+        return json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')), parse_float=Decimal, parse_int=Decimal)
+    except (ValueError, TypeError):
+        raise ValueError('Cursor inválido')
+
 def get_contract_by_id(user_info, contract_id):
     """Obtener contrato específico"""
     try:
@@ -243,32 +314,32 @@ def approve_contract(user_info, approval_id, approval_data):
         if int(datetime.utcnow().timestamp()) > approval['expires_at']:
             return create_response(400, {'error': 'La aprobación ha expirado'})
         
-        # Actualizar aprobación
-        approvals_table.update_item(
-            Key={'approval_id': approval_id},
-            UpdateExpression='SET #status = :status, approved_at = :approved_at, approved_by = :approved_by, approval_comments = :comments',
-            ExpressionAttributeNames={'#status': 'status'},
-            ExpressionAttributeValues={
-                ':status': 'APPROVED',
-                ':approved_at': int(datetime.utcnow().timestamp()),
-                ':approved_by': user_info['user_id'],
-                ':comments': approval_data.get('comments', '')
-            }
-        )
-        
-        # Actualizar contrato
-        contracts_table = dynamodb.Table(os.environ['CONTRACTS_TABLE'])
-        contracts_table.update_item(
-            Key={'contract_id': approval['contract_id']},
-            UpdateExpression='SET #status = :status, approved_at = :approved_at, approved_by = :approved_by, updated_at = :updated_at',
-            ExpressionAttributeNames={'#status': 'status'},
-            ExpressionAttributeValues={
-                ':status': 'APPROVED',
-                ':approved_at': int(datetime.utcnow().timestamp()),
-                ':approved_by': user_info['user_id'],
-                ':updated_at': int(datetime.utcnow().timestamp())
-            }
-        )
+        # Actualizar aprobación, contrato y contador del aprobador en una transacción
+        try:
+            approver_workload.resolve(approval, {
+                'UpdateExpression': 'SET #status = :status, approved_at = :approved_at, approved_by = :approved_by, approval_comments = :comments',
+                'ExpressionAttributeValues': {
+                    ':status': 'APPROVED',
+                    ':approved_at': int(datetime.utcnow().timestamp()),
+                    ':approved_by': user_info['user_id'],
+                    ':comments': approval_data.get('comments', '')
+                }
+            }, extra_items=[{
+                'Update': {
+                    'TableName': os.environ['CONTRACTS_TABLE'],
+                    'Key': {'contract_id': approval['contract_id']},
+                    'UpdateExpression': 'SET #status = :status, approved_at = :approved_at, approved_by = :approved_by, updated_at = :updated_at',
+                    'ExpressionAttributeNames': {'#status': 'status'},
+                    'ExpressionAttributeValues': {
+                        ':status': 'APPROVED',
+                        ':approved_at': int(datetime.utcnow().timestamp()),
+                        ':approved_by': user_info['user_id'],
+                        ':updated_at': int(datetime.utcnow().timestamp())
+                    }
+                }
+            }])
+        except ApprovalNotPending:
+            return create_response(409, {'error': 'La aprobación ya fue resuelta'})
         
         logger.info(f"Contrato {approval['contract_id']} aprobado por {user_info['name']}")
         
@@ -311,33 +382,33 @@ def reject_contract(user_info, approval_id, rejection_data):
         if approval['status'] != 'PENDING':
             return create_response(400, {'error': f'La aprobación ya está {approval["status"]}'})
         
-        # Actualizar aprobación
-        approvals_table.update_item(
-            Key={'approval_id': approval_id},
-            UpdateExpression='SET #status = :status, rejected_at = :rejected_at, rejected_by = :rejected_by, rejection_reason = :reason',
-            ExpressionAttributeNames={'#status': 'status'},
-            ExpressionAttributeValues={
-                ':status': 'REJECTED',
-                ':rejected_at': int(datetime.utcnow().timestamp()),
-                ':rejected_by': user_info['user_id'],
-                ':reason': rejection_reason
-            }
-        )
-        
-        # Actualizar contrato
-        contracts_table = dynamodb.Table(os.environ['CONTRACTS_TABLE'])
-        contracts_table.update_item(
-            Key={'contract_id': approval['contract_id']},
-            UpdateExpression='SET #status = :status, rejected_at = :rejected_at, rejected_by = :rejected_by, rejection_reason = :reason, updated_at = :updated_at',
-            ExpressionAttributeNames={'#status': 'status'},
-            ExpressionAttributeValues={
-                ':status': 'REJECTED',
-                ':rejected_at': int(datetime.utcnow().timestamp()),
-                ':rejected_by': user_info['user_id'],
-                ':reason': rejection_reason,
-                ':updated_at': int(datetime.utcnow().timestamp())
-            }
-        )
+        # Actualizar aprobación, contrato y contador del aprobador en una transacción
+        try:
+            approver_workload.resolve(approval, {
+                'UpdateExpression': 'SET #status = :status, rejected_at = :rejected_at, rejected_by = :rejected_by, rejection_reason = :reason',
+                'ExpressionAttributeValues': {
+                    ':status': 'REJECTED',
+                    ':rejected_at': int(datetime.utcnow().timestamp()),
+                    ':rejected_by': user_info['user_id'],
+                    ':reason': rejection_reason
+                }
+            }, extra_items=[{
+                'Update': {
+                    'TableName': os.environ['CONTRACTS_TABLE'],
+                    'Key': {'contract_id': approval['contract_id']},
+                    'UpdateExpression': 'SET #status = :status, rejected_at = :rejected_at, rejected_by = :rejected_by, rejection_reason = :reason, updated_at = :updated_at',
+                    'ExpressionAttributeNames': {'#status': 'status'},
+                    'ExpressionAttributeValues': {
+                        ':status': 'REJECTED',
+                        ':rejected_at': int(datetime.utcnow().timestamp()),
+                        ':rejected_by': user_info['user_id'],
+                        ':reason': rejection_reason,
+                        ':updated_at': int(datetime.utcnow().timestamp())
+                    }
+                }
+            }])
+        except ApprovalNotPending:
+            return create_response(409, {'error': 'La aprobación ya fue resuelta'})
         
         logger.info(f"Contrato {approval['contract_id']} rechazado por {user_info['name']}: {rejection_reason}")
         
@@ -392,32 +463,31 @@ def get_pending_approvals(user_info, query_params):
         return create_response(500, {'error': 'Error obteniendo aprobaciones pendientes'})
 
 def get_contracts_dashboard(user_info, query_params):
-    """Obtener dashboard de contratos"""
+    """Obtener dashboard de contratos desde los contadores precalculados"""
     try:
-        contracts_table = dynamodb.Table(os.environ['CONTRACTS_TABLE'])
+        stats_table = dynamodb.Table(os.environ['CONTRACT_STATS_TABLE'])
         
-        # Obtener estadísticas de contratos
+        # Managers ven estadísticas globales; usuarios, las de sus contratos
         if 'FleetManagers' in user_info['groups']:
-            # Managers ven estadísticas globales
-            response = contracts_table.scan()
+            scope = 'GLOBAL'
         else:
-            # Usuarios ven solo sus contratos
-            response = contracts_table.scan(
-                FilterExpression='customer_id = :customer_id',
-                ExpressionAttributeValues={':customer_id': user_info['user_id']}
-            )
+            scope = f"CUSTOMER#{user_info['user_id']}"
         
-        contracts = response.get('Items', [])
+        counters = convert_decimals(stats_table.get_item(Key={'scope': scope}).get('Item', {}))
         
         # Calcular estadísticas
         stats = {
-            'total_contracts': len(contracts),
-            'pending_approval': len([c for c in contracts if c.get('status') == 'PENDING_MANAGER_APPROVAL']),
-            'approved': len([c for c in contracts if c.get('status') == 'APPROVED']),
-            'rejected': len([c for c in contracts if c.get('status') == 'REJECTED']),
-            'total_vehicles': sum(int(c.get('vehicle_count', 0)) for c in contracts if c.get('status') == 'APPROVED'),
-            'total_value': float(sum(c.get('total_contract_value', 0) for c in contracts if c.get('status') == 'APPROVED')),
-            'contracts_requiring_approval': len([c for c in contracts if c.get('requires_manager_approval', False)])
+            'total_contracts': int(counters.get('total_contracts', 0)),
+            'pending_approval': int(counters.get('count_PENDING_MANAGER_APPROVAL', 0)),
+            'approved': int(counters.get('count_APPROVED', 0)),
+            'rejected': int(counters.get('count_REJECTED', 0)),
+            'total_vehicles': int(counters.get('approved_vehicles', 0)),
+            'total_value': float(counters.get('approved_value', 0)),
+            'contracts_requiring_approval': int(counters.get('requires_manager_approval', 0)),
+            'by_status': {
+                name[len('count_'):]: int(value)
+                for name, value in counters.items() if name.startswith('count_') and value
+            }
         }
         
         return create_response(200, {
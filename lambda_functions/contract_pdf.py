@@ -0,0 +1,177 @@
+"""
+Generación del PDF de contrato para los envelopes de DocuSign.
+
+El contrato tiene una sola página con diseño fijo. Todo lo estático (catálogo,
+página, fuentes, títulos, etiquetas, términos legales y líneas de firma) se
+serializa una vez por contenedor en ContractPdfTemplate. Por contrato solo se
+escribe el flujo de contenido con los valores variables, la tabla xref y el
+trailer. La salida se escribe por partes en un archivo (BytesIO, archivo
+temporal, cuerpo de S3...) y render_base64 codifica directamente la vista
+del buffer para el documento del envelope. No depende de librerías externas.
+Se incluye con docusign_signature_manager.
+"""
+
+import base64
+import io
+from datetime import datetime
+
+PAGE_WIDTH = 595  # A4 en puntos
+PAGE_HEIGHT = 842
+
+TITLE = 'CONTRATO DE SERVICIOS DE SEGUIMIENTO VEHICULAR'
+
+# Posición de las pestañas SignHere de DocuSign (puntos desde la esquina superior izquierda)
+CUSTOMER_SIGNATURE_POSITION = (100, 480)
+COMPANY_SIGNATURE_POSITION = (400, 480)
+
+LEGAL_TERMS = (
+    '1. El cliente acepta los términos de servicio',
+    '2. El pago se realizará mensualmente',
+    '3. El servicio incluye monitoreo 24/7',
+    '4. Soporte técnico incluido'
+)
+
+LABEL_X = 60
+VALUE_X = 230
+
+# (y, etiqueta, campo) de cada valor variable; los campos se calculan en contract_fields
+FIELD_LAYOUT = (
+    (740, 'Contrato ID:', 'contract_id'),
+    (725, 'Fecha:', 'date'),
+    (678, 'Nombre:', 'customer_name'),
+    (663, 'Email:', 'customer_email'),
+    (648, 'Empresa:', 'company_name'),
+    (601, 'Tipo de Contrato:', 'contract_type'),
+    (586, 'Cantidad de Vehículos:', 'vehicle_count'),
+    (571, 'Tarifa Mensual:', 'monthly_fee'),
+    (556, 'Duración:', 'duration'),
+    (541, 'Valor Total:', 'total_value')
+)
+
+SECTIONS = ((695, 'CLIENTE:'), (618, 'SERVICIOS:'), (511, 'TÉRMINOS Y CONDICIONES:'), (420, 'FIRMAS:'))
+LEGAL_TERMS_TOP = 494
+LINE_SPACING = 15
+
+# Objetos del PDF: 5 es el único que cambia por contrato y va al final
+VARIABLE_OBJECT = 5
+STATIC_OBJECTS = (1, 2, 3, 4, 6, 7)
+OBJECT_COUNT = 7
+
+def pdf_text(value):
+    """Cadena literal de PDF en WinAnsiEncoding"""
+    text = ' '.join(str(value).split())
+    text = text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+    return text.encode('cp1252', errors='replace')
+
+def text_op(font, size, x, y, value):
+    return b'BT /%s %d Tf %d %d Td (%s) Tj ET\n' % (font, size, x, y, pdf_text(value))
+
+def contract_fields(contract_data, date=None):
+    """Valores variables del contrato, ya formateados"""
+    return {
+        'contract_id': contract_data['contract_id'],
+        'date': date or datetime.now().strftime('%Y-%m-%d'),
+        'customer_name': contract_data['customer_name'],
+        'customer_email': contract_data['customer_email'],
+        'company_name': contract_data.get('company_name', 'N/A'),
+        'contract_type': contract_data['contract_type'],
+        'vehicle_count': contract_data['vehicle_count'],
+        'monthly_fee': f"${contract_data['monthly_fee']:.2f} por vehículo",
+        'duration': f"{contract_data['contract_duration_months']} meses",
+        'total_value': f"${contract_data['total_contract_value']:.2f}"
+    }
+
+def pdf_object(number, body, stream=None):
+    if stream is None:
+        return b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    return b'%d 0 obj\n<< /Length %d >>\nstream\n%s\nendstream\nendobj\n' % (number, len(stream), stream)
+
+def xref_entry(offset):
+    return b'%010d 00000 n \n' % offset
+
+class ContractPdfTemplate:
+    """
+    Partes estáticas del PDF serializadas una vez; render solo agrega los valores
+    """
+
+    def __init__(self):
+        objects = {
+            1: pdf_object(1, b'<< /Type /Catalog /Pages 2 0 R >>'),
+            2: pdf_object(2, b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>'),
+            3: pdf_object(3, b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] '
+                             b'/Resources << /Font << /F1 6 0 R /F2 7 0 R >> >> '
+                             b'/Contents [4 0 R 5 0 R] >>' % (PAGE_WIDTH, PAGE_HEIGHT)),
+            4: pdf_object(4, None, self._static_content()),
+            6: pdf_object(6, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica '
+                             b'/Encoding /WinAnsiEncoding >>'),
+            7: pdf_object(7, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold '
+                             b'/Encoding /WinAnsiEncoding >>')
+        }
+
+        prefix = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        offsets = {}
+        for number in STATIC_OBJECTS:
+            offsets[number] = len(prefix)
+            prefix += objects[number]
+
+        self.prefix = bytes(prefix)
+        self.xref_head = (b'xref\n0 %d\n0000000000 65535 f \n' % (OBJECT_COUNT + 1) +
+                          b''.join(xref_entry(offsets[number]) for number in range(1, VARIABLE_OBJECT)))
+        self.xref_tail = b''.join(xref_entry(offsets[number])
+                                  for number in range(VARIABLE_OBJECT + 1, OBJECT_COUNT + 1))
+        self.trailer = b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n' % (OBJECT_COUNT + 1)
+        self.value_ops = [(b'BT /F1 10 Tf %d %d Td (' % (VALUE_X, y), field) for y, _, field in FIELD_LAYOUT]
+
+    @staticmethod
+    def _static_content():
+        content = [text_op(b'F2', 14, LABEL_X, 780, TITLE)]
+        content += [text_op(b'F2', 10, LABEL_X, y, label) for y, label, _ in FIELD_LAYOUT]
+        content += [text_op(b'F2', 11, LABEL_X, y, title) for y, title in SECTIONS]
+        content += [text_op(b'F1', 10, LABEL_X, LEGAL_TERMS_TOP - index * LINE_SPACING, term)
+                    for index, term in enumerate(LEGAL_TERMS)]
+
+        # Líneas de firma bajo las pestañas SignHere
+        for (x, top), label in ((CUSTOMER_SIGNATURE_POSITION, 'Cliente'), (COMPANY_SIGNATURE_POSITION, 'Empresa')):
+            line_y = PAGE_HEIGHT - top - 40
+            content.append(b'%d %d m %d %d l S\n' % (x - 40, line_y, x + 140, line_y))
+            content.append(text_op(b'F1', 9, x - 40, line_y - 14, label))
+            content.append(text_op(b'F1', 9, x - 40, line_y - 28, 'Fecha: ____________'))
+        return b''.join(content)
+
+    def render_to(self, output, contract_data, date=None):
+        """
+        Escribir el PDF del contrato en output (archivo binario). Devuelve los bytes escritos.
+        """
+        fields = contract_fields(contract_data, date)
+        content = b''.join(b'%s%s) Tj ET\n' % (op, pdf_text(fields[field])) for op, field in self.value_ops)
+        variable_object = pdf_object(VARIABLE_OBJECT, None, content)
+
+        xref_offset = len(self.prefix) + len(variable_object)
+        parts = (
+            self.prefix,
+            variable_object,
+            self.xref_head,
+            xref_entry(len(self.prefix)),
+            self.xref_tail,
+            self.trailer,
+            b'%d\n%%%%EOF\n' % xref_offset
+        )
+        for part in parts:
+            output.write(part)
+        return sum(len(part) for part in parts)
+
+    def render(self, contract_data, date=None):
+        buffer = io.BytesIO()
+        self.render_to(buffer, contract_data, date)
+        return buffer.getvalue()
+
+    def render_base64(self, contract_data, date=None):
+        """
+        PDF en base64 para Document(document_base64=...), codificado desde la vista del buffer
+        """
+        buffer = io.BytesIO()
+        self.render_to(buffer, contract_data, date)
+        return base64.b64encode(buffer.getbuffer()).decode('ascii')
+
+# Compilada una vez por contenedor
+CONTRACT_TEMPLATE = ContractPdfTemplate()
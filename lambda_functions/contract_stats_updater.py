@@ -0,0 +1,348 @@
+import json
+import boto3
+import os
+import logging
+from decimal import Decimal
+
+from boto3.dynamodb.types import TypeDeserializer
+
+# Configurar logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Clientes AWS
+dynamodb = boto3.resource('dynamodb')
+
+# Ámbitos de los contadores: global (managers) y por cliente
+GLOBAL_SCOPE = 'GLOBAL'
+
+# Por contrato se guarda CONTRACT#<contract_id> con su aporte ya sumado y el
+# SequenceNumber del último registro aplicado. Cada registro suma la diferencia
+# contra ese aporte en la misma transacción que lo reemplaza, así que un
+# reintento (SequenceNumber no mayor) no vuelve a sumar.
+CONTRACT_ENTRY_PREFIX = 'CONTRACT#'
+# SequenceNumber tiene hasta 40 dígitos: se guarda como texto con ceros a la izquierda
+SEQUENCE_DIGITS = 40
+NO_SEQUENCE = '0' * SEQUENCE_DIGITS
+CONTRACTS_PER_TRANSACTION = 30  # 30 entradas + GLOBAL + hasta 60 clientes < 100 ítems
+MAX_TRANSACTION_ATTEMPTS = 5
+BATCH_GET_MAX_KEYS = 100
+
+deserializer = TypeDeserializer()
+
+def handler(event, context):
+    """
+    Mantener los contadores por estado del dashboard de contratos.
+    Recibe el stream de la tabla de contratos (NEW_AND_OLD_IMAGES) y suma a
+    cada ámbito la diferencia entre la imagen nueva y el aporte ya contado
+    del contrato. Cada registro se aplica una sola vez aunque el lote se
+    reintente. Con {"action": "rebuild"} corrige contrato por contrato los
+    aportes que no coinciden con la tabla de contratos y luego los ámbitos
+    que no suman sus aportes (carga inicial o registros descartados).
+    """
+    if event.get('action') == 'rebuild':
+        return rebuild_stats()
+
+    records_by_contract = {}
+    for record in event.get('Records', []):
+        keys = record.get('dynamodb', {}).get('Keys', {})
+        if 'contract_id' in keys:
+            records_by_contract.setdefault(keys['contract_id']['S'], []).append(record)
+
+    def stream_targets(entries):
+        # Solo los registros posteriores al último aplicado; el último define el estado
+        targets = {}
+        for contract_id, records in records_by_contract.items():
+            if contract_id not in entries:
+                continue
+            applied_seq = entries[contract_id]['seq'] if entries[contract_id] else NO_SEQUENCE
+            newer = [record for record in records if sequence(record) > applied_seq]
+            if newer:
+                targets[contract_id] = (sequence(newer[-1]), deserialize(newer[-1]['dynamodb'].get('NewImage')))
+        return targets
+
+    contract_ids = list(records_by_contract)
+    applied = 0
+    for offset in range(0, len(contract_ids), CONTRACTS_PER_TRANSACTION):
+        applied += apply_contract_states(contract_ids[offset:offset + CONTRACTS_PER_TRANSACTION], stream_targets)
+
+    logger.info(f"Contadores actualizados: {applied} de {len(contract_ids)} contratos con cambios nuevos")
+    return {'contracts_applied': applied, 'contracts_skipped': len(contract_ids) - applied}
+
+def sequence(record):
+    return record['dynamodb']['SequenceNumber'].zfill(SEQUENCE_DIGITS)
+
+def apply_contract_states(contract_ids, resolve_targets):
+    """
+    Llevar los contratos al estado que devuelve resolve_targets(entradas) en
+    una transacción: reemplaza cada entrada CONTRACT# (condicionada a la
+    leída) y suma las diferencias por ámbito. Si otra invocación cambió una
+    entrada entre la lectura y la escritura, se vuelve a leer y calcular.
+    Devuelve cuántos contratos se escribieron.
+    """
+    for attempt in range(MAX_TRANSACTION_ATTEMPTS):
+        entries = get_contract_entries(contract_ids)
+        targets = resolve_targets(entries)
+        if not targets:
+            return 0
+
+        try:
+            transact(entries, targets)
+            return len(targets)
+        except dynamodb.meta.client.exceptions.TransactionCanceledException as e:
+            if not entry_changed(e):
+                raise
+            logger.info(f"Aportes modificados durante la escritura; reintento {attempt + 1}")
+
+    raise Exception(f"No se pudieron aplicar los cambios de {len(contract_ids)} contratos")
+
+def get_contract_entries(contract_ids):
+    """{contract_id: entrada CONTRACT# o None}, con lectura consistente"""
+    table_name = os.environ['CONTRACT_STATS_TABLE']
+    entries = {contract_id: None for contract_id in contract_ids}
+
+    for start in range(0, len(contract_ids), BATCH_GET_MAX_KEYS):
+        request = {
+            table_name: {
+                'Keys': [{'scope': f"{CONTRACT_ENTRY_PREFIX}{contract_id}"}
+                         for contract_id in contract_ids[start:start + BATCH_GET_MAX_KEYS]],
+                'ConsistentRead': True
+            }
+        }
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            for item in response.get('Responses', {}).get(table_name, []):
+                entries[item['scope'][len(CONTRACT_ENTRY_PREFIX):]] = item
+            request = response.get('UnprocessedKeys')
+
+    return entries
+
+def transact(entries, targets):
+    table_name = os.environ['CONTRACT_STATS_TABLE']
+    items = []
+    deltas = {}
+
+    for contract_id, (seq, contract) in targets.items():
+        entry = entries[contract_id]
+        if entry:
+            add_contribution(deltas, entry['scopes'], entry['contribution'], -1)
+            condition = {
+                'ConditionExpression': '#seq = :seq',
+                'ExpressionAttributeNames': {'#seq': 'seq'},
+                'ExpressionAttributeValues': {':seq': entry['seq']}
+            }
+        else:
+            condition = {'ConditionExpression': 'attribute_not_exists(#scope)',
+                         'ExpressionAttributeNames': {'#scope': 'scope'}}
+
+        # Un contrato eliminado queda con aporte vacío: un registro anterior repetido no lo revive
+        scopes = stats_scopes(contract) if contract else []
+        contribution = contract_contribution(contract) if contract else {}
+        add_contribution(deltas, scopes, contribution, 1)
+
+        items.append({
+            'Put': dict(condition, TableName=table_name, Item={
+                'scope': f"{CONTRACT_ENTRY_PREFIX}{contract_id}",
+                'seq': seq,
+                'scopes': scopes,
+                'contribution': contribution
+            })
+        })
+
+    items += [update for update in (delta_update(table_name, scope, scope_deltas)
+                                    for scope, scope_deltas in deltas.items()) if update]
+
+    dynamodb.meta.client.transact_write_items(TransactItems=items)
+
+def add_contribution(deltas, scopes, contribution, sign):
+    for scope in scopes:
+        scope_deltas = deltas.setdefault(scope, {})
+        for name, value in contribution.items():
+            scope_deltas[name] = scope_deltas.get(name, 0) + sign * value
+
+def entry_changed(error):
+    reasons = error.response.get('CancellationReasons', [])
+    return any(reason.get('Code') == 'ConditionalCheckFailed' for reason in reasons)
+
+def deserialize(image):
+    if not image:
+        return None
+    return {key: deserializer.deserialize(value) for key, value in image.items()}
+
+def stats_scopes(contract):
+    scopes = [GLOBAL_SCOPE]
+    if contract.get('customer_id'):
+        scopes.append(f"CUSTOMER#{contract['customer_id']}")
+    return scopes
+
+def contract_contribution(contract):
+    """Aporte de un contrato a los contadores de su ámbito"""
+    status = contract.get('status', 'UNKNOWN')
+    contribution = {
+        'total_contracts': 1,
+        f"count_{status}": 1
+    }
+    if contract.get('requires_manager_approval', False):
+        contribution['requires_manager_approval'] = 1
+    if status == 'APPROVED':
+        contribution['approved_vehicles'] = Decimal(str(contract.get('vehicle_count', 0)))
+        contribution['approved_value'] = Decimal(str(contract.get('total_contract_value', 0)))
+    return contribution
+
+def delta_update(table_name, scope, scope_deltas):
+    """
+    Update con ADD de las diferencias no nulas del ámbito, o None si no hay
+    cambios. version cuenta los cambios: la reconstrucción solo reescribe un
+    ámbito que no cambió mientras lo recalculaba.
+    """
+    changes = {name: value for name, value in scope_deltas.items() if value != 0}
+    if not changes:
+        return None
+
+    changes['version'] = 1
+    names = sorted(changes)
+    return {
+        'Update': {
+            'TableName': table_name,
+            'Key': {'scope': scope},
+            'UpdateExpression': 'ADD ' + ', '.join(f"#n{index} :v{index}" for index in range(len(names))),
+            'ExpressionAttributeNames': {f"#n{index}": name for index, name in enumerate(names)},
+            'ExpressionAttributeValues': {f":v{index}": changes[name] for index, name in enumerate(names)}
+        }
+    }
+
+def rebuild_stats():
+    """
+    Corregir los contadores sin detener el stream:
+    1. Contratos cuyo aporte guardado no coincide con la tabla de contratos
+       (registros descartados, carga inicial): se releen y se corrigen con la
+       misma transacción condicionada que usa el stream.
+    2. Ámbitos cuyo valor no es la suma de sus aportes: se reescriben solo si
+       su version no cambió durante el cálculo.
+    """
+    contracts_corrected = correct_contract_entries()
+    scopes_rewritten = repair_scopes()
+
+    logger.info(f"Reconstrucción: {contracts_corrected} contratos corregidos, {scopes_rewritten} ámbitos reescritos")
+    return {'statusCode': 200, 'body': json.dumps({
+        'contracts_corrected': contracts_corrected,
+        'scopes_rebuilt': scopes_rewritten
+    })}
+
+def correct_contract_entries():
+    stats_items = scan_all(dynamodb.Table(os.environ['CONTRACT_STATS_TABLE']))
+    entries = {item['scope'][len(CONTRACT_ENTRY_PREFIX):]: item
+               for item in stats_items if item['scope'].startswith(CONTRACT_ENTRY_PREFIX)}
+
+    candidates = set()
+    seen = set()
+    for contract in scan_all(dynamodb.Table(os.environ['CONTRACTS_TABLE'])):
+        seen.add(contract['contract_id'])
+        if not entry_matches(entries.get(contract['contract_id']), contract):
+            candidates.add(contract['contract_id'])
+    candidates.update(contract_id for contract_id, entry in entries.items()
+                      if contract_id not in seen and not entry_matches(entry, None))
+
+    def current_targets(entries):
+        # El contrato se lee después de su entrada: nunca es más antiguo que lo ya aplicado
+        contracts = get_contracts(list(entries))
+        targets = {}
+        for contract_id, entry in entries.items():
+            contract = contracts.get(contract_id)
+            if not entry_matches(entry, contract):
+                targets[contract_id] = (entry['seq'] if entry else NO_SEQUENCE, contract)
+        return targets
+
+    candidates = sorted(candidates)
+    corrected = 0
+    for offset in range(0, len(candidates), CONTRACTS_PER_TRANSACTION):
+        corrected += apply_contract_states(candidates[offset:offset + CONTRACTS_PER_TRANSACTION], current_targets)
+    return corrected
+
+def entry_matches(entry, contract):
+    """El aporte guardado coincide con el del contrato (None: eliminado o nunca contado)"""
+    scopes = stats_scopes(contract) if contract else []
+    contribution = contract_contribution(contract) if contract else {}
+    if entry is None:
+        return contract is None
+    return list(entry['scopes']) == scopes and normalized(entry['contribution']) == normalized(contribution)
+
+def get_contracts(contract_ids):
+    """Contratos por ID con BatchGetItem consistente"""
+    table_name = os.environ['CONTRACTS_TABLE']
+    contracts = {}
+
+    for start in range(0, len(contract_ids), BATCH_GET_MAX_KEYS):
+        request = {
+            table_name: {
+                'Keys': [{'contract_id': contract_id} for contract_id in contract_ids[start:start + BATCH_GET_MAX_KEYS]],
+                'ConsistentRead': True
+            }
+        }
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            for item in response.get('Responses', {}).get(table_name, []):
+                contracts[item['contract_id']] = item
+            request = response.get('UnprocessedKeys')
+
+    return contracts
+
+def repair_scopes():
+    """
+    Reescribir los ámbitos que no suman sus aportes. La version de cada
+    ámbito se lee antes de sumar las entradas; si cambió al escribir, otro
+    aporte llegó mientras tanto y el ámbito se deja para la próxima ejecución.
+    """
+    stats_table = dynamodb.Table(os.environ['CONTRACT_STATS_TABLE'])
+
+    scopes = {item['scope']: item for item in scan_all(stats_table)
+              if item['scope'] == GLOBAL_SCOPE or item['scope'].startswith('CUSTOMER#')}
+
+    totals = {}
+    for item in scan_all(stats_table):
+        if item['scope'].startswith(CONTRACT_ENTRY_PREFIX):
+            add_contribution(totals, item['scopes'], item['contribution'], 1)
+
+    rewritten = 0
+    for scope in sorted(set(scopes) | set(totals)):
+        stored = scopes.get(scope)
+        counters = {name: value for name, value in (stored or {}).items() if name not in ('scope', 'version')}
+        expected = totals.get(scope, {})
+        if normalized(counters) == normalized(expected):
+            continue
+
+        if stored is None:
+            condition = {'ConditionExpression': 'attribute_not_exists(#scope)',
+                         'ExpressionAttributeNames': {'#scope': 'scope'}}
+        elif 'version' in stored:
+            condition = {'ConditionExpression': '#version = :version',
+                         'ExpressionAttributeNames': {'#version': 'version'},
+                         'ExpressionAttributeValues': {':version': stored['version']}}
+        else:
+            condition = {'ConditionExpression': 'attribute_not_exists(#version)',
+                         'ExpressionAttributeNames': {'#version': 'version'}}
+
+        try:
+            stats_table.put_item(
+                Item={'scope': scope, **{name: value for name, value in expected.items() if value != 0},
+                      'version': (stored or {}).get('version', 0) + 1},
+                **condition
+            )
+            rewritten += 1
+        except stats_table.meta.client.exceptions.ConditionalCheckFailedException:
+            logger.info(f"Ámbito {scope} cambió durante la reconstrucción; se corrige en la próxima ejecución")
+
+    return rewritten
+
+def normalized(counters):
+    return {name: Decimal(str(value)) for name, value in counters.items() if value != 0}
+
+def scan_all(table):
+    items = []
+    scan_kwargs = {'ConsistentRead': True}
+    while True:
+        response = table.scan(**scan_kwargs)
+        items.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return items
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
@@ -4,6 +4,9 @@ import os
 from datetime import datetime
 import logging
 from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+
+from risk_engine import RiskEngine
 
 # Configurar logging
 logger = logging.getLogger()
@@ -12,10 +15,21 @@ logger.setLevel(logging.INFO)
 # Clientes AWS
 dynamodb = boto3.resource('dynamodb')
 
+# Reglas de riesgo (RISK_RULES), compiladas una vez por contenedor
+risk_engine = RiskEngine.from_env()
+
+# Re-evaluación de la cartera
+RESCORE_WRITE_CONCURRENCY = int(os.environ.get('RESCORE_WRITE_CONCURRENCY', 16))
+RESCORE_TIME_MARGIN_MS = 30000  # Detenerse antes del timeout y devolver el punto de reanudación
+RESCORE_PROJECTION = 'contract_id, vehicle_count, total_contract_value, contract_duration_months, risk_level'
+
 def handler(event, context):
     """
     Validar contrato y extraer información relevante para el flujo de aprobación
     """
+    if event.get('action') == 'rescore':
+        return rescore_contracts(event, context)
+
     try:
         logger.info(f"Validando contrato: {json.dumps(event)}")
         
@@ -143,34 +157,104 @@ def handler(event, context):
 
 def calculate_risk_level(vehicle_count, total_value, duration):
     """Calcular nivel de riesgo del contrato"""
-    risk_score = 0
-    
-    # Riesgo por cantidad de vehículos
-    if vehicle_count > 100:
-        risk_score += 3
-    elif vehicle_count > 50:
-        risk_score += 2
-    elif vehicle_count > 20:
-        risk_score += 1
-    
-    # Riesgo por valor total
-    if total_value > 500000:  # $500K
-        risk_score += 3
-    elif total_value > 100000:  # $100K
-        risk_score += 2
-    elif total_value > 50000:   # $50K
-        risk_score += 1
-    
-    # Riesgo por duración
-    if duration > 36:  # Más de 3 años
-        risk_score += 2
-    elif duration > 24:  # Más de 2 años
-        risk_score += 1
-    
-    # Determinar nivel de riesgo
-    if risk_score >= 6:
-        return 'HIGH'
-    elif risk_score >= 3:
-        return 'MEDIUM'
+    return risk_engine.level(vehicle_count, total_value, duration)
+
+def rescore_contracts(event, context):
+    """
+    Re-evaluar el riesgo de toda la tabla de contratos (p. ej. tras cambiar umbrales).
+
+    Evento: {"action": "rescore", "rules": {...}, "segment": 0, "total_segments": 1,
+    "start_key": {...}, "dry_run": false}. Cada página del scan se evalúa como un
+    lote y solo se escriben los contratos cuyo nivel cambió. Con total_segments > 1
+    varias invocaciones se reparten la tabla. Si el tiempo se agota, se devuelve
+    next_key para continuar el mismo segmento en otra invocación.
+    """
+    engine = RiskEngine(event['rules']) if event.get('rules') else risk_engine
+    dry_run = event.get('dry_run', False)
+    contracts_table = dynamodb.Table(os.environ['CONTRACTS_TABLE'])
+
+    scan_kwargs = {'ProjectionExpression': RESCORE_PROJECTION}
+    if event.get('total_segments', 1) > 1:
+        scan_kwargs['Segment'] = event.get('segment', 0)
+        scan_kwargs['TotalSegments'] = event['total_segments']
+    if event.get('start_key'):
+        scan_kwargs['ExclusiveStartKey'] = event['start_key']
+
+    scanned = 0
+    changed = 0
+    conflicts = 0
+    next_key = None
+
+    with ThreadPoolExecutor(max_workers=RESCORE_WRITE_CONCURRENCY) as executor:
+        while True:
+            response = contracts_table.scan(**scan_kwargs)
+            contracts = response.get('Items', [])
+            scanned += len(contracts)
+
+            new_levels = engine.levels(
+                [contract.get('vehicle_count', 0) for contract in contracts],
+                [contract.get('total_contract_value', 0) for contract in contracts],
+                [contract.get('contract_duration_months', 0) for contract in contracts]
+            )
+            updates = [(contract, level) for contract, level in zip(contracts, new_levels)
+                       if contract.get('risk_level') != level]
+            changed += len(updates)
+
+            if updates and not dry_run:
+                # BatchWriteItem solo reemplaza ítems completos: se actualiza solo risk_level en paralelo
+                results = executor.map(lambda update: update_risk_level(contracts_table, *update), updates)
+                conflicts += sum(1 for written in results if not written)
+
+            if 'LastEvaluatedKey' not in response:
+                break
+            scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+            if context and context.get_remaining_time_in_millis() < RESCORE_TIME_MARGIN_MS:
+                next_key = response['LastEvaluatedKey']
+                break
+
+    logger.info(f"Re-evaluación de riesgo: {scanned} contratos, {changed} cambios, {conflicts} conflictos")
+
+    return {
+        'scanned': scanned,
+        'changed': changed,
+        'conflicts': conflicts,
+        'dry_run': dry_run,
+        'segment': event.get('segment', 0),
+        'next_key': convert_decimals(next_key),
+        'completed': next_key is None
+    }
+
+def update_risk_level(contracts_table, contract, risk_level):
+    """Escribir el nivel nuevo si nadie lo cambió desde el scan"""
+    values = {
+        ':risk_level': risk_level,
+        ':rescored_at': int(datetime.utcnow().timestamp())
+    }
+    if 'risk_level' in contract:
+        condition = 'attribute_exists(contract_id) AND risk_level = :previous'
+        values[':previous'] = contract['risk_level']
     else:
-        return 'LOW'
+        condition = 'attribute_exists(contract_id) AND attribute_not_exists(risk_level)'
+
+    try:
+        contracts_table.update_item(
+            Key={'contract_id': contract['contract_id']},
+            UpdateExpression='SET risk_level = :risk_level, risk_rescored_at = :rescored_at',
+            ConditionExpression=condition,
+            ExpressionAttributeValues=values
+        )
+        return True
+
+    except dynamodb.meta.client.exceptions.ConditionalCheckFailedException:
+        return False
+
+def convert_decimals(obj):
+    """Convertir Decimals a tipos serializables (clave de reanudación del scan)"""
+    if isinstance(obj, list):
+        return [convert_decimals(item) for item in obj]
+    elif isinstance(obj, dict):
+        return {key: convert_decimals(value) for key, value in obj.items()}
+    elif isinstance(obj, Decimal):
+        return int(obj) if obj % 1 == 0 else float(obj)
+    return obj
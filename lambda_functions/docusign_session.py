@@ -0,0 +1,128 @@
+"""
+Sesión de DocuSign compartida entre invocaciones en caliente.
+
+La configuración de SSM se guarda con un TTL y el ApiClient se crea una sola
+vez por contenedor, así su pool de conexiones se reutiliza. El token JWT se
+renueva solo cuando le queda menos del margen configurado, en vez de pedir
+uno nuevo (con firma RSA y dos viajes de red) en cada llamada. Todo el estado
+está protegido por un lock, así que varios hilos pueden crear envelopes en
+paralelo con el mismo cliente. Se incluye con docusign_signature_manager.
+"""
+
+import logging
+import os
+import threading
+import time
+
+try:
+    from docusign_esign import ApiClient
+    from docusign_esign.client.api_response import RESTClientObject
+except ImportError:
+    ApiClient = None
+    RESTClientObject = None
+
+logger = logging.getLogger()
+
+CONFIG_TTL_SECONDS = int(os.environ.get('DOCUSIGN_CONFIG_TTL_SECONDS', 300))
+TOKEN_LIFETIME_SECONDS = 3600
+TOKEN_REFRESH_MARGIN_SECONDS = int(os.environ.get('DOCUSIGN_TOKEN_REFRESH_MARGIN_SECONDS', 300))
+# Peticiones en paralelo permitidas hacia DocuSign (el SDK usa 4 por defecto)
+API_POOL_MAXSIZE = int(os.environ.get('DOCUSIGN_POOL_MAXSIZE', 10))
+OAUTH_HOST_NAME = 'account-d.docusign.com'
+
+class DocuSignSession:
+    """
+    Configuración, cliente y token de DocuSign con caducidad
+    """
+
+    def __init__(self, ssm, parameter_names, config_ttl_seconds=CONFIG_TTL_SECONDS,
+                 refresh_margin_seconds=TOKEN_REFRESH_MARGIN_SECONDS):
+        self._ssm = ssm
+        self._parameter_names = parameter_names
+        self._config_ttl_seconds = config_ttl_seconds
+        self._refresh_margin_seconds = refresh_margin_seconds
+        self._lock = threading.RLock()
+
+        self._config = {}
+        self._config_expires_at = 0
+        self._api_client = None
+        self._client_config = None
+        self._token_expires_at = 0
+
+    def get_config(self):
+        """
+        Parámetros de SSM, recargados al vencer el TTL. {} si no se pudieron leer.
+        """
+        with self._lock:
+            if self._config and time.monotonic() < self._config_expires_at:
+                return self._config
+
+            config = self._load_config()
+            if config:
+                self._config = config
+                self._config_expires_at = time.monotonic() + self._config_ttl_seconds
+            return config or self._config
+
+    def get_api_client(self):
+        """
+        ApiClient con un token vigente; se renueva antes de que expire
+        """
+        with self._lock:
+            config = self.get_config()
+            if not config:
+                raise Exception("Configuración de DocuSign no disponible")
+
+            if self._api_client is None or config != self._client_config:
+                # Primer uso o credenciales rotadas en SSM: cliente nuevo
+                self._api_client = self._create_api_client(config)
+                self._client_config = config
+                self._token_expires_at = 0
+
+            if time.monotonic() >= self._token_expires_at - self._refresh_margin_seconds:
+                self._request_token(config)
+
+            return self._api_client
+
+    def invalidate_token(self):
+        """
+        Forzar un token nuevo en la próxima llamada (p. ej. tras un 401)
+        """
+        with self._lock:
+            self._token_expires_at = 0
+
+    def _load_config(self):
+        try:
+            response = self._ssm.get_parameters(
+                Names=self._parameter_names,
+                WithDecryption=True
+            )
+
+            return {param['Name'].split('/')[-1]: param['Value'] for param in response['Parameters']}
+
+        except Exception as e:
+            logger.error(f"Error cargando configuración DocuSign: {str(e)}")
+            return {}
+
+    def _create_api_client(self, config):
+        api_client = ApiClient()
+        api_client.host = config['base_url']
+        # Pool más grande que el del SDK para creación de envelopes en paralelo
+        api_client.rest_client = RESTClientObject(maxsize=API_POOL_MAXSIZE)
+        return api_client
+
+    def _request_token(self, config):
+        private_key = config['private_key'].replace('\\n', '\n')
+
+        # Fija la cabecera Authorization del cliente compartido
+        oauth_token = self._api_client.request_jwt_user_token(
+            client_id=config['integration_key'],
+            user_id=config['user_id'],
+            oauth_host_name=OAUTH_HOST_NAME,
+            private_key_bytes=private_key.encode(),
+            expires_in=TOKEN_LIFETIME_SECONDS
+        )
+
+        expires_in = int(oauth_token.expires_in or TOKEN_LIFETIME_SECONDS)
+        self._token_expires_at = time.monotonic() + expires_in
+
+        logger.info(f"Token de DocuSign renovado (expira en {expires_in} s)")
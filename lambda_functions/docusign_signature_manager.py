@@ -3,15 +3,21 @@ import boto3
 import os
 from datetime import datetime, timedelta
 import logging
-import base64
+import random
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from decimal import Decimal
 
+from envelope_lookup import EnvelopeLookup
+from docusign_session import DocuSignSession
+from contract_pdf import CONTRACT_TEMPLATE, CUSTOMER_SIGNATURE_POSITION, COMPANY_SIGNATURE_POSITION
+
 # DocuSign imports
 try:
-    from docusign_esign import ApiClient, EnvelopesApi, EnvelopeDefinition, Document, Signer, SignHere, Tabs, Recipients
-    from docusign_esign.client.auth.oauth import OAuthToken
-    import jwt
+    from docusign_esign import EnvelopesApi, EnvelopeDefinition, Document, Signer, SignHere, Tabs, Recipients
+    from docusign_esign import CustomFields, TextCustomField
+    from urllib3.exceptions import ConnectTimeoutError, MaxRetryError, NewConnectionError
 except ImportError:
     # Fallback para desarrollo local
     print("DocuSign SDK no disponible - usando mock")
@@ -20,82 +26,46 @@ except ImportError:
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Estados desde los que se puede enviar el contrato a firma
+SIGNABLE_STATUSES = ('APPROVED', 'PROCESSING_APPROVED')
+
+# Envío masivo: paralelismo acotado por los límites de la API de DocuSign
+BULK_ENVELOPE_CONCURRENCY = int(os.environ.get('BULK_ENVELOPE_CONCURRENCY', 4))
+BULK_ENVELOPE_RETRIES = int(os.environ.get('BULK_ENVELOPE_RETRIES', 3))
+# Rechazadas antes de crear el envelope: se pueden reintentar sin más
+PRE_SEND_DOCUSIGN_STATUSES = (401, 429)
+# El POST pudo haber creado el envelope: antes de reintentar se busca por contract_id
+AMBIGUOUS_DOCUSIGN_STATUSES = (500, 502, 503, 504)
+
 # Clientes AWS
 dynamodb = boto3.resource('dynamodb')
 s3 = boto3.client('s3')
 ssm = boto3.client('ssm')
 sns = boto3.client('sns')
 
+# Envelope → (contract_id, signature_id), cacheado entre invocaciones en caliente
+envelope_lookup = EnvelopeLookup(dynamodb, os.environ['CONTRACTS_TABLE'], os.environ['SIGNATURES_TABLE'])
+
+# Configuración SSM, ApiClient y token de DocuSign compartidos entre invocaciones
+docusign_session = DocuSignSession(ssm, [
+    os.environ['DOCUSIGN_INTEGRATION_KEY'],
+    os.environ['DOCUSIGN_USER_ID'],
+    os.environ['DOCUSIGN_ACCOUNT_ID'],
+    os.environ['DOCUSIGN_PRIVATE_KEY'],
+    os.environ['DOCUSIGN_BASE_URL']
+])
+
 class DocuSignManager:
     def __init__(self):
-        self.config = self._load_docusign_config()
+        # Configuración, cliente y token vienen de la sesión del contenedor
+        self.config = docusign_session.get_config()
         self.api_client = None
         self._authenticate()
     
-    def _load_docusign_config(self):
-        """Cargar configuración de DocuSign desde SSM"""
-        try:
-            parameters = [
-                os.environ['DOCUSIGN_INTEGRATION_KEY'],
-                os.environ['DOCUSIGN_USER_ID'],
-                os.environ['DOCUSIGN_ACCOUNT_ID'],
-                os.environ['DOCUSIGN_PRIVATE_KEY'],
-                os.environ['DOCUSIGN_BASE_URL']
-            ]
-            
-            response = ssm.get_parameters(
-                Names=parameters,
-                WithDecryption=True
-            )
-            
-            config = {}
-            for param in response['Parameters']:
-                key = param['Name'].split('/')[-1]
-                config[key] = param['Value']
-            
-            return config
-            
-        except Exception as e:
-            logger.error(f"Error cargando configuración DocuSign: {str(e)}")
-            return {}
-    
     def _authenticate(self):
-        """Autenticar con DocuSign usando JWT"""
+        """Obtener el cliente autenticado con JWT (token reutilizado mientras sea válido)"""
         try:
-            if not self.config:
-                raise Exception("Configuración de DocuSign no disponible")
-            
-            # Crear JWT token
-            private_key = self.config['private_key'].replace('\\n', '\n')
-            
-            now = datetime.utcnow()
-            token_payload = {
-                'iss': self.config['integration_key'],
-                'sub': self.config['user_id'],
-                'aud': 'account-d.docusign.com',
-                'iat': now,
-                'exp': now + timedelta(hours=1),
-                'scope': 'signature impersonation'
-            }
-            
-            jwt_token = jwt.encode(token_payload, private_key, algorithm='RS256')
-            
-            # Configurar API client
-            self.api_client = ApiClient()
-            self.api_client.host = self.config['base_url']
-            
-            # Obtener access token
-            oauth_token = self.api_client.request_jwt_user_token(
-                client_id=self.config['integration_key'],
-                user_id=self.config['user_id'],
-                oauth_host_name='account-d.docusign.com',
-                private_key_bytes=private_key.encode(),
-                expires_in=3600
-            )
-            
-            self.api_client.set_default_header('Authorization', f'Bearer {oauth_token.access_token}')
-            
-            logger.info("Autenticación con DocuSign exitosa")
+            self.api_client = docusign_session.get_api_client()
             
         except Exception as e:
             logger.error(f"Error autenticando con DocuSign: {str(e)}")
@@ -107,12 +77,9 @@ class DocuSignManager:
             if not self.api_client:
                 raise Exception("Cliente DocuSign no autenticado")
             
-            # Generar documento PDF del contrato
-            contract_pdf = self._generate_contract_pdf(contract_data)
-            
-            # Crear documento DocuSign
+            # Crear documento DocuSign con el PDF del contrato
             document = Document(
-                document_base64=base64.b64encode(contract_pdf).decode(),
+                document_base64=self._generate_contract_pdf_base64(contract_data),
                 name=f"Contrato_{contract_data['contract_id']}.pdf",
                 file_extension="pdf",
                 document_id="1"
@@ -121,12 +88,15 @@ class DocuSignManager:
             # Configurar firmantes
             signers = self._create_signers(contract_data)
             
-            # Crear envelope
+            # Crear envelope; el campo contract_id permite encontrarlo si la respuesta se pierde
             envelope_definition = EnvelopeDefinition(
                 email_subject=f"Firma de Contrato - {contract_data['customer_name']}",
                 email_message=self._get_email_message(contract_data),
                 documents=[document],
                 recipients=Recipients(signers=signers),
+                custom_fields=CustomFields(text_custom_fields=[
+                    TextCustomField(name='contract_id', value=contract_data['contract_id'], show='false')
+                ]),
                 status="sent"
             )
             
@@ -163,8 +133,8 @@ class DocuSignManager:
                 SignHere(
                     document_id="1",
                     page_number="1",
-                    x_position="100",
-                    y_position="200"
+                    x_position=str(CUSTOMER_SIGNATURE_POSITION[0]),
+                    y_position=str(CUSTOMER_SIGNATURE_POSITION[1])
                 )
             ])
         )
@@ -180,8 +150,8 @@ class DocuSignManager:
                 SignHere(
                     document_id="1",
                     page_number="1",
-                    x_position="400",
-                    y_position="200"
+                    x_position=str(COMPANY_SIGNATURE_POSITION[0]),
+                    y_position=str(COMPANY_SIGNATURE_POSITION[1])
                 )
             ])
         )
@@ -189,43 +159,9 @@ class DocuSignManager:
         
         return signers
     
-    def _generate_contract_pdf(self, contract_data):
-        """Generar PDF del contrato"""
-        # En un entorno real, usarías una librería como ReportLab o WeasyPrint
-        # Por ahora, creamos un PDF simple con texto
-        
-        contract_content = f"""
-CONTRATO DE SERVICIOS DE SEGUIMIENTO VEHICULAR
-
-Contrato ID: {contract_data['contract_id']}
-Fecha: {datetime.now().strftime('%Y-%m-%d')}
-
-CLIENTE:
-Nombre: {contract_data['customer_name']}
-Email: {contract_data['customer_email']}
-Empresa: {contract_data.get('company_name', 'N/A')}
-
-SERVICIOS:
-Tipo de Contrato: {contract_data['contract_type']}
-Cantidad de Vehículos: {contract_data['vehicle_count']}
-Tarifa Mensual: ${contract_data['monthly_fee']:.2f} por vehículo
-Duración: {contract_data['contract_duration_months']} meses
-Valor Total: ${contract_data['total_contract_value']:.2f}
-
-TÉRMINOS Y CONDICIONES:
-1. El cliente acepta los términos de servicio
-2. El pago se realizará mensualmente
-3. El servicio incluye monitoreo 24/7
-4. Soporte técnico incluido
-
-FIRMAS:
-Cliente: ________________    Fecha: ________
-
-Empresa: ________________   Fecha: ________
-        """
-        
-        # Convertir a bytes (simulando PDF)
-        return contract_content.encode('utf-8')
+    def _generate_contract_pdf_base64(self, contract_data):
+        """Generar PDF del contrato (base64) desde la plantilla precompilada"""
+        return CONTRACT_TEMPLATE.render_base64(contract_data)
     
     def _get_email_message(self, contract_data):
         """Obtener mensaje de email para firma"""
@@ -268,6 +204,24 @@ Equipo de Seguimiento Vehicular
         except Exception as e:
             logger.error(f"Error obteniendo estado del envelope: {str(e)}")
             raise
+    
+    def find_envelope_for_contract(self, contract_id, since):
+        """Envelope enviado para el contrato desde `since` (campo contract_id), o None"""
+        envelopes_api = EnvelopesApi(self.api_client)
+        results = envelopes_api.list_status_changes(
+            account_id=self.config['account_id'],
+            from_date=since.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            custom_field=f"contract_id={contract_id}"
+        )
+        
+        for envelope in results.envelopes or []:
+            if envelope.status != 'voided':
+                return {
+                    'envelope_id': envelope.envelope_id,
+                    'status': envelope.status,
+                    'uri': envelope.envelope_uri
+                }
+        return None
 
 def handler(event, context):
     """
@@ -280,6 +234,8 @@ def handler(event, context):
         
         if action == 'create_envelope':
             return handle_create_envelope(event)
+        elif action == 'create_envelopes_bulk':
+            return handle_create_envelopes_bulk(event)
         elif action == 'get_status':
             return handle_get_status(event)
         elif action == 'process_signed_contract':
@@ -314,7 +270,7 @@ def handle_create_envelope(event):
         contract_data = response['Item']
         
         # Verificar que el contrato está aprobado
-        if contract_data.get('status') != 'APPROVED':
+        if contract_data.get('status') not in SIGNABLE_STATUSES:
             raise ValueError(f"Contrato no está aprobado: {contract_data.get('status')}")
         
         # Crear envelope en DocuSign
@@ -323,43 +279,12 @@ def handle_create_envelope(event):
         
         # Guardar información de firma en DynamoDB
         signatures_table = dynamodb.Table(os.environ['SIGNATURES_TABLE'])
-        signature_record = {
-            'signature_id': str(uuid.uuid4()),
-            'contract_id': contract_id,
-            'envelope_id': envelope_result['envelope_id'],
-            'status': 'SENT',
-            'created_at': int(datetime.utcnow().timestamp()),
-            'docusign_uri': envelope_result.get('uri', ''),
-            'signers': [
-                {
-                    'email': contract_data['customer_email'],
-                    'name': contract_data['customer_name'],
-                    'role': 'CUSTOMER',
-                    'status': 'PENDING'
-                },
-                {
-                    'email': 'contracts@vehicletracking.com',
-                    'name': 'Representante Legal',
-                    'role': 'COMPANY',
-                    'status': 'PENDING'
-                }
-            ]
-        }
+        signature_record = build_signature_record(contract_data, envelope_result)
         
         signatures_table.put_item(Item=signature_record)
         
         # Actualizar estado del contrato
-        contracts_table.update_item(
-            Key={'contract_id': contract_id},
-            UpdateExpression='SET #status = :status, envelope_id = :envelope_id, signature_sent_at = :sent_at, updated_at = :updated_at',
-            ExpressionAttributeNames={'#status': 'status'},
-            ExpressionAttributeValues={
-                ':status': 'PENDING_SIGNATURE',
-                ':envelope_id': envelope_result['envelope_id'],
-                ':sent_at': int(datetime.utcnow().timestamp()),
-                ':updated_at': int(datetime.utcnow().timestamp())
-            }
-        )
+        mark_contract_pending_signature(contracts_table, contract_id, envelope_result['envelope_id'])
         
         logger.info(f"Envelope creado para contrato {contract_id}: {envelope_result['envelope_id']}")
         
@@ -380,6 +305,188 @@ def handle_create_envelope(event):
             'body': json.dumps({'error': str(e)})
         }
 
+def build_signature_record(contract_data, envelope_result):
+    """Registro de firma del envelope creado"""
+    return {
+        'signature_id': str(uuid.uuid4()),
+        'contract_id': contract_data['contract_id'],
+        'envelope_id': envelope_result['envelope_id'],
+        'status': 'SENT',
+        'created_at': int(datetime.utcnow().timestamp()),
+        'docusign_uri': envelope_result.get('uri', ''),
+        'signers': [
+            {
+                'email': contract_data['customer_email'],
+                'name': contract_data['customer_name'],
+                'role': 'CUSTOMER',
+                'status': 'PENDING'
+            },
+            {
+                'email': 'contracts@vehicletracking.com',
+                'name': 'Representante Legal',
+                'role': 'COMPANY',
+                'status': 'PENDING'
+            }
+        ]
+    }
+
+def mark_contract_pending_signature(contracts_table, contract_id, envelope_id):
+    """Contrato enviado a firma con su envelope"""
+    contracts_table.update_item(
+        Key={'contract_id': contract_id},
+        UpdateExpression='SET #status = :status, envelope_id = :envelope_id, signature_sent_at = :sent_at, updated_at = :updated_at',
+        ExpressionAttributeNames={'#status': 'status'},
+        ExpressionAttributeValues={
+            ':status': 'PENDING_SIGNATURE',
+            ':envelope_id': envelope_id,
+            ':sent_at': int(datetime.utcnow().timestamp()),
+            ':updated_at': int(datetime.utcnow().timestamp())
+        }
+    )
+
+def handle_create_envelopes_bulk(event):
+    """
+    Crear envelopes para una lista de contratos aprobados.
+    Lee los contratos por lotes, crea los envelopes con paralelismo acotado
+    y guarda los registros de firma con escrituras por lotes. Devuelve el
+    resultado de cada contrato; un fallo no detiene al resto.
+    """
+    contract_ids = list(dict.fromkeys(event.get('contract_ids') or []))
+    if not contract_ids:
+        raise ValueError("contract_ids es requerido")
+    
+    contracts_table = dynamodb.Table(os.environ['CONTRACTS_TABLE'])
+    signatures_table = dynamodb.Table(os.environ['SIGNATURES_TABLE'])
+    contracts = batch_get_contracts(contract_ids)
+    
+    results = {}
+    eligible = []
+    for contract_id in contract_ids:
+        contract = contracts.get(contract_id)
+        if not contract:
+            results[contract_id] = {'status': 'NOT_FOUND'}
+        elif contract.get('status') not in SIGNABLE_STATUSES:
+            results[contract_id] = {'status': 'SKIPPED', 'reason': f"Estado {contract.get('status')}"}
+        else:
+            eligible.append(contract)
+    
+    if eligible:
+        docusign_manager = DocuSignManager()
+        if not docusign_manager.api_client:
+            raise Exception("Cliente DocuSign no autenticado")
+        
+        # Los registros de firma se escriben de a 25 a medida que terminan los envelopes
+        with signatures_table.batch_writer() as signatures_batch, \
+                ThreadPoolExecutor(max_workers=max(1, min(BULK_ENVELOPE_CONCURRENCY, len(eligible)))) as executor:
+            futures = {
+                executor.submit(send_contract_envelope, docusign_manager, contracts_table, contract): contract
+                for contract in eligible
+            }
+            
+            for done, future in enumerate(as_completed(futures), start=1):
+                contract = futures[future]
+                contract_id = contract['contract_id']
+                try:
+                    envelope_result = future.result()
+                    signature_record = build_signature_record(contract, envelope_result)
+                    signatures_batch.put_item(Item=signature_record)
+                    results[contract_id] = {
+                        'status': 'SENT',
+                        'envelope_id': envelope_result['envelope_id'],
+                        'signature_id': signature_record['signature_id'],
+                        'customer_name': contract.get('customer_name'),
+                        'customer_email': contract.get('customer_email'),
+                        'vehicle_count': int(contract.get('vehicle_count', 0))
+                    }
+                except Exception as e:
+                    results[contract_id] = {'status': 'FAILED', 'error': str(e)}
+                
+                logger.info(f"Envío masivo {done}/{len(eligible)}: contrato {contract_id} "
+                            f"{results[contract_id]['status']}")
+    
+    summary = {}
+    for result in results.values():
+        summary[result['status']] = summary.get(result['status'], 0) + 1
+    
+    logger.info(f"Envío masivo completado: {summary}")
+    
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'message': 'Envío masivo completado',
+            'summary': summary,
+            'results': [{'contract_id': contract_id, **results[contract_id]} for contract_id in contract_ids]
+        })
+    }
+
+def batch_get_contracts(contract_ids):
+    """Contratos por ID con BatchGetItem (100 claves por llamada)"""
+    table_name = os.environ['CONTRACTS_TABLE']
+    contracts = {}
+    
+    for start in range(0, len(contract_ids), 100):
+        request = {table_name: {'Keys': [{'contract_id': contract_id} for contract_id in contract_ids[start:start + 100]]}}
+        attempt = 0
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            for item in response.get('Responses', {}).get(table_name, []):
+                contracts[item['contract_id']] = item
+            
+            request = response.get('UnprocessedKeys') or None
+            if request:
+                attempt += 1
+                time.sleep(min(2, 0.05 * (2 ** attempt)))
+    
+    return contracts
+
+def send_contract_envelope(docusign_manager, contracts_table, contract):
+    """
+    Crear el envelope de un contrato y marcarlo como pendiente de firma.
+    create_envelope no es idempotente: solo se reintenta directamente lo que
+    DocuSign rechazó antes de crear (401, 429, sin conexión). Tras un 5xx el
+    envelope pudo haberse creado, así que antes de reintentar se busca uno
+    enviado para el contrato y, si existe, se usa ese.
+    """
+    # Margen por desfase de reloj con DocuSign
+    since = datetime.utcnow() - timedelta(minutes=5)
+    attempt = 0
+    while True:
+        try:
+            # Renueva el token compartido si está por vencer
+            docusign_manager.api_client = docusign_session.get_api_client()
+            envelope_result = docusign_manager.create_envelope_for_contract(contract)
+            break
+        except Exception as e:
+            status = getattr(e, 'status', None)
+            ambiguous = status in AMBIGUOUS_DOCUSIGN_STATUSES
+            if attempt >= BULK_ENVELOPE_RETRIES or not (ambiguous or status in PRE_SEND_DOCUSIGN_STATUSES
+                                                        or connection_refused(e)):
+                raise
+            if status == 401:
+                # Token revocado antes de su vencimiento: pedir uno nuevo
+                docusign_session.invalidate_token()
+            delay = 1.0 * (2 ** attempt) * (0.5 + random.random())
+            logger.warning(f"DocuSign respondió {status or type(e).__name__} para {contract['contract_id']}; "
+                           f"reintento en {delay:.1f}s")
+            time.sleep(delay)
+            attempt += 1
+        
+        if ambiguous:
+            envelope_result = docusign_manager.find_envelope_for_contract(contract['contract_id'], since)
+            if envelope_result:
+                logger.info(f"Envelope {envelope_result['envelope_id']} ya creado para {contract['contract_id']}; "
+                            "no se reenvía")
+                break
+    
+    mark_contract_pending_signature(contracts_table, contract['contract_id'], envelope_result['envelope_id'])
+    return envelope_result
+
+def connection_refused(error):
+    """La solicitud no llegó a DocuSign (no se pudo conectar): reintentar no duplica el envelope"""
+    if isinstance(error, MaxRetryError):
+        error = error.reason
+    return isinstance(error, (NewConnectionError, ConnectTimeoutError))
+
 def handle_get_status(event):
     """Obtener estado de firma"""
     try:
@@ -427,17 +534,21 @@ def handle_process_signed_contract(event):
             }
         )
         
-        # Actualizar registro de firma
-        signatures_table = dynamodb.Table(os.environ['SIGNATURES_TABLE'])
-        signatures_table.update_item(
-            Key={'envelope_id': envelope_id},
-            UpdateExpression='SET #status = :status, completed_at = :completed_at',
-            ExpressionAttributeNames={'#status': 'status'},
-            ExpressionAttributeValues={
-                ':status': 'COMPLETED',
-                ':completed_at': int(datetime.utcnow().timestamp())
-            }
-        )
+        # Actualizar registro de firma (la tabla se indexa por signature_id)
+        envelope_ref = envelope_lookup.resolve(envelope_id)
+        if envelope_ref and envelope_ref.signature_id:
+            signatures_table = dynamodb.Table(os.environ['SIGNATURES_TABLE'])
+            signatures_table.update_item(
+                Key={'signature_id': envelope_ref.signature_id},
+                UpdateExpression='SET #status = :status, completed_at = :completed_at',
+                ExpressionAttributeNames={'#status': 'status'},
+                ExpressionAttributeValues={
+                    ':status': 'COMPLETED',
+                    ':completed_at': int(datetime.utcnow().timestamp())
+                }
+            )
+        else:
+            logger.warning(f"No se encontró registro de firma para envelope {envelope_id}")
         
         # Enviar notificación de contrato firmado
         sns.publish(
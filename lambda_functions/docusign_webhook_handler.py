@@ -7,26 +7,39 @@ import hmac
 import hashlib
 import base64
 
+from envelope_lookup import EnvelopeLookup
+
 # Configurar logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Ingesta de webhooks: deduplicación y cola de procesamiento (sin cola, se procesa en línea)
+WEBHOOK_EVENTS_TABLE = os.environ.get('WEBHOOK_EVENTS_TABLE', '')
+WEBHOOK_QUEUE_URL = os.environ.get('WEBHOOK_QUEUE_URL', '')
+WEBHOOK_EVENT_TTL_DAYS = int(os.environ.get('WEBHOOK_EVENT_TTL_DAYS', 7))
+
 # Clientes AWS
 dynamodb = boto3.resource('dynamodb')
 sns = boto3.client('sns')
+sqs = boto3.client('sqs')
 lambda_client = boto3.client('lambda')
 
+# Envelope → (contract_id, signature_id), cacheado entre invocaciones en caliente
+envelope_lookup = EnvelopeLookup(dynamodb, os.environ['CONTRACTS_TABLE'], os.environ['SIGNATURES_TABLE'])
+
 def handler(event, context):
     """
-    Handler para webhooks de DocuSign
-    Procesa eventos de firma, rechazo, etc.
+    Handler para webhooks de DocuSign.
+    Desde API Gateway: verifica, deduplica, encola y responde de inmediato.
+    Desde SQS: procesa los eventos encolados (firma, rechazo, etc.).
     """
+    if event.get('Records') and event['Records'][0].get('eventSource') == 'aws:sqs':
+        return process_webhook_batch(event['Records'])
+    
     try:
-        logger.info(f"Webhook recibido: {json.dumps(event)}")
-        
         # Extraer datos del webhook
         body = event.get('body', '{}')
-        headers = event.get('headers', {})
+        headers = event.get('headers') or {}
         
         # Verificar autenticidad del webhook (opcional)
         if not verify_webhook_signature(body, headers):
@@ -36,26 +49,121 @@ def handler(event, context):
         # Parsear datos del webhook
         webhook_data = json.loads(body) if isinstance(body, str) else body
         
-        # Procesar evento según el tipo
         event_type = webhook_data.get('event')
         envelope_data = webhook_data.get('data', {}).get('envelopeData', {})
         
-        if event_type == 'envelope-completed':
-            return handle_envelope_completed(envelope_data)
-        elif event_type == 'envelope-declined':
-            return handle_envelope_declined(envelope_data)
-        elif event_type == 'envelope-voided':
-            return handle_envelope_voided(envelope_data)
-        elif event_type == 'recipient-completed':
-            return handle_recipient_completed(envelope_data)
-        else:
+        if event_type not in WEBHOOK_EVENT_HANDLERS:
             logger.info(f"Evento no procesado: {event_type}")
             return create_response(200, {'message': f'Evento {event_type} recibido pero no procesado'})
+        
+        if not WEBHOOK_QUEUE_URL:
+            return process_webhook_event(event_type, envelope_data)
+        
+        # DocuSign reintenta los webhooks: cada evento se encola una sola vez
+        event_id = get_webhook_event_id(webhook_data, body)
+        if not register_webhook_event(event_id, event_type, envelope_data.get('envelopeId')):
+            logger.info(f"Webhook duplicado ignorado: {event_id}")
+            return create_response(200, {'message': 'Evento duplicado', 'event_id': event_id})
+        
+        try:
+            enqueue_webhook_event(event_id, event_type, envelope_data)
+        except Exception:
+            # Sin encolar, el reintento de DocuSign debe poder registrarlo de nuevo
+            release_webhook_event(event_id)
+            raise
+        
+        logger.info(f"Webhook {event_type} encolado: {event_id}")
+        return create_response(200, {'message': 'Evento recibido', 'event_id': event_id})
             
     except Exception as e:
         logger.error(f"Error procesando webhook: {str(e)}")
         return create_response(500, {'error': 'Error procesando webhook'})
 
+def process_webhook_event(event_type, envelope_data):
+    """Aplicar la transición de estado del evento"""
+    return WEBHOOK_EVENT_HANDLERS[event_type](envelope_data)
+
+def process_webhook_batch(records):
+    """
+    Procesar eventos encolados; solo se reintentan los que fallan.
+    La cola es FIFO por envelope: tras un fallo, el resto del lote también se
+    reintenta para no aplicar eventos de un envelope fuera de orden.
+    """
+    failures = []
+    
+    for record in records:
+        if failures:
+            failures.append({'itemIdentifier': record['messageId']})
+            continue
+        
+        try:
+            message = json.loads(record['body'])
+            response = process_webhook_event(message['event_type'], message['envelope_data'])
+            
+            # 404: el índice de envelopes puede no reflejar aún un envelope recién creado
+            if response['statusCode'] >= 500 or response['statusCode'] == 404:
+                raise Exception(f"Evento {message['event_id']} terminó con estado {response['statusCode']}")
+                
+        except Exception as e:
+            logger.error(f"Error procesando mensaje {record.get('messageId')}: {str(e)}")
+            failures.append({'itemIdentifier': record['messageId']})
+    
+    return {'batchItemFailures': failures}
+
+def get_webhook_event_id(webhook_data, body):
+    """
+    ID estable del evento: los reintentos de DocuSign reenvían el mismo evento
+    """
+    envelope_id = webhook_data.get('data', {}).get('envelopeData', {}).get('envelopeId', '')
+    generated_at = webhook_data.get('generatedDateTime')
+    if generated_at:
+        return f"{envelope_id}#{webhook_data.get('event')}#{generated_at}"
+    
+    raw_body = body if isinstance(body, str) else json.dumps(body, sort_keys=True)
+    return hashlib.sha256(raw_body.encode('utf-8')).hexdigest()
+
+def register_webhook_event(event_id, event_type, envelope_id):
+    """
+    Escritura condicional en la tabla de idempotencia. False si ya existía.
+    """
+    events_table = dynamodb.Table(WEBHOOK_EVENTS_TABLE)
+    now = int(datetime.utcnow().timestamp())
+    
+    try:
+        events_table.put_item(
+            Item={
+                'event_id': event_id,
+                'event_type': event_type,
+                'envelope_id': envelope_id or 'unknown',
+                'received_at': now,
+                'ttl': now + WEBHOOK_EVENT_TTL_DAYS * 86400
+            },
+            ConditionExpression='attribute_not_exists(event_id)'
+        )
+        return True
+        
+    except events_table.meta.client.exceptions.ConditionalCheckFailedException:
+        return False
+
+def release_webhook_event(event_id):
+    try:
+        dynamodb.Table(WEBHOOK_EVENTS_TABLE).delete_item(Key={'event_id': event_id})
+    except Exception as e:
+        logger.error(f"Error liberando evento {event_id}: {str(e)}")
+
+def enqueue_webhook_event(event_id, event_type, envelope_data):
+    """Encolar el evento; los eventos de un mismo envelope se procesan en orden"""
+    sqs.send_message(
+        QueueUrl=WEBHOOK_QUEUE_URL,
+        MessageBody=json.dumps({
+            'event_id': event_id,
+            'event_type': event_type,
+            'envelope_data': envelope_data
+        }),
+        MessageGroupId=envelope_data.get('envelopeId') or 'unknown',
+        MessageDeduplicationId=hashlib.sha256(event_id.encode('utf-8')).hexdigest()
+    )
+
 def verify_webhook_signature(body, headers):
     """Verificar firma del webhook de DocuSign"""
     try:
@@ -90,11 +198,12 @@ def handle_envelope_completed(envelope_data):
         
         logger.info(f"Envelope completado: {envelope_id}")
         
-        # Buscar contrato asociado
-        contract_id = find_contract_by_envelope(envelope_id)
-        if not contract_id:
+        # Buscar contrato y registro de firma asociados (una consulta indexada)
+        envelope_ref = find_contract_by_envelope(envelope_id)
+        if not envelope_ref:
             logger.error(f"No se encontró contrato para envelope {envelope_id}")
             return create_response(404, {'error': 'Contrato no encontrado'})
+        contract_id = envelope_ref.contract_id
         
         # Actualizar estado del contrato
         contracts_table = dynamodb.Table(os.environ['CONTRACTS_TABLE'])
@@ -111,15 +220,9 @@ def handle_envelope_completed(envelope_data):
         
         # Actualizar registro de firmas
         signatures_table = dynamodb.Table(os.environ['SIGNATURES_TABLE'])
+        signature_record = get_signature_record(envelope_ref)
         
-        # Buscar registro de firma por envelope_id
-        response = signatures_table.scan(
-            FilterExpression='envelope_id = :envelope_id',
-            ExpressionAttributeValues={':envelope_id': envelope_id}
-        )
-        
-        if response['Items']:
-            signature_record = response['Items'][0]
+        if signature_record:
             
             # Actualizar estado de todos los firmantes
             updated_signers = []
@@ -170,9 +273,10 @@ def handle_envelope_declined(envelope_data):
         logger.info(f"Envelope rechazado: {envelope_id}, razón: {decline_reason}")
         
         # Buscar contrato asociado
-        contract_id = find_contract_by_envelope(envelope_id)
-        if not contract_id:
+        envelope_ref = find_contract_by_envelope(envelope_id)
+        if not envelope_ref:
             return create_response(404, {'error': 'Contrato no encontrado'})
+        contract_id = envelope_ref.contract_id
         
         # Actualizar estado del contrato
         contracts_table = dynamodb.Table(os.environ['CONTRACTS_TABLE'])
@@ -189,7 +293,7 @@ def handle_envelope_declined(envelope_data):
         )
         
         # Actualizar registro de firmas
-        update_signature_status(envelope_id, 'DECLINED', decline_reason)
+        update_signature_status(envelope_ref, 'DECLINED', decline_reason)
         
         # Enviar notificación
         send_contract_notification(
@@ -217,9 +321,10 @@ def handle_envelope_voided(envelope_data):
         logger.info(f"Envelope anulado: {envelope_id}, razón: {void_reason}")
         
         # Buscar contrato asociado
-        contract_id = find_contract_by_envelope(envelope_id)
-        if not contract_id:
+        envelope_ref = find_contract_by_envelope(envelope_id)
+        if not envelope_ref:
             return create_response(404, {'error': 'Contrato no encontrado'})
+        contract_id = envelope_ref.contract_id
         
         # Actualizar estado del contrato
         contracts_table = dynamodb.Table(os.environ['CONTRACTS_TABLE'])
@@ -236,7 +341,7 @@ def handle_envelope_voided(envelope_data):
         )
         
         # Actualizar registro de firmas
-        update_signature_status(envelope_id, 'VOIDED', void_reason)
+        update_signature_status(envelope_ref, 'VOIDED', void_reason)
         
         # Enviar notificación
         send_contract_notification(
@@ -265,14 +370,9 @@ def handle_recipient_completed(envelope_data):
         
         # Actualizar estado del firmante específico
         signatures_table = dynamodb.Table(os.environ['SIGNATURES_TABLE'])
+        signature_record = get_signature_record(find_contract_by_envelope(envelope_id))
         
-        response = signatures_table.scan(
-            FilterExpression='envelope_id = :envelope_id',
-            ExpressionAttributeValues={':envelope_id': envelope_id}
-        )
-        
-        if response['Items']:
-            signature_record = response['Items'][0]
+        if signature_record:
             
             # Actualizar firmantes completados
             updated_signers = []
@@ -305,53 +405,48 @@ def handle_recipient_completed(envelope_data):
         return create_response(500, {'error': str(e)})
 
 def find_contract_by_envelope(envelope_id):
-    """Buscar contrato por envelope ID"""
+    """Buscar contrato y registro de firma por envelope ID (EnvelopeRef o None)"""
     try:
-        contracts_table = dynamodb.Table(os.environ['CONTRACTS_TABLE'])
-        
-        response = contracts_table.scan(
-            FilterExpression='envelope_id = :envelope_id',
-            ExpressionAttributeValues={':envelope_id': envelope_id}
-        )
-        
-        if response['Items']:
-            return response['Items'][0]['contract_id']
-        
-        return None
+        return envelope_lookup.resolve(envelope_id)
         
     except Exception as e:
         logger.error(f"Error buscando contrato por envelope: {str(e)}")
         return None
 
-def update_signature_status(envelope_id, status, reason=None):
+def get_signature_record(envelope_ref):
+    """Leer el registro de firma completo (con firmantes) por su clave"""
+    if not envelope_ref or not envelope_ref.signature_id:
+        return None
+    
+    signatures_table = dynamodb.Table(os.environ['SIGNATURES_TABLE'])
+    response = signatures_table.get_item(Key={'signature_id': envelope_ref.signature_id})
+    return response.get('Item')
+
+def update_signature_status(envelope_ref, status, reason=None):
     """Actualizar estado del registro de firma"""
     try:
+        if not envelope_ref.signature_id:
+            logger.warning(f"Contrato {envelope_ref.contract_id} sin registro de firma")
+            return
+        
         signatures_table = dynamodb.Table(os.environ['SIGNATURES_TABLE'])
         
-        response = signatures_table.scan(
-            FilterExpression='envelope_id = :envelope_id',
-            ExpressionAttributeValues={':envelope_id': envelope_id}
-        )
+        update_expression = 'SET #status = :status, updated_at = :updated_at'
+        expression_values = {
+            ':status': status,
+            ':updated_at': int(datetime.utcnow().timestamp())
+        }
         
-        if response['Items']:
-            signature_record = response['Items'][0]
-            
-            update_expression = 'SET #status = :status, updated_at = :updated_at'
-            expression_values = {
-                ':status': status,
-                ':updated_at': int(datetime.utcnow().timestamp())
-            }
-            
-            if reason:
-                update_expression += ', reason = :reason'
-                expression_values[':reason'] = reason
-            
-            signatures_table.update_item(
-                Key={'signature_id': signature_record['signature_id']},
-                UpdateExpression=update_expression,
-                ExpressionAttributeNames={'#status': 'status'},
-                ExpressionAttributeValues=expression_values
-            )
+        if reason:
+            update_expression += ', reason = :reason'
+            expression_values[':reason'] = reason
+        
+        signatures_table.update_item(
+            Key={'signature_id': envelope_ref.signature_id},
+            UpdateExpression=update_expression,
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues=expression_values
+        )
             
     except Exception as e:
         logger.error(f"Error actualizando estado de firma: {str(e)}")
@@ -416,3 +511,11 @@ def create_response(status_code, body):
         },
         'body': json.dumps(body)
     }
+
+# Eventos de DocuSign con transición de estado
+WEBHOOK_EVENT_HANDLERS = {
+    'envelope-completed': handle_envelope_completed,
+    'envelope-declined': handle_envelope_declined,
+    'envelope-voided': handle_envelope_voided,
+    'recipient-completed': handle_recipient_completed
+}
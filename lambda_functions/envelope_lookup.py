@@ -0,0 +1,108 @@
+"""
+Resolución de envelope de DocuSign → (contract_id, signature_id).
+
+Usa el GSI EnvelopeIndex de la tabla de firmas (proyecta contract_id), así
+que una sola consulta indexada resuelve ambos IDs sin importar cuántos
+contratos existan. Si el envelope no tiene registro de firma, se recurre al
+EnvelopeIndex de contratos. Los resultados se guardan en memoria entre
+invocaciones en caliente: un envelope nunca cambia de contrato. Las
+búsquedas sin resultado no se guardan, porque el GSI es eventualmente
+consistente y el envelope puede estar recién creado. Se incluye con
+docusign_webhook_handler y docusign_signature_manager.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from boto3.dynamodb.conditions import Key
+
+logger = logging.getLogger()
+
+ENVELOPE_INDEX = 'EnvelopeIndex'
+CACHE_TTL_SECONDS = int(os.environ.get('ENVELOPE_CACHE_TTL_SECONDS', 3600))
+CACHE_MAX_ENTRIES = int(os.environ.get('ENVELOPE_CACHE_MAX_ENTRIES', 5000))
+
+EnvelopeRef = namedtuple('EnvelopeRef', ['contract_id', 'signature_id'])
+
+class EnvelopeLookup:
+    """
+    Caché LRU con TTL sobre las consultas por envelope_id
+    """
+
+    def __init__(self, dynamodb, contracts_table_name, signatures_table_name,
+                 ttl_seconds=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES):
+        self._contracts_table = dynamodb.Table(contracts_table_name)
+        self._signatures_table = dynamodb.Table(signatures_table_name)
+        self._ttl_seconds = ttl_seconds
+        self._max_entries = max_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def resolve(self, envelope_id):
+        """
+        EnvelopeRef del envelope, o None si no hay contrato asociado.
+        signature_id es None si el contrato aún no tiene registro de firma.
+        """
+        if not envelope_id:
+            return None
+
+        cached = self._get_cached(envelope_id)
+        if cached:
+            return cached
+
+        ref = self._query_signatures(envelope_id) or self._query_contracts(envelope_id)
+        if ref and ref.signature_id:
+            # Solo referencias completas: sin firma, el registro puede aparecer después
+            self._remember(envelope_id, ref)
+        return ref
+
+    def forget(self, envelope_id):
+        with self._lock:
+            self._cache.pop(envelope_id, None)
+
+    def _query_signatures(self, envelope_id):
+        response = self._signatures_table.query(
+            IndexName=ENVELOPE_INDEX,
+            KeyConditionExpression=Key('envelope_id').eq(envelope_id),
+            ProjectionExpression='signature_id, contract_id',
+            Limit=1
+        )
+        items = response.get('Items', [])
+        if not items:
+            return None
+        return EnvelopeRef(items[0]['contract_id'], items[0]['signature_id'])
+
+    def _query_contracts(self, envelope_id):
+        response = self._contracts_table.query(
+            IndexName=ENVELOPE_INDEX,
+            KeyConditionExpression=Key('envelope_id').eq(envelope_id),
+            ProjectionExpression='contract_id',
+            Limit=1
+        )
+        items = response.get('Items', [])
+        if not items:
+            return None
+        logger.info(f"Envelope {envelope_id} sin registro de firma; resuelto por la tabla de contratos")
+        return EnvelopeRef(items[0]['contract_id'], None)
+
+    def _get_cached(self, envelope_id):
+        with self._lock:
+            entry = self._cache.get(envelope_id)
+            if not entry:
+                return None
+            ref, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._cache[envelope_id]
+                return None
+            self._cache.move_to_end(envelope_id)
+            return ref
+
+    def _remember(self, envelope_id, ref):
+        with self._lock:
+            self._cache[envelope_id] = (ref, time.monotonic() + self._ttl_seconds)
+            self._cache.move_to_end(envelope_id)
+            while len(self._cache) > self._max_entries:
+                self._cache.popitem(last=False)
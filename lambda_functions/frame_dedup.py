@@ -0,0 +1,99 @@
+"""
+Near-duplicate frame suppression for in-cab camera frames.
+
+A 64-bit difference hash (dHash) is computed locally for each frame and
+compared with the last analyzed frame of the same vehicle. Frames within
+a small Hamming distance reuse the previous Rekognition results instead
+of paying for a new analysis. Bundled with rekognition_processor; needs
+Pillow (image-processing layer) and is disabled without it.
+"""
+
+import io
+import threading
+import time
+
+try:
+    from PIL import Image
+except ImportError:
+    # Sin Pillow no se calcula el hash y todos los frames se analizan
+    Image = None
+
+# Max differing bits (out of 64) to treat two frames as the same scene
+DEFAULT_MAX_HAMMING_DISTANCE = 6
+
+# Never reuse results older than this, even for identical frames
+DEFAULT_MAX_REUSE_AGE_SECONDS = 60
+
+HASH_SIZE = 8
+
+def dhash_available():
+    return Image is not None
+
+def dhash(image_bytes, hash_size=HASH_SIZE):
+    """
+    Difference hash of an image as an int, or None if it cannot be decoded
+    """
+    if Image is None:
+        return None
+
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            # JPEG draft mode decodes at reduced scale: much cheaper than a full decode
+            image.draft('L', (hash_size * 8, hash_size * 8))
+            pixels = list(image.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR).getdata())
+    except Exception:
+        return None
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+def hamming_distance(hash_a, hash_b):
+    return bin(hash_a ^ hash_b).count('1')
+
+class FrameHashCache:
+    """
+    Last analyzed frame per vehicle: (hash, results, analyzed_at)
+    """
+
+    def __init__(self, max_distance=DEFAULT_MAX_HAMMING_DISTANCE,
+                 max_age_seconds=DEFAULT_MAX_REUSE_AGE_SECONDS, max_vehicles=10000):
+        self.max_distance = max_distance
+        self.max_age_seconds = max_age_seconds
+        self.max_vehicles = max_vehicles
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def find_duplicate(self, vehicle_id, frame_hash):
+        """
+        Cached results of the last analyzed frame if this one is a near-duplicate
+        """
+        if frame_hash is None:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(vehicle_id)
+
+        if entry is None:
+            return None
+
+        cached_hash, results, analyzed_at = entry
+        if time.monotonic() - analyzed_at > self.max_age_seconds:
+            return None
+        if hamming_distance(cached_hash, frame_hash) > self.max_distance:
+            return None
+        return results
+
+    def remember(self, vehicle_id, frame_hash, results):
+        if frame_hash is None:
+            return
+
+        with self._lock:
+            if vehicle_id not in self._entries and len(self._entries) >= self.max_vehicles:
+                # Drop the oldest vehicle entry
+                oldest = min(self._entries, key=lambda key: self._entries[key][2])
+                del self._entries[oldest]
+            self._entries[vehicle_id] = (frame_hash, results, time.monotonic())
@@ -0,0 +1,120 @@
+"""
+Índice geoespacial por celdas geohash para posiciones de vehículos.
+
+Utilidades puras (sin AWS) compartidas por telemetry_processor, que mantiene
+la tabla vehicle-geo-index (hash: cell, range: vehicle_id), y por
+vehicle_management y panic_processor, que resuelven consultas por radio o
+bounding box leyendo solo las celdas que cubren el área. Se empaqueta junto a
+esas funciones.
+"""
+
+import math
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Precisión 5 ≈ celdas de 4.9 km x 4.9 km en el ecuador
+GEO_INDEX_PRECISION = 5
+
+# Evita que un viewport enorme dispare cientos de consultas
+MAX_COVERING_CELLS = 400
+
+EARTH_RADIUS_M = 6371008.8
+
+def _bit_counts(precision):
+    """Bits de latitud y longitud para una precisión geohash"""
+    total_bits = precision * 5
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return lat_bits, lng_bits
+
+def cell_size_degrees(precision=GEO_INDEX_PRECISION):
+    """Alto y ancho (en grados) de una celda a la precisión dada"""
+    lat_bits, lng_bits = _bit_counts(precision)
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+def _cell_indices(lat, lng, precision):
+    """Índices enteros (fila, columna) de la celda que contiene el punto"""
+    lat_bits, lng_bits = _bit_counts(precision)
+    lat_cells = 1 << lat_bits
+    lng_cells = 1 << lng_bits
+    lat_idx = min(max(int((lat + 90.0) / 180.0 * lat_cells), 0), lat_cells - 1)
+    lng_idx = min(max(int((lng + 180.0) / 360.0 * lng_cells), 0), lng_cells - 1)
+    return lat_idx, lng_idx
+
+def _encode_indices(lat_idx, lng_idx, precision):
+    """Intercalar bits de longitud/latitud y codificar en base32 geohash"""
+    lat_bits, lng_bits = _bit_counts(precision)
+    lat_pos = lat_bits - 1
+    lng_pos = lng_bits - 1
+    chars = []
+    value = 0
+
+    for bit in range(precision * 5):
+        if bit % 2 == 0:
+            value = (value << 1) | ((lng_idx >> lng_pos) & 1)
+            lng_pos -= 1
+        else:
+            value = (value << 1) | ((lat_idx >> lat_pos) & 1)
+            lat_pos -= 1
+        if bit % 5 == 4:
+            chars.append(GEOHASH_ALPHABET[value])
+            value = 0
+
+    return ''.join(chars)
+
+def encode(lat, lng, precision=GEO_INDEX_PRECISION):
+    """Geohash de un punto"""
+    lat_idx, lng_idx = _cell_indices(lat, lng, precision)
+    return _encode_indices(lat_idx, lng_idx, precision)
+
+def cells_for_bbox(min_lat, min_lng, max_lat, max_lng, precision=GEO_INDEX_PRECISION):
+    """
+    Celdas geohash que cubren el bounding box. Lanza ValueError si el área
+    requiere más de MAX_COVERING_CELLS celdas. No cruza el antimeridiano.
+    """
+    if min_lat > max_lat or min_lng > max_lng:
+        raise ValueError("Bounding box inválido")
+
+    min_lat_idx, min_lng_idx = _cell_indices(min_lat, min_lng, precision)
+    max_lat_idx, max_lng_idx = _cell_indices(max_lat, max_lng, precision)
+
+    cell_count = (max_lat_idx - min_lat_idx + 1) * (max_lng_idx - min_lng_idx + 1)
+    if cell_count > MAX_COVERING_CELLS:
+        raise ValueError(f"El área requiere {cell_count} celdas (máximo {MAX_COVERING_CELLS})")
+
+    return [
+        _encode_indices(lat_idx, lng_idx, precision)
+        for lat_idx in range(min_lat_idx, max_lat_idx + 1)
+        for lng_idx in range(min_lng_idx, max_lng_idx + 1)
+    ]
+
+def bbox_for_radius(lat, lng, radius_m):
+    """Bounding box (min_lat, min_lng, max_lat, max_lng) que contiene el círculo"""
+    delta_lat = math.degrees(radius_m / EARTH_RADIUS_M)
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    delta_lng = min(math.degrees(radius_m / (EARTH_RADIUS_M * cos_lat)), 180.0)
+
+    return (
+        max(lat - delta_lat, -90.0),
+        max(lng - delta_lng, -180.0),
+        min(lat + delta_lat, 90.0),
+        min(lng + delta_lng, 180.0)
+    )
+
+def cells_for_radius(lat, lng, radius_m, precision=GEO_INDEX_PRECISION):
+    """Celdas geohash que cubren un círculo"""
+    return cells_for_bbox(*bbox_for_radius(lat, lng, radius_m), precision=precision)
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    """Distancia en metros entre dos puntos"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+def in_bbox(lat, lng, min_lat, min_lng, max_lat, max_lng):
+    """True si el punto está dentro del bounding box"""
+    return min_lat <= lat <= max_lat and min_lng <= lng <= max_lng
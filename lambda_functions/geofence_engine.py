@@ -0,0 +1,126 @@
+"""
+Geofence evaluation for the telemetry stream.
+
+Polygons are indexed on the same geohash grid used by geo_index, so each
+position is only tested against the fences whose bounding cells contain it.
+Only enter/exit transitions are reported. Bundled with telemetry_processor.
+"""
+
+from collections import defaultdict
+
+import geo_index
+
+GEOFENCE_TYPES = ('DEPOT', 'RESTRICTED_ZONE', 'CUSTOMER_SITE')
+
+class Geofence:
+    """
+    Polygon fence; vertices are (lat, lng) pairs, closed implicitly
+    """
+
+    __slots__ = ('fence_id', 'name', 'fence_type', 'lats', 'lngs', 'bbox')
+
+    def __init__(self, fence_id, name, fence_type, vertices):
+        if len(vertices) < 3:
+            raise ValueError(f"Geofence {fence_id} needs at least 3 vertices")
+
+        self.fence_id = fence_id
+        self.name = name
+        self.fence_type = fence_type
+        self.lats = tuple(float(lat) for lat, _ in vertices)
+        self.lngs = tuple(float(lng) for _, lng in vertices)
+        self.bbox = (min(self.lats), min(self.lngs), max(self.lats), max(self.lngs))
+
+    def contains(self, lat, lng):
+        """
+        Ray casting point-in-polygon test
+        """
+        min_lat, min_lng, max_lat, max_lng = self.bbox
+        if not (min_lat <= lat <= max_lat and min_lng <= lng <= max_lng):
+            return False
+
+        lats = self.lats
+        lngs = self.lngs
+        inside = False
+        j = len(lats) - 1
+        for i in range(len(lats)):
+            if (lats[i] > lat) != (lats[j] > lat):
+                cross_lng = lngs[i] + (lat - lats[i]) * (lngs[j] - lngs[i]) / (lats[j] - lats[i])
+                if lng < cross_lng:
+                    inside = not inside
+            j = i
+        return inside
+
+class GeofenceIndex:
+    """
+    Geohash cell grid over a tenant's fences
+    """
+
+    def __init__(self, fences, precision=geo_index.GEO_INDEX_PRECISION):
+        self.precision = precision
+        self.fences = {fence.fence_id: fence for fence in fences}
+        self._cells = defaultdict(list)
+        # Fences too large for the grid are checked for every point (bbox first)
+        self._oversized = []
+
+        for fence in fences:
+            try:
+                cells = geo_index.cells_for_bbox(*fence.bbox, precision=precision)
+            except ValueError:
+                self._oversized.append(fence)
+                continue
+            for cell in cells:
+                self._cells[cell].append(fence)
+
+    def __len__(self):
+        return len(self.fences)
+
+    def fences_containing(self, lat, lng, cell=None):
+        """
+        IDs of the fences that contain the point
+        """
+        cell = cell or geo_index.encode(lat, lng, self.precision)
+        candidates = self._cells.get(cell, ())
+        inside = {fence.fence_id for fence in candidates if fence.contains(lat, lng)}
+        inside.update(fence.fence_id for fence in self._oversized if fence.contains(lat, lng))
+        return inside
+
+    def evaluate_batch(self, positions):
+        """
+        Evaluate a batch of (lat, lng) positions.
+        Points are grouped by cell so each candidate list is looked up once.
+        Returns the set of containing fence IDs per position, in input order.
+        """
+        by_cell = defaultdict(list)
+        for position_idx, (lat, lng) in enumerate(positions):
+            by_cell[geo_index.encode(lat, lng, self.precision)].append(position_idx)
+
+        result = [None] * len(positions)
+        for cell, position_indices in by_cell.items():
+            candidates = self._cells.get(cell, ())
+            for position_idx in position_indices:
+                lat, lng = positions[position_idx]
+                inside = {fence.fence_id for fence in candidates if fence.contains(lat, lng)}
+                inside.update(fence.fence_id for fence in self._oversized if fence.contains(lat, lng))
+                result[position_idx] = inside
+        return result
+
+def diff_transitions(vehicle_id, previous, current, fences, timestamp=None):
+    """
+    Enter/exit events between two membership sets
+    """
+    events = []
+    for fence_id in sorted(current - previous):
+        events.append(_transition_event('ENTER', vehicle_id, fences.get(fence_id), fence_id, timestamp))
+    for fence_id in sorted(previous - current):
+        events.append(_transition_event('EXIT', vehicle_id, fences.get(fence_id), fence_id, timestamp))
+    return events
+
+def _transition_event(transition, vehicle_id, fence, fence_id, timestamp):
+    return {
+        'transition': transition,
+        'vehicle_id': vehicle_id,
+        'fence_id': fence_id,
+        'fence_name': fence.name if fence else None,
+        'fence_type': fence.fence_type if fence else None,
+        'timestamp': timestamp
+    }
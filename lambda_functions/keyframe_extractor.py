@@ -0,0 +1,221 @@
+"""
+Extracción de keyframes de clips MP4 para el análisis con Rekognition.
+
+Usa el binario de ffmpeg (capa Lambda en /opt/bin/ffmpeg) en uno de tres
+modos:
+  - keyframes: solo I-frames (decodifica únicamente keyframes, muy barato)
+  - scene:     frames con cambio de escena mayor al umbral
+  - interval:  un frame cada N segundos
+En todos los modos se respeta un intervalo mínimo entre frames y un
+máximo por clip. Los frames se escriben bajo analysis-required/ (lo que
+dispara rekognition_processor) con metadatos que apuntan al clip, más un
+manifiesto keyframes.json junto al clip. Se incluye con video_processor.
+
+Prueba local con un clip de ejemplo (sin AWS):
+    python keyframe_extractor.py sample.mp4 --out /tmp/frames --mode scene
+"""
+
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from datetime import datetime, timedelta
+
+logger = logging.getLogger()
+
+FFMPEG_PATH = os.environ.get('FFMPEG_PATH') or ('/opt/bin/ffmpeg' if os.path.exists('/opt/bin/ffmpeg') else 'ffmpeg')
+
+DEFAULT_MODE = os.environ.get('KEYFRAME_MODE', 'keyframes')
+DEFAULT_MIN_INTERVAL_SECONDS = float(os.environ.get('KEYFRAME_MIN_INTERVAL_SECONDS', 2))
+DEFAULT_SCENE_THRESHOLD = float(os.environ.get('KEYFRAME_SCENE_THRESHOLD', 0.3))
+DEFAULT_MAX_FRAMES = int(os.environ.get('KEYFRAME_MAX_FRAMES', 10))
+MAX_FRAME_WIDTH = int(os.environ.get('KEYFRAME_MAX_WIDTH', 1280))
+FFMPEG_TIMEOUT_SECONDS = int(os.environ.get('KEYFRAME_FFMPEG_TIMEOUT', 120))
+
+ANALYSIS_PREFIX = 'analysis-required'
+MODES = ('keyframes', 'scene', 'interval')
+
+_PTS_TIME_PATTERN = re.compile(r'\bpts_time:\s*(-?[\d.]+)')
+
+class KeyframeExtractionError(Exception):
+    pass
+
+def build_ffmpeg_command(input_path, output_pattern, mode=DEFAULT_MODE, min_interval=DEFAULT_MIN_INTERVAL_SECONDS,
+                         scene_threshold=DEFAULT_SCENE_THRESHOLD, max_frames=DEFAULT_MAX_FRAMES):
+    """
+    Comando ffmpeg para el modo pedido; showinfo reporta el pts de cada frame emitido
+    """
+    if mode not in MODES:
+        raise ValueError(f"Modo de extracción no soportado: {mode}")
+
+    # Primer frame siempre; luego al menos min_interval segundos entre frames
+    spacing = f"(isnan(prev_selected_t)+gte(t-prev_selected_t,{min_interval}))"
+
+    command = [FFMPEG_PATH, '-hide_banner', '-nostdin', '-loglevel', 'info']
+    if mode == 'keyframes':
+        # El decodificador descarta todo lo que no sea keyframe
+        command += ['-skip_frame', 'nokey']
+        select = f"select='{spacing}'"
+    elif mode == 'scene':
+        select = f"select='(eq(n,0)+gt(scene,{scene_threshold}))*{spacing}'"
+    else:
+        select = f"select='{spacing}'"
+
+    filters = f"{select},showinfo,scale='min({MAX_FRAME_WIDTH},iw)':-2"
+    command += [
+        '-i', input_path,
+        '-vf', filters,
+        '-vsync', 'vfr',
+        '-frames:v', str(max_frames),
+        '-q:v', '3',
+        '-an',
+        output_pattern
+    ]
+    return command
+
+def parse_frame_times(ffmpeg_stderr):
+    """
+    Segundos desde el inicio del clip de cada frame emitido, en orden
+    """
+    return [
+        float(match.group(1))
+        for line in ffmpeg_stderr.splitlines() if 'Parsed_showinfo' in line
+        for match in [_PTS_TIME_PATTERN.search(line)] if match
+    ]
+
+def extract_frames(input_path, output_dir, mode=DEFAULT_MODE, min_interval=DEFAULT_MIN_INTERVAL_SECONDS,
+                   scene_threshold=DEFAULT_SCENE_THRESHOLD, max_frames=DEFAULT_MAX_FRAMES):
+    """
+    Extraer frames JPEG a output_dir. Devuelve [(ruta, offset_segundos)].
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    output_pattern = os.path.join(output_dir, 'frame_%04d.jpg')
+    command = build_ffmpeg_command(input_path, output_pattern, mode, min_interval, scene_threshold, max_frames)
+
+    try:
+        completed = subprocess.run(command, capture_output=True, text=True, timeout=FFMPEG_TIMEOUT_SECONDS)
+    except FileNotFoundError:
+        raise KeyframeExtractionError(f"ffmpeg no encontrado en {FFMPEG_PATH}")
+    except subprocess.TimeoutExpired:
+        raise KeyframeExtractionError(f"ffmpeg excedió {FFMPEG_TIMEOUT_SECONDS}s")
+
+    if completed.returncode != 0:
+        raise KeyframeExtractionError(f"ffmpeg falló ({completed.returncode}): {completed.stderr[-500:]}")
+
+    frame_files = sorted(name for name in os.listdir(output_dir) if name.startswith('frame_') and name.endswith('.jpg'))
+    frame_times = parse_frame_times(completed.stderr)
+    if len(frame_times) < len(frame_files):
+        # Sin pts confiable: ordenar por posición con el intervalo mínimo
+        frame_times += [index * min_interval for index in range(len(frame_times), len(frame_files))]
+
+    return [(os.path.join(output_dir, name), frame_times[index]) for index, name in enumerate(frame_files)]
+
+def parse_clip_timestamp(timestamp):
+    """
+    datetime UTC del inicio del clip (ISO 8601, con o sin Z)
+    """
+    try:
+        return datetime.fromisoformat(timestamp.replace('Z', '+00:00')).replace(tzinfo=None)
+    except (AttributeError, ValueError):
+        return datetime.utcnow()
+
+def build_frame_key(vehicle_id, frame_time, index, label='frame'):
+    """
+    Clave compatible con rekognition_processor.extract_metadata_from_key:
+    analysis-required/VH001/2025/01/25/10/frame_103000_01.jpg
+    """
+    return (f"{ANALYSIS_PREFIX}/{vehicle_id}/{frame_time:%Y/%m/%d/%H}/"
+            f"{label}_{frame_time:%H%M%S}_{index:02d}.jpg")
+
+def extract_and_store_keyframes(s3, bucket, clip_key, vehicle_id, timestamp, video_type, mode=DEFAULT_MODE,
+                                max_frames=DEFAULT_MAX_FRAMES, min_interval=DEFAULT_MIN_INTERVAL_SECONDS):
+    """
+    Descargar el clip de S3, extraer frames, subirlos bajo analysis-required/
+    y escribir el manifiesto junto al clip. Devuelve las claves de los frames.
+    """
+    work_dir = tempfile.mkdtemp(prefix='keyframes-', dir='/tmp' if os.path.isdir('/tmp') else None)
+    try:
+        clip_path = os.path.join(work_dir, 'clip.mp4')
+        s3.download_file(bucket, clip_key, clip_path)
+
+        frames = extract_frames(clip_path, os.path.join(work_dir, 'frames'), mode=mode,
+                                min_interval=min_interval, max_frames=max_frames)
+
+        clip_start = parse_clip_timestamp(timestamp)
+        # Los frames de pánico llevan la marca en la clave: rekognition_processor no los limita
+        label = 'panic' if video_type == 'PANIC' else 'frame'
+
+        manifest_frames = []
+        for index, (frame_path, offset_seconds) in enumerate(frames, start=1):
+            frame_time = clip_start + timedelta(seconds=offset_seconds)
+            frame_key = build_frame_key(vehicle_id, frame_time, index, label)
+
+            with open(frame_path, 'rb') as frame_file:
+                s3.put_object(
+                    Bucket=bucket,
+                    Key=frame_key,
+                    Body=frame_file,
+                    ContentType='image/jpeg',
+                    Metadata={
+                        'vehicle_id': vehicle_id,
+                        'source_clip': clip_key,
+                        'frame_offset_ms': str(int(offset_seconds * 1000)),
+                        'extraction_mode': mode
+                    }
+                )
+
+            manifest_frames.append({
+                'key': frame_key,
+                'offset_ms': int(offset_seconds * 1000),
+                'timestamp': frame_time.isoformat() + 'Z'
+            })
+
+        s3.put_object(
+            Bucket=bucket,
+            Key=manifest_key_for(clip_key),
+            Body=json.dumps({
+                'clip': clip_key,
+                'vehicle_id': vehicle_id,
+                'video_type': video_type,
+                'mode': mode,
+                'frames': manifest_frames
+            }),
+            ContentType='application/json'
+        )
+
+        logger.info(f"{len(manifest_frames)} frames extraídos de s3://{bucket}/{clip_key} (modo {mode})")
+        return [frame['key'] for frame in manifest_frames]
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def manifest_key_for(clip_key):
+    return f"{clip_key.rsplit('/', 1)[0]}/keyframes.json"
+
+def main():
+    """Extracción local sobre un clip de ejemplo (sin AWS)"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Extraer keyframes de un clip MP4')
+    parser.add_argument('clip', help='Ruta del clip MP4')
+    parser.add_argument('--out', default='keyframes', help='Directorio de salida')
+    parser.add_argument('--mode', choices=MODES, default=DEFAULT_MODE)
+    parser.add_argument('--min-interval', type=float, default=DEFAULT_MIN_INTERVAL_SECONDS)
+    parser.add_argument('--scene-threshold', type=float, default=DEFAULT_SCENE_THRESHOLD)
+    parser.add_argument('--max-frames', type=int, default=DEFAULT_MAX_FRAMES)
+    parser.add_argument('--vehicle-id', default='VH001')
+    parser.add_argument('--timestamp', default=datetime.utcnow().isoformat() + 'Z')
+    args = parser.parse_args()
+
+    frames = extract_frames(args.clip, args.out, args.mode, args.min_interval, args.scene_threshold, args.max_frames)
+    clip_start = parse_clip_timestamp(args.timestamp)
+    for index, (frame_path, offset_seconds) in enumerate(frames, start=1):
+        frame_key = build_frame_key(args.vehicle_id, clip_start + timedelta(seconds=offset_seconds), index)
+        print(f"{offset_seconds:8.2f}s  {frame_path}  →  {frame_key}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,155 @@
+"""
+Post-processing of Rekognition DetectLabels results.
+
+One detect_labels call per frame feeds every registered post-processor
+(safety rules, scene classification, emergency indicators). The call uses
+the loosest thresholds any post-processor needs; stricter ones filter the
+shared label list locally. Bundled with rekognition_processor and
+video_processor.
+"""
+
+# Loosest thresholds across post-processors (safety: 50 labels @ 70%)
+LABEL_DETECTION_PARAMS = {
+    'MaxLabels': 50,
+    'MinConfidence': 70
+}
+
+EMERGENCY_KEYWORDS = [
+    'Fire', 'Smoke', 'Accident', 'Crash', 'Blood', 'Weapon',
+    'Police', 'Ambulance', 'Emergency', 'Danger', 'Violence'
+]
+_EMERGENCY_KEYWORDS_LOWER = tuple(keyword.lower() for keyword in EMERGENCY_KEYWORDS)
+
+LABEL_POSTPROCESSORS = {}
+
+def register_label_postprocessor(name):
+    """
+    Register a function(labels) -> dict under results['analyses'][name]
+    """
+    def decorator(func):
+        LABEL_POSTPROCESSORS[name] = func
+        return func
+    return decorator
+
+def run_label_postprocessors(labels, names=None):
+    """
+    Run the selected post-processors (all by default) over one label list
+    """
+    selected = names if names is not None else LABEL_POSTPROCESSORS.keys()
+    analyses = {}
+    for name in selected:
+        try:
+            analyses[name] = LABEL_POSTPROCESSORS[name](labels)
+        except Exception as e:
+            analyses[name] = {'error': str(e)}
+    return analyses
+
+def filter_labels(labels, min_confidence=0, max_labels=None):
+    """
+    Emulate a stricter detect_labels call on an already fetched label list
+    """
+    filtered = [label for label in labels if label['Confidence'] >= min_confidence]
+    if max_labels is not None:
+        # Rekognition returns labels ordered by confidence
+        filtered = sorted(filtered, key=lambda label: label['Confidence'], reverse=True)[:max_labels]
+    return filtered
+
+@register_label_postprocessor('safety')
+def analyze_safety_labels(labels):
+    """
+    Analyze safety conditions using object detection
+    """
+    safety_analysis = {
+        'safety_alerts': [],
+        'detected_objects': []
+    }
+
+    for label in filter_labels(labels, min_confidence=70, max_labels=50):
+        label_name = label['Name'].lower()
+        confidence = label['Confidence']
+
+        # Store all detected objects
+        safety_analysis['detected_objects'].append({
+            'name': label['Name'],
+            'confidence': confidence
+        })
+
+        # Check for safety violations
+        if label_name in ['mobile phone', 'cell phone', 'smartphone']:
+            safety_analysis['safety_alerts'].append({
+                'type': 'phone_usage',
+                'confidence': confidence,
+                'severity': 'high'
+            })
+
+        elif label_name in ['alcohol', 'beer', 'wine']:
+            safety_analysis['safety_alerts'].append({
+                'type': 'alcohol_detected',
+                'confidence': confidence,
+                'severity': 'critical'
+            })
+
+        elif label_name in ['cigarette', 'smoking']:
+            safety_analysis['safety_alerts'].append({
+                'type': 'smoking',
+                'confidence': confidence,
+                'severity': 'medium'
+            })
+
+        # Check for emergency situations
+        elif label_name in ['fire', 'smoke', 'accident']:
+            safety_analysis['safety_alerts'].append({
+                'type': 'emergency_situation',
+                'detected': label['Name'],
+                'confidence': confidence,
+                'severity': 'critical'
+            })
+
+    return safety_analysis
+
+@register_label_postprocessor('scene')
+def analyze_scene_labels(labels):
+    """
+    General scene analysis for context
+    """
+    scene_analysis = {
+        'environment': 'unknown',
+        'weather_conditions': [],
+        'road_conditions': [],
+        'time_of_day': 'unknown'
+    }
+
+    for label in filter_labels(labels, min_confidence=80, max_labels=20):
+        label_name = label['Name'].lower()
+
+        # Environment detection
+        if label_name in ['highway', 'road', 'street']:
+            scene_analysis['environment'] = 'urban'
+        elif label_name in ['countryside', 'field', 'mountain']:
+            scene_analysis['environment'] = 'rural'
+
+        # Weather conditions
+        if label_name in ['rain', 'snow', 'fog']:
+            scene_analysis['weather_conditions'].append(label['Name'])
+
+        # Time of day
+        if label_name in ['sunset', 'sunrise', 'night']:
+            scene_analysis['time_of_day'] = label['Name']
+
+    return scene_analysis
+
+@register_label_postprocessor('emergency')
+def identify_emergency_indicators(labels):
+    """
+    Emergency indicators (keyword substring match on label names)
+    """
+    indicators = []
+    for label in labels:
+        label_name = label['Name'].lower()
+        if any(keyword in label_name for keyword in _EMERGENCY_KEYWORDS_LOWER):
+            indicators.append({
+                'indicator': label['Name'],
+                'confidence': label['Confidence']
+            })
+
+    return indicators
@@ -0,0 +1,99 @@
+"""
+Carriles de prioridad de video y seguimiento de SLA por carril.
+
+Cada video entra a la cola SQS de su carril (PANIC, EVENT, CONTINUOUS).
+Por cada mensaje procesado se mide la espera en cola (envío a SQS → inicio)
+y la latencia total hasta terminar el análisis (recepción → fin). Las
+métricas se publican en CloudWatch con la dimensión Lane, junto con el
+número de mensajes que superaron el objetivo del carril. Se incluye con
+video_processor.
+"""
+
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger()
+
+# Objetivo de latencia recepción → análisis por carril (segundos)
+LANE_SLA_SECONDS = {
+    'PANIC': float(os.environ.get('PANIC_SLA_SECONDS', 10)),
+    'EVENT': float(os.environ.get('EVENT_SLA_SECONDS', 120)),
+    'CONTINUOUS': float(os.environ.get('CONTINUOUS_SLA_SECONDS', 1800))
+}
+
+METRICS_NAMESPACE = os.environ.get('VIDEO_METRICS_NAMESPACE', 'VehicleTracking/VideoLanes')
+
+# put_metric_data admite hasta 150 valores por métrica
+MAX_VALUES_PER_DATUM = 150
+
+def lane_for(video_type):
+    return video_type if video_type in LANE_SLA_SECONDS else 'CONTINUOUS'
+
+def now_millis():
+    return int(time.time() * 1000)
+
+class LaneSlaTracker:
+    """
+    Acumula latencias por carril durante una invocación y las publica juntas
+    """
+
+    def __init__(self):
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, lane, queued_at_ms, started_at_ms, finished_at_ms, received_at_ms=None):
+        """
+        queued_at_ms: envío a la cola; received_at_ms: llegada al backend (si se conoce)
+        """
+        origin = received_at_ms or queued_at_ms
+        queue_wait = max(0, started_at_ms - queued_at_ms)
+        end_to_end = max(0, finished_at_ms - origin)
+        breached = end_to_end > LANE_SLA_SECONDS[lane] * 1000
+
+        with self._lock:
+            samples = self._samples.setdefault(lane, {'queue_wait': [], 'end_to_end': [], 'breaches': 0})
+            samples['queue_wait'].append(queue_wait)
+            samples['end_to_end'].append(end_to_end)
+            samples['breaches'] += int(breached)
+
+        if breached:
+            logger.warning(f"SLA excedido en carril {lane}: {end_to_end} ms "
+                           f"(objetivo {LANE_SLA_SECONDS[lane]:.0f} s, espera en cola {queue_wait} ms)")
+
+    def metric_data(self):
+        with self._lock:
+            samples, self._samples = self._samples, {}
+
+        metric_data = []
+        for lane, lane_samples in samples.items():
+            dimensions = [{'Name': 'Lane', 'Value': lane}]
+            for metric_name, key in (('QueueWaitLatency', 'queue_wait'), ('QueueToAnalysisLatency', 'end_to_end')):
+                values = lane_samples[key]
+                for start in range(0, len(values), MAX_VALUES_PER_DATUM):
+                    metric_data.append({
+                        'MetricName': metric_name,
+                        'Dimensions': dimensions,
+                        'Values': values[start:start + MAX_VALUES_PER_DATUM],
+                        'Unit': 'Milliseconds'
+                    })
+            metric_data.append({
+                'MetricName': 'SLABreaches',
+                'Dimensions': dimensions,
+                'Value': lane_samples['breaches'],
+                'Unit': 'Count'
+            })
+        return metric_data
+
+    def flush(self, cloudwatch):
+        metric_data = self.metric_data()
+        if not metric_data:
+            return
+
+        try:
+            # Hasta 1000 métricas por llamada
+            for start in range(0, len(metric_data), 1000):
+                cloudwatch.put_metric_data(Namespace=METRICS_NAMESPACE, MetricData=metric_data[start:start + 1000])
+        except Exception as e:
+            logger.warning(f"Error publicando métricas de carriles: {str(e)}")
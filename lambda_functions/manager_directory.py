@@ -0,0 +1,74 @@
+"""
+Directorio de managers (grupo FleetManagers) para asignar aprobaciones.
+
+manager_directory_sync copia periódicamente los miembros del grupo de Cognito
+a la tabla del directorio. Aquí se lee esa tabla y se guarda en memoria con
+un TTL, así la asignación de aprobaciones no consulta Cognito ni DynamoDB en
+cada solicitud. Si la tabla no se puede leer, se siguen usando los managers
+de la última carga. Se incluye con request_manager_approval.
+"""
+
+import logging
+import os
+import threading
+import time
+from decimal import Decimal
+
+logger = logging.getLogger()
+
+CACHE_TTL_SECONDS = int(os.environ.get('MANAGER_DIRECTORY_TTL_SECONDS', 300))
+
+class ManagerDirectory:
+    """
+    Managers activos del directorio con caché en memoria por contenedor
+    """
+
+    def __init__(self, dynamodb, table_name, ttl_seconds=CACHE_TTL_SECONDS):
+        self._table = dynamodb.Table(table_name)
+        self._ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._managers = []
+        self._expires_at = 0
+
+    def get_managers(self):
+        """
+        Managers activos ordenados por user_id (orden estable para desempatar)
+        """
+        with self._lock:
+            if self._managers and time.monotonic() < self._expires_at:
+                return list(self._managers)
+
+            try:
+                managers = self._load()
+            except Exception as e:
+                logger.error(f"Error leyendo el directorio de managers: {str(e)}")
+                return list(self._managers)
+
+            self._managers = managers
+            self._expires_at = time.monotonic() + self._ttl_seconds
+            return list(managers)
+
+    def managers_for(self, contract_value):
+        """
+        Managers cuyo límite de aprobación cubre el valor del contrato
+        """
+        value = Decimal(str(contract_value or 0))
+        return [manager for manager in self.get_managers() if manager['approval_limit'] >= value]
+
+    def invalidate(self):
+        with self._lock:
+            self._expires_at = 0
+
+    def _load(self):
+        managers = []
+        scan_kwargs = {}
+        while True:
+            response = self._table.scan(**scan_kwargs)
+            managers.extend(item for item in response.get('Items', []) if item.get('enabled', True))
+            if 'LastEvaluatedKey' not in response:
+                break
+            scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+        managers.sort(key=lambda manager: manager['user_id'])
+        logger.info(f"Directorio de managers cargado: {len(managers)} managers")
+        return managers
@@ -0,0 +1,106 @@
+import json
+import boto3
+import os
+from datetime import datetime
+import logging
+from decimal import Decimal
+
+# Configurar logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Clientes AWS
+dynamodb = boto3.resource('dynamodb')
+cognito = boto3.client('cognito-idp')
+
+MANAGERS_GROUP = os.environ.get('MANAGERS_GROUP', 'FleetManagers')
+DEFAULT_APPROVAL_LIMIT = Decimal(os.environ.get('DEFAULT_APPROVAL_LIMIT', '500000'))
+DEFAULT_DEPARTMENT = 'Fleet Operations'
+LIST_USERS_PAGE_SIZE = 60  # Máximo que acepta list_users_in_group
+
+def handler(event, context):
+    """
+    Sincronizar el grupo FleetManagers de Cognito con la tabla del directorio.
+    Se ejecuta periódicamente (EventBridge); request_manager_approval lee la
+    tabla a través de manager_directory en vez de consultar Cognito.
+    """
+    try:
+        managers = list_group_managers()
+        synced_at = int(datetime.utcnow().timestamp())
+
+        directory_table = dynamodb.Table(os.environ['MANAGER_DIRECTORY_TABLE'])
+        current_ids = list_directory_ids(directory_table)
+        removed_ids = current_ids - {manager['user_id'] for manager in managers}
+
+        with directory_table.batch_writer() as batch:
+            for manager in managers:
+                batch.put_item(Item=dict(manager, synced_at=synced_at))
+            # Managers que salieron del grupo
+            for user_id in removed_ids:
+                batch.delete_item(Key={'user_id': user_id})
+
+        logger.info(f"Directorio sincronizado: {len(managers)} managers, {len(removed_ids)} eliminados")
+
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'managers': len(managers),
+                'removed': len(removed_ids),
+                'synced_at': synced_at
+            })
+        }
+
+    except Exception as e:
+        logger.error(f"Error sincronizando directorio de managers: {str(e)}")
+        raise
+
+def list_group_managers():
+    """Miembros del grupo con sus atributos, paginando list_users_in_group"""
+    managers = []
+    request = {
+        'UserPoolId': os.environ['USER_POOL_ID'],
+        'GroupName': MANAGERS_GROUP,
+        'Limit': LIST_USERS_PAGE_SIZE
+    }
+
+    while True:
+        response = cognito.list_users_in_group(**request)
+        managers.extend(manager_from_user(user) for user in response.get('Users', []))
+
+        if not response.get('NextToken'):
+            break
+        request['NextToken'] = response['NextToken']
+
+    return managers
+
+def manager_from_user(user):
+    """Registro del directorio a partir de un usuario de Cognito"""
+    attributes = {attribute['Name']: attribute['Value'] for attribute in user.get('Attributes', [])}
+
+    try:
+        approval_limit = Decimal(attributes.get('custom:approval_limit', DEFAULT_APPROVAL_LIMIT))
+    except ArithmeticError:
+        logger.warning(f"approval_limit inválido para {user['Username']}; se usa el valor por defecto")
+        approval_limit = DEFAULT_APPROVAL_LIMIT
+
+    return {
+        'user_id': attributes.get('sub', user['Username']),
+        'username': user['Username'],
+        'name': attributes.get('name', user['Username']),
+        'email': attributes.get('email', ''),
+        'phone': attributes.get('phone_number', ''),
+        'department': attributes.get('custom:department', DEFAULT_DEPARTMENT),
+        'approval_limit': approval_limit,
+        'enabled': user.get('Enabled', True) and user.get('UserStatus') != 'ARCHIVED'
+    }
+
+def list_directory_ids(directory_table):
+    user_ids = set()
+    scan_kwargs = {'ProjectionExpression': 'user_id'}
+    while True:
+        response = directory_table.scan(**scan_kwargs)
+        user_ids.update(item['user_id'] for item in response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    return user_ids
@@ -0,0 +1,146 @@
+"""
+Subida a S3 de buffers en memoria con partes concurrentes.
+
+Por debajo del umbral se usa un único put_object. Por encima se usa
+multipart: cada parte es una vista (memoryview) del buffer decodificado,
+sin copiarlo, y se reintenta de forma individual. Si una parte agota sus
+reintentos, la subida se aborta para no dejar partes huérfanas. Se incluye
+con video_processor.
+"""
+
+import io
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger()
+
+MIN_PART_SIZE = 5 * 1024 * 1024  # Mínimo de S3 salvo la última parte
+MAX_PARTS = 10000
+
+DEFAULT_THRESHOLD = 8 * 1024 * 1024
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+DEFAULT_CONCURRENCY = 8
+DEFAULT_PART_RETRIES = 3
+
+class MemoryviewReader(io.RawIOBase):
+    """
+    Archivo de solo lectura sobre una memoryview: read() devuelve vistas, no copias.
+    Es seekable para que botocore pueda rebobinar el cuerpo al reintentar.
+    """
+
+    def __init__(self, view):
+        super().__init__()
+        self._view = view
+        self._position = 0
+
+    def __len__(self):
+        return len(self._view)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        else:
+            position = len(self._view) + offset
+        self._position = max(0, min(position, len(self._view)))
+        return self._position
+
+    def read(self, size=-1):
+        end = len(self._view) if size is None or size < 0 else min(len(self._view), self._position + size)
+        chunk = self._view[self._position:end]
+        self._position = end
+        return chunk
+
+    def readinto(self, buffer):
+        chunk = self.read(len(buffer))
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
+
+def choose_part_size(total_size, part_size=DEFAULT_PART_SIZE):
+    """
+    Tamaño de parte configurado, ampliado si se superarían 10.000 partes
+    """
+    return max(MIN_PART_SIZE, part_size, -(-total_size // MAX_PARTS))
+
+def upload_bytes(s3, bucket, key, data, threshold=DEFAULT_THRESHOLD, part_size=DEFAULT_PART_SIZE,
+                 concurrency=DEFAULT_CONCURRENCY, part_retries=DEFAULT_PART_RETRIES, **extra_args):
+    """
+    Subir data (bytes/bytearray) a s3://bucket/key. extra_args son los
+    parámetros comunes a put_object/create_multipart_upload (ContentType,
+    Metadata, StorageClass...). Devuelve el número de partes usadas.
+    """
+    view = memoryview(data)
+
+    if len(view) < threshold:
+        s3.put_object(Bucket=bucket, Key=key, Body=data, **extra_args)
+        return 1
+
+    part_size = choose_part_size(len(view), part_size)
+    ranges = [(number, offset, min(offset + part_size, len(view)))
+              for number, offset in enumerate(range(0, len(view), part_size), start=1)]
+
+    upload_id = s3.create_multipart_upload(Bucket=bucket, Key=key, **extra_args)['UploadId']
+    start = time.perf_counter()
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(ranges)))) as executor:
+            futures = [
+                executor.submit(upload_part, s3, bucket, key, upload_id, number, view[begin:end], part_retries)
+                for number, begin, end in ranges
+            ]
+            parts = [future.result() for future in futures]
+
+        s3.complete_multipart_upload(
+            Bucket=bucket,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': parts}
+        )
+
+    except Exception:
+        logger.error(f"Abortando subida multipart de s3://{bucket}/{key}")
+        try:
+            s3.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        except Exception as e:
+            logger.warning(f"Error abortando subida {upload_id}: {str(e)}")
+        raise
+
+    logger.info(f"Subida multipart de {len(view)} bytes en {len(ranges)} partes "
+                f"({concurrency} concurrentes) en {(time.perf_counter() - start) * 1000:.0f} ms")
+    return len(ranges)
+
+def upload_part(s3, bucket, key, upload_id, part_number, part_view, retries):
+    """
+    Subir una parte, reintentando solo esa parte con backoff exponencial
+    """
+    attempt = 0
+    while True:
+        try:
+            response = s3.upload_part(
+                Bucket=bucket,
+                Key=key,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                Body=MemoryviewReader(part_view),
+                ContentLength=len(part_view)
+            )
+            return {'PartNumber': part_number, 'ETag': response['ETag']}
+        except Exception as e:
+            if attempt >= retries:
+                raise
+            delay = 0.2 * (2 ** attempt) * (0.5 + random.random())
+            logger.warning(f"Parte {part_number} falló ({str(e)}); reintento {attempt + 1} en {delay:.2f}s")
+            time.sleep(delay)
+            attempt += 1
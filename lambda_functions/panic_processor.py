@@ -1,9 +1,14 @@
 import json
 import boto3
 import os
+import time
 from datetime import datetime
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
 import logging
 
+import geo_index
+
 # Configurar logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -12,23 +17,59 @@ logger.setLevel(logging.INFO)
 sns = boto3.client('sns')
 dynamodb = boto3.resource('dynamodb')
 
+PANIC_EVENTS_TABLE = os.environ.get(
+    'PANIC_EVENTS_TABLE',
+    f"vehicle-tracking-{os.environ.get('ENVIRONMENT', 'dev')}-panic-events"
+)
+GEO_INDEX_TABLE = os.environ.get(
+    'GEO_INDEX_TABLE',
+    f"vehicle-tracking-{os.environ.get('ENVIRONMENT', 'dev')}-vehicle-geo-index"
+)
+
+# Vehículos cercanos que pueden asistir (tabla vehicle-geo-index)
+NEARBY_RADIUS_M = int(os.environ.get('PANIC_NEARBY_RADIUS_M', 5000))
+NEARBY_MAX_VEHICLES = int(os.environ.get('PANIC_NEARBY_MAX_VEHICLES', 10))
+# Posiciones más antiguas que esto son de vehículos sin reportar: no pueden asistir
+NEARBY_MAX_AGE_S = int(os.environ.get('PANIC_NEARBY_MAX_AGE_S', 900))
+
+# Pool creado una vez por contenedor: una alerta no paga el arranque de los hilos
+PANIC_WORKERS = int(os.environ.get('PANIC_WORKERS', 16))
+executor = ThreadPoolExecutor(max_workers=PANIC_WORKERS)
+
+SNS_MESSAGE_ATTRIBUTES = {
+    'alert_type': {
+        'DataType': 'String',
+        'StringValue': 'PANIC_BUTTON'
+    },
+    'priority': {
+        'DataType': 'String',
+        'StringValue': 'CRITICAL'
+    }
+}
+
 def handler(event, context):
     """
-    Procesa alertas críticas del botón de pánico de vehículos
+    Procesa alertas críticas del botón de pánico de vehículos.
+    La notificación SNS, el registro de auditoría y la búsqueda de vehículos
+    cercanos se lanzan a la vez; el mensaje se serializa una sola vez. Al
+    terminar, el registro de auditoría se completa con el resultado y los
+    tiempos de cada etapa.
     """
+    started = time.perf_counter()
+    received_at = time.time()
+    timings = {}
+
     try:
-        logger.info(f"Procesando evento de pánico: {json.dumps(event)}")
-        
         # Extraer datos del evento IoT
         vehicle_id = event.get('vehicle_id')
         location = event.get('location', {})
         timestamp = event.get('timestamp', datetime.utcnow().isoformat())
         panic_type = event.get('panic_type', 'EMERGENCY')
         driver_info = event.get('driver_info', {})
-        
+
         if not vehicle_id:
             raise ValueError("vehicle_id es requerido")
-        
+
         # Preparar mensaje de alerta
         alert_message = {
             "alert_type": "PANIC_BUTTON",
@@ -47,61 +88,59 @@ def handler(event, context):
             "priority": "CRITICAL",
             "requires_immediate_response": True
         }
-        
-        # Enviar notificación SNS a autoridades
-        sns_topic_arn = os.environ['SNS_TOPIC_ARN']
-        
-        sns_response = sns.publish(
-            TopicArn=sns_topic_arn,
-            Message=json.dumps(alert_message, indent=2),
-            Subject=f"🚨 ALERTA CRÍTICA - Botón de Pánico Activado - Vehículo {vehicle_id}",
-            MessageAttributes={
-                'alert_type': {
-                    'DataType': 'String',
-                    'StringValue': 'PANIC_BUTTON'
-                },
-                'priority': {
-                    'DataType': 'String',
-                    'StringValue': 'CRITICAL'
-                },
-                'vehicle_id': {
-                    'DataType': 'String',
-                    'StringValue': vehicle_id
-                }
-            }
+
+        # Única serialización: cuerpo de SNS y, reinterpretado con Decimal, registro de auditoría
+        message_body = json.dumps(alert_message, separators=(',', ':'), ensure_ascii=False)
+        timings['serialize_ms'] = elapsed_ms(started)
+
+        # Enviar notificación SNS a autoridades (primero: es el camino crítico y
+        # no depende de interpretar el timestamp del evento)
+        sns_future = executor.submit(timed, publish_alert, vehicle_id, message_body, started)
+        event_ts = audit_timestamp(timestamp, received_at)
+        audit_future = executor.submit(timed, write_audit_record, vehicle_id, event_ts, message_body)
+
+        # La búsqueda corre en este hilo y reparte sus celdas en el pool
+        nearby_vehicles, timings['nearby_lookup_ms'] = timed(
+            find_nearby_vehicles, vehicle_id, location.get('lat'), location.get('lng')
         )
-        
-        logger.info(f"Notificación SNS enviada: {sns_response['MessageId']}")
-        
-        # Registrar en DynamoDB para auditoría
-        table_name = f"vehicle-tracking-{os.environ['ENVIRONMENT']}-panic-events"
-        table = dynamodb.Table(table_name)
-        
-        panic_record = {
-            'vehicle_id': vehicle_id,
-            'timestamp': int(datetime.fromisoformat(timestamp.replace('Z', '+00:00')).timestamp()),
-            'alert_data': alert_message,
-            'sns_message_id': sns_response['MessageId'],
-            'processed_at': datetime.utcnow().isoformat(),
-            'status': 'NOTIFIED'
-        }
-        
-        table.put_item(Item=panic_record)
-        
+
+        (sns_message_id, timings['time_to_notify_ms']), timings['sns_publish_ms'] = sns_future.result()
+        logger.info(f"Notificación SNS enviada: {sns_message_id}")
+
+        # La alerta ya salió: un fallo de auditoría se registra pero no la invalida
+        audit_written = False
+        try:
+            _, timings['audit_write_ms'] = audit_future.result()
+            audit_written = True
+        except Exception as e:
+            logger.error(f"Error registrando auditoría de pánico: {str(e)}")
+
+        try:
+            _, timings['audit_update_ms'] = timed(
+                complete_audit_record, vehicle_id, event_ts, message_body, sns_message_id,
+                nearby_vehicles, timings, not audit_written
+            )
+        except Exception as e:
+            logger.error(f"Error completando auditoría de pánico: {str(e)}")
+        timings['total_ms'] = elapsed_ms(started)
+        log_timings(vehicle_id, panic_type, timings)
+
         # Respuesta exitosa
         return {
             'statusCode': 200,
             'body': json.dumps({
                 'message': 'Alerta de pánico procesada exitosamente',
                 'vehicle_id': vehicle_id,
-                'sns_message_id': sns_response['MessageId'],
-                'timestamp': timestamp
+                'sns_message_id': sns_message_id,
+                'timestamp': timestamp,
+                'nearby_vehicles': nearby_vehicles,
+                'timings_ms': timings
             })
         }
-        
+
     except Exception as e:
         logger.error(f"Error procesando alerta de pánico: {str(e)}")
-        
+
         # En caso de error, aún intentar enviar una notificación básica
         try:
             emergency_message = f"ERROR: Fallo al procesar alerta de pánico del vehículo {event.get('vehicle_id', 'DESCONOCIDO')}. Error: {str(e)}"
@@ -112,7 +151,7 @@ def handler(event, context):
             )
         except:
             pass
-        
+
         return {
             'statusCode': 500,
             'body': json.dumps({
@@ -120,3 +159,150 @@ def handler(event, context):
                 'details': str(e)
             })
         }
+
+def publish_alert(vehicle_id, message_body, started):
+    """
+    Publicar la alerta ya serializada; devuelve (MessageId, ms desde que empezó el handler)
+    """
+    sns_response = sns.publish(
+        TopicArn=os.environ['SNS_TOPIC_ARN'],
+        Message=message_body,
+        Subject=f"🚨 ALERTA CRÍTICA - Botón de Pánico Activado - Vehículo {vehicle_id}",
+        MessageAttributes=dict(SNS_MESSAGE_ATTRIBUTES, vehicle_id={
+            'DataType': 'String',
+            'StringValue': vehicle_id
+        })
+    )
+    return sns_response['MessageId'], elapsed_ms(started)
+
+def audit_timestamp(timestamp, received_at):
+    """
+    Clave de auditoría (epoch en segundos) a partir del timestamp del evento:
+    ISO 8601 o epoch en segundos/milisegundos. Si no se puede interpretar, se
+    usa la hora de recepción; nunca lanza.
+    """
+    try:
+        if isinstance(timestamp, (int, float)) and not isinstance(timestamp, bool):
+            # Epoch en milisegundos (p. ej. timestamp() de la regla IoT)
+            return int(timestamp / 1000 if timestamp > 1e11 else timestamp)
+        return int(datetime.fromisoformat(str(timestamp).replace('Z', '+00:00')).timestamp())
+    except (TypeError, ValueError, OverflowError, OSError):
+        logger.warning(f"Timestamp de pánico no interpretable ({timestamp!r}); se usa la hora de recepción")
+        return int(received_at)
+
+def write_audit_record(vehicle_id, event_ts, message_body):
+    """Registrar en DynamoDB para auditoría, en paralelo con la notificación"""
+    dynamodb.Table(PANIC_EVENTS_TABLE).put_item(Item={
+        'vehicle_id': vehicle_id,
+        'timestamp': event_ts,
+        'alert_data': json.loads(message_body, parse_float=Decimal),
+        'received_at': datetime.utcnow().isoformat(),
+        'status': 'PROCESSING'
+    })
+
+def complete_audit_record(vehicle_id, event_ts, message_body, sns_message_id, nearby_vehicles, timings, rewrite):
+    """
+    Marcar la alerta como notificada. Si la escritura inicial falló, se
+    vuelve a escribir el registro completo.
+    """
+    table = dynamodb.Table(PANIC_EVENTS_TABLE)
+    nearby = [
+        {'vehicle_id': vehicle['vehicle_id'], 'distance_m': Decimal(str(vehicle['distance_m']))}
+        for vehicle in nearby_vehicles
+    ]
+    stage_timings = {stage: Decimal(str(value)) for stage, value in timings.items()}
+
+    if rewrite:
+        table.put_item(Item={
+            'vehicle_id': vehicle_id,
+            'timestamp': event_ts,
+            'alert_data': json.loads(message_body, parse_float=Decimal),
+            'sns_message_id': sns_message_id,
+            'nearby_vehicles': nearby,
+            'timings_ms': stage_timings,
+            'processed_at': datetime.utcnow().isoformat(),
+            'status': 'NOTIFIED'
+        })
+        return
+
+    table.update_item(
+        Key={'vehicle_id': vehicle_id, 'timestamp': event_ts},
+        UpdateExpression='SET #status = :status, sns_message_id = :message_id, nearby_vehicles = :nearby, '
+                         'timings_ms = :timings, processed_at = :processed_at',
+        ExpressionAttributeNames={'#status': 'status'},
+        ExpressionAttributeValues={
+            ':status': 'NOTIFIED',
+            ':message_id': sns_message_id,
+            ':nearby': nearby,
+            ':timings': stage_timings,
+            ':processed_at': datetime.utcnow().isoformat()
+        }
+    )
+
+def find_nearby_vehicles(vehicle_id, lat, lng):
+    """
+    Vehículos más cercanos al punto del pánico según vehicle-geo-index.
+    Solo se leen las celdas que cubren el radio, en paralelo, y se descartan
+    las posiciones de más de NEARBY_MAX_AGE_S. Un fallo aquí no afecta la
+    notificación: se devuelve una lista vacía.
+    """
+    if lat is None or lng is None:
+        return []
+
+    try:
+        lat, lng = float(lat), float(lng)
+        cells = geo_index.cells_for_radius(lat, lng, NEARBY_RADIUS_M)
+        # El índice guarda el timestamp del dispositivo en epoch ms
+        min_ts_ms = (time.time() - NEARBY_MAX_AGE_S) * 1000
+
+        matches = []
+        for cell_items in executor.map(query_geo_cell, cells):
+            for item in cell_items:
+                if item['vehicle_id'] == vehicle_id or float(item.get('timestamp', 0)) < min_ts_ms:
+                    continue
+                distance_m = geo_index.haversine_m(lat, lng, float(item['lat']), float(item['lng']))
+                if distance_m <= NEARBY_RADIUS_M:
+                    matches.append({'vehicle_id': item['vehicle_id'], 'distance_m': round(distance_m, 1)})
+
+        matches.sort(key=lambda match: match['distance_m'])
+        return matches[:NEARBY_MAX_VEHICLES]
+
+    except Exception as e:
+        logger.error(f"Error buscando vehículos cercanos: {str(e)}")
+        return []
+
+def query_geo_cell(cell):
+    """Entradas de una celda del índice geoespacial"""
+    client = dynamodb.meta.client
+    query_kwargs = {
+        'TableName': GEO_INDEX_TABLE,
+        'KeyConditionExpression': 'cell = :cell',
+        'ExpressionAttributeValues': {':cell': cell},
+        'ExpressionAttributeNames': {'#ts': 'timestamp'},
+        'ProjectionExpression': 'vehicle_id, lat, lng, #ts'
+    }
+    items = []
+    while True:
+        response = client.query(**query_kwargs)
+        items.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return items
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def timed(func, *args):
+    """(resultado, ms) de una etapa"""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, elapsed_ms(start)
+
+def elapsed_ms(start):
+    return round((time.perf_counter() - start) * 1000, 1)
+
+def log_timings(vehicle_id, panic_type, timings):
+    """Una línea JSON por alerta con los tiempos de cada etapa (consultable con Logs Insights)"""
+    logger.info(json.dumps({
+        'event': 'panic_processed',
+        'vehicle_id': vehicle_id,
+        'panic_type': panic_type,
+        'timings_ms': timings
+    }))
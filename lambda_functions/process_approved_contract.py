@@ -1,6 +1,7 @@
 import json
 import boto3
 import os
+from botocore.config import Config
 from datetime import datetime
 import logging
 
@@ -8,15 +9,30 @@ import logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Modo masivo: contratos por invocación de la Lambda de DocuSign (BatchGetItem lee 100 por llamada)
+BULK_CHUNK_SIZE = int(os.environ.get('BULK_CHUNK_SIZE', 100))
+
+# Estados desde los que un contrato todavía no fue enviado a firma
+SIGNABLE_STATUSES = ('APPROVED', 'PROCESSING_APPROVED')
+
 # Clientes AWS
 dynamodb = boto3.resource('dynamodb')
-lambda_client = boto3.client('lambda')
+# La invocación síncrona espera a la Lambda de DocuSign (timeout 300 s) y no se
+# reintenta: repetir create_envelopes_bulk duplicaría los envelopes en curso
+lambda_client = boto3.client('lambda', config=Config(
+    read_timeout=310,
+    retries={'total_max_attempts': 1}
+))
 sns = boto3.client('sns')
 
 def handler(event, context):
     """
-    Procesar contrato aprobado e iniciar proceso de firma electrónica
+    Procesar contrato aprobado e iniciar proceso de firma electrónica.
+    Con contract_ids procesa en modo masivo una lista de contratos aprobados.
     """
+    if event.get('contract_ids'):
+        return process_approved_contracts_bulk(event['contract_ids'])
+    
     try:
         logger.info(f"Procesando contrato aprobado: {json.dumps(event)}")
         
@@ -160,6 +176,95 @@ def initiate_docusign_signature(contract_id, contract_data):
             'error': f"Error técnico: {str(e)}"
         }
 
+def process_approved_contracts_bulk(contract_ids):
+    """
+    Enviar a firma una ola de contratos aprobados con una invocación de
+    DocuSign por bloque, en lugar de una por contrato
+    """
+    logger.info(f"Procesando {len(contract_ids)} contratos aprobados en modo masivo")
+    
+    contracts_table = dynamodb.Table(os.environ['CONTRACTS_TABLE'])
+    results = []
+    
+    for start in range(0, len(contract_ids), BULK_CHUNK_SIZE):
+        chunk = contract_ids[start:start + BULK_CHUNK_SIZE]
+        chunk_results = initiate_docusign_signatures_bulk(chunk)
+        
+        for result in chunk_results:
+            if result['status'] == 'SENT':
+                send_signature_notification(result)
+            elif result['status'] == 'FAILED':
+                mark_signature_initiation_failed(contracts_table, result)
+        
+        results.extend(chunk_results)
+        logger.info(f"Modo masivo: {len(results)}/{len(contract_ids)} contratos procesados")
+    
+    summary = {}
+    for result in results:
+        summary[result['status']] = summary.get(result['status'], 0) + 1
+    
+    return {
+        'status': 'BULK_COMPLETED',
+        'summary': summary,
+        'results': [
+            {key: result[key] for key in ('contract_id', 'status', 'envelope_id', 'error', 'reason') if key in result}
+            for result in results
+        ]
+    }
+
+def mark_signature_initiation_failed(contracts_table, result):
+    """
+    Marcar el fallo solo si el contrato sigue sin enviar: si el bloque falló
+    por timeout, el envelope pudo haberse enviado y el contrato ya estar en
+    PENDING_SIGNATURE
+    """
+    try:
+        contracts_table.update_item(
+            Key={'contract_id': result['contract_id']},
+            UpdateExpression='SET #status = :status, signature_error = :error, updated_at = :updated_at',
+            ConditionExpression='#status IN (:approved, :processing_approved)',
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={
+                ':status': 'SIGNATURE_INITIATION_FAILED',
+                ':error': result['error'],
+                ':updated_at': int(datetime.utcnow().timestamp()),
+                ':approved': SIGNABLE_STATUSES[0],
+                ':processing_approved': SIGNABLE_STATUSES[1]
+            }
+        )
+    except dynamodb.meta.client.exceptions.ConditionalCheckFailedException:
+        logger.warning(f"Contrato {result['contract_id']} ya no está pendiente de envío; no se marca el fallo")
+
+def initiate_docusign_signatures_bulk(contract_ids):
+    """Crear los envelopes de un bloque de contratos con una sola invocación"""
+    try:
+        docusign_function_name = f"{os.environ.get('PROJECT_NAME', 'vehicle-tracking')}-{os.environ['ENVIRONMENT']}-docusign-signature-manager"
+        
+        response = lambda_client.invoke(
+            FunctionName=docusign_function_name,
+            InvocationType='RequestResponse',
+            Payload=json.dumps({
+                'action': 'create_envelopes_bulk',
+                'contract_ids': contract_ids
+            })
+        )
+        
+        result = json.loads(response['Payload'].read())
+        if response.get('FunctionError'):
+            # Timeout o excepción no controlada: el payload no trae statusCode
+            raise Exception(result.get('errorMessage', 'Error desconocido en DocuSign'))
+        body = json.loads(result['body'])
+        
+        if result['statusCode'] != 200:
+            raise Exception(body.get('error', 'Error desconocido en DocuSign'))
+        
+        return body['results']
+        
+    except Exception as e:
+        logger.error(f"Error en envío masivo a DocuSign: {str(e)}")
+        return [{'contract_id': contract_id, 'status': 'FAILED', 'error': f"Error técnico: {str(e)}"}
+                for contract_id in contract_ids]
+
 def send_signature_notification(contract_data):
     """Enviar notificación al cliente sobre el proceso de firma"""
     try:
@@ -0,0 +1,135 @@
+"""
+Bounded, adaptively throttled concurrency for Amazon Rekognition calls.
+
+Independent analyses of a frame (faces, labels, text) run in parallel and
+several S3 records are processed at once. An AIMD limiter shrinks the
+number of in-flight calls when Rekognition throttles (TPS limits) and grows
+it back slowly on success. The client runs without botocore retries, so
+transient server and connection errors are retried here as well, without
+shrinking the limit. Bundled with rekognition_processor.
+"""
+
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ConnectionError as BotocoreConnectionError, HTTPClientError
+
+logger = logging.getLogger()
+
+THROTTLING_ERROR_CODES = (
+    'ThrottlingException',
+    'ProvisionedThroughputExceededException',
+    'LimitExceededException',
+    'TooManyRequestsException'
+)
+
+TRANSIENT_ERROR_CODES = (
+    'InternalServerError',
+    'ServiceUnavailableException',
+    'RequestTimeout',
+    'RequestTimeoutException'
+)
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit with additive increase / multiplicative decrease
+    """
+
+    def __init__(self, max_limit, initial_limit=None, increase_every=10):
+        self.max_limit = max_limit
+        self.limit = initial_limit or max_limit
+        self.increase_every = increase_every
+        self._in_flight = 0
+        self._successes = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self._in_flight >= self.limit:
+                self._condition.wait()
+            self._in_flight += 1
+
+    def release(self, throttled=False):
+        with self._condition:
+            self._in_flight -= 1
+            if throttled:
+                self.limit = max(1, self.limit // 2)
+                self._successes = 0
+            else:
+                self._successes += 1
+                if self._successes >= self.increase_every and self.limit < self.max_limit:
+                    self.limit += 1
+                    self._successes = 0
+            self._condition.notify_all()
+
+class RekognitionExecutor:
+    """
+    Runs Rekognition API calls through a shared pool and adaptive limiter
+    """
+
+    def __init__(self, client, max_concurrency=8, max_retries=5, base_backoff=0.2):
+        self.client = client
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.limiter = AdaptiveLimiter(max_concurrency)
+        self.pool = ThreadPoolExecutor(max_workers=max_concurrency)
+        self._stats_lock = threading.Lock()
+        self.throttle_count = 0
+
+    def call(self, operation, **kwargs):
+        """
+        Call a Rekognition operation, retrying throttled requests and transient
+        errors with jittered backoff
+        """
+        api = getattr(self.client, operation)
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            throttled = False
+            try:
+                return api(**kwargs)
+            except Exception as e:
+                throttled = is_throttling_error(e)
+                if not (throttled or is_transient_error(e)) or attempt >= self.max_retries:
+                    raise
+                error = e
+            finally:
+                self.limiter.release(throttled=throttled)
+
+            delay = self.base_backoff * (2 ** attempt) * (0.5 + random.random())
+            if throttled:
+                with self._stats_lock:
+                    self.throttle_count += 1
+                logger.warning(f"Rekognition {operation} throttled; retry {attempt + 1} in {delay:.2f}s "
+                               f"(concurrency limit {self.limiter.limit})")
+            else:
+                logger.warning(f"Rekognition {operation} failed ({error}); retry {attempt + 1} in {delay:.2f}s")
+            time.sleep(delay)
+            attempt += 1
+
+    def run_parallel(self, tasks):
+        """
+        Run {name: (func, args)} concurrently; returns {name: result}.
+        Each func is expected to handle its own errors.
+        """
+        futures = {name: self.pool.submit(func, *args) for name, (func, args) in tasks.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+def is_throttling_error(error):
+    """
+    True for botocore ClientErrors caused by Rekognition rate limits
+    """
+    response = getattr(error, 'response', None) or {}
+    return response.get('Error', {}).get('Code') in THROTTLING_ERROR_CODES
+
+def is_transient_error(error):
+    """
+    True for server-side and connection errors that botocore would normally retry
+    """
+    if isinstance(error, (BotocoreConnectionError, HTTPClientError)):
+        return True
+    response = getattr(error, 'response', None) or {}
+    return response.get('Error', {}).get('Code') in TRANSIENT_ERROR_CODES
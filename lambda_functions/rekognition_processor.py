@@ -1,19 +1,78 @@
+import base64
 import json
+import os
 import boto3
 import logging
+import re
+import time
 import uuid
 from datetime import datetime, timedelta
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import unquote_plus
 
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.config import Config
+
+from label_analysis import LABEL_DETECTION_PARAMS, LABEL_POSTPROCESSORS, run_label_postprocessors
+from text_analysis import classify_text_detections
+from rekognition_executor import RekognitionExecutor
+from frame_dedup import FrameHashCache, dhash, dhash_available
+from analysis_scheduler import ANALYSES, AnalysisPlan, AnalysisScheduler
+
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# AWS clients
-rekognition = boto3.client('rekognition')
+# Concurrency settings
+REKOGNITION_MAX_CONCURRENCY = int(os.environ.get('REKOGNITION_MAX_CONCURRENCY', 8))
+RECORD_CONCURRENCY = int(os.environ.get('RECORD_CONCURRENCY', 4))
+
+# Near-duplicate frame suppression
+FRAME_DEDUP_ENABLED = os.environ.get('FRAME_DEDUP_ENABLED', 'true').lower() == 'true'
+FRAME_DEDUP_MAX_DISTANCE = int(os.environ.get('FRAME_DEDUP_MAX_DISTANCE', 6))
+FRAME_DEDUP_MAX_AGE_SECONDS = int(os.environ.get('FRAME_DEDUP_MAX_AGE_SECONDS', 60))
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'VehicleTracking/Rekognition')
+
+# Context-aware scheduling (disabled when no schedule table is configured)
+ANALYSIS_SCHEDULE_TABLE = os.environ.get('ANALYSIS_SCHEDULE_TABLE', '')
+LATEST_STATE_TABLE = os.environ.get('LATEST_STATE_TABLE', 'vehicle-tracking-vehicle-latest')
+ALERTS_TABLE = os.environ.get('ALERTS_TABLE', '')
+RECENT_ALERT_WINDOW_SECONDS = int(os.environ.get('RECENT_ALERT_WINDOW_SECONDS', 300))
+ANALYSIS_MIN_INTERVALS = {
+    'driver_behavior': int(os.environ.get('MIN_INTERVAL_DRIVER_BEHAVIOR', 60)),
+    'labels': int(os.environ.get('MIN_INTERVAL_LABELS', 30)),
+    'text': int(os.environ.get('MIN_INTERVAL_TEXT', 120))
+}
+EMERGENCY_KEY_MARKERS = ('emergency', 'panic')
+
+# Alert sources and the sparse index (name, range key attribute) for each alert type
+ALERT_SOURCES = (
+    ('driver_behavior', 'driver_behavior', 'driver_alerts'),
+    ('safety_violation', 'safety', 'safety_alerts')
+)
+ALERT_TYPE_INDEXES = {
+    'driver_behavior': ('DriverBehaviorAlertIndex', 'driver_alert_at'),
+    'safety_violation': ('SafetyAlertIndex', 'safety_alert_at')
+}
+SEVERITY_RANK = {'low': 1, 'medium': 2, 'high': 3, 'critical': 4}
+
+# Results query API
+RESULTS_QUERY_DEFAULT_LIMIT = int(os.environ.get('RESULTS_QUERY_DEFAULT_LIMIT', 50))
+RESULTS_QUERY_MAX_LIMIT = int(os.environ.get('RESULTS_QUERY_MAX_LIMIT', 500))
+
+FRAME_TIME_PATTERN = re.compile(r'_(\d{2})(\d{2})(\d{2})(?:_\d+)?\.jpg$')
+
+# AWS clients (botocore retries disabled: RekognitionExecutor retries throttles through the
+# adaptive limiter, plus server and connection errors)
+rekognition = boto3.client('rekognition', config=Config(
+    max_pool_connections=REKOGNITION_MAX_CONCURRENCY,
+    retries={'max_attempts': 1, 'mode': 'standard'}
+))
 s3 = boto3.client('s3')
 dynamodb = boto3.resource('dynamodb')
 sns = boto3.client('sns')
+cloudwatch = boto3.client('cloudwatch')
 
 # Environment variables
 RESULTS_TABLE = os.environ['RESULTS_TABLE']
@@ -22,29 +81,35 @@ ALERTS_TOPIC = os.environ['ALERTS_TOPIC']
 # DynamoDB table
 results_table = dynamodb.Table(RESULTS_TABLE)
 
+# Shared across warm invocations
+rekognition_executor = RekognitionExecutor(rekognition, max_concurrency=REKOGNITION_MAX_CONCURRENCY)
+frame_hash_cache = FrameHashCache(
+    max_distance=FRAME_DEDUP_MAX_DISTANCE,
+    max_age_seconds=FRAME_DEDUP_MAX_AGE_SECONDS
+)
+analysis_scheduler = AnalysisScheduler(min_intervals=ANALYSIS_MIN_INTERVALS)
+
 def lambda_handler(event, context):
     """
     Process vehicle images/video frames with Amazon Rekognition
     """
+    if event.get('action') == 'query_results':
+        return handle_results_query(event)
+    
     try:
-        for record in event['Records']:
-            # Parse S3 event
-            bucket = record['s3']['bucket']['name']
-            key = unquote_plus(record['s3']['object']['key'])
-            
-            logger.info(f"Processing image: s3://{bucket}/{key}")
-            
-            # Extract metadata from S3 key
-            metadata = extract_metadata_from_key(key)
-            
-            # Process image with Rekognition
-            analysis_results = process_image(bucket, key, metadata)
-            
-            # Store results in DynamoDB
-            store_analysis_results(analysis_results)
-            
-            # Check for alerts
-            check_and_send_alerts(analysis_results)
+        records = event['Records']
+        workers = max(1, min(RECORD_CONCURRENCY, len(records)))
+        
+        # Process several S3 records at once; Rekognition calls share the adaptive limiter
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(process_record, record) for record in records]
+            errors = [future.exception() for future in futures if future.exception()]
+            outcomes = [future.result() for future in futures if not future.exception()]
+        
+        publish_frame_metrics(outcomes)
+        
+        if errors:
+            raise errors[0]
             
         return {
             'statusCode': 200,
@@ -55,6 +120,212 @@ def lambda_handler(event, context):
         logger.error(f"Error processing Rekognition: {str(e)}")
         raise
 
+def process_record(record):
+    """
+    Analyze the image referenced by one S3 event record
+    """
+    # Parse S3 event
+    bucket = record['s3']['bucket']['name']
+    key = unquote_plus(record['s3']['object']['key'])
+    
+    logger.info(f"Processing image: s3://{bucket}/{key}")
+    
+    # Extract metadata from S3 key
+    metadata = extract_metadata_from_key(key)
+    
+    # Decide which analyses are worth running for this frame
+    plan = plan_analyses(metadata['vehicle_id'], key)
+    calls_skipped = len(plan.skipped)
+    if not plan:
+        logger.info(f"Skipped frame s3://{bucket}/{key} ({plan.reason})")
+        return {'suppressed': False, 'skipped': True, 'calls_saved': 0, 'calls_skipped': calls_skipped}
+    
+    # Near-duplicate of the last analyzed frame: reuse its results (never for emergencies)
+    frame_hash = compute_frame_hash(bucket, key)
+    cached_results = None if plan.emergency else frame_hash_cache.find_duplicate(metadata['vehicle_id'], frame_hash)
+    if cached_results:
+        analysis_results = reuse_analysis_results(bucket, key, metadata, cached_results, frame_hash)
+        store_analysis_results(analysis_results)
+        return {'suppressed': True, 'skipped': False, 'calls_saved': cached_results.get('rekognition_calls', 0),
+                'calls_skipped': 0}
+    
+    # Process image with Rekognition
+    analysis_results = process_image(bucket, key, metadata, plan.analyses)
+    analysis_results['schedule_reason'] = plan.reason
+    if frame_hash is not None:
+        analysis_results['frame_hash'] = f"{frame_hash:016x}"
+        if 'error' not in analysis_results:
+            frame_hash_cache.remember(metadata['vehicle_id'], frame_hash, analysis_results)
+    
+    # Store results in DynamoDB
+    store_analysis_results(analysis_results)
+    record_analysis_runs(metadata['vehicle_id'], analysis_results)
+    
+    # Check for alerts
+    check_and_send_alerts(analysis_results)
+    
+    return {'suppressed': False, 'skipped': False, 'calls_saved': 0, 'calls_skipped': calls_skipped}
+
+def is_emergency_frame(key):
+    """
+    Frames uploaded by the panic/emergency path carry a marker in the key
+    """
+    lowered = key.lower()
+    return any(marker in lowered for marker in EMERGENCY_KEY_MARKERS)
+
+def plan_analyses(vehicle_id, key):
+    """
+    AnalysisPlan for the frame from latest telemetry, recent alerts and last runs
+    """
+    emergency = is_emergency_frame(key)
+    if emergency:
+        # Panic/emergency path is never throttled: no lookups needed
+        return AnalysisPlan(ANALYSES, 'emergency', emergency=True)
+    if not ANALYSIS_SCHEDULE_TABLE or vehicle_id == 'unknown':
+        return AnalysisPlan(ANALYSES, 'unscheduled')
+    
+    now = time.time()
+    try:
+        latest_state, last_runs = get_schedule_context(vehicle_id)
+        recent_alerts = get_recent_alert_severities(vehicle_id, now)
+    except Exception as e:
+        # Without context, analyze everything rather than miss an event
+        logger.warning(f"Error loading schedule context for {vehicle_id}: {str(e)}")
+        return AnalysisPlan(ANALYSES, 'no_context')
+    
+    return analysis_scheduler.plan(now, latest_state, last_runs, recent_alerts)
+
+def get_schedule_context(vehicle_id):
+    """
+    Latest telemetry state and last analysis runs of the vehicle in one BatchGetItem
+    """
+    response = dynamodb.batch_get_item(RequestItems={
+        LATEST_STATE_TABLE: {
+            'Keys': [{'vehicle_id': vehicle_id}],
+            'ProjectionExpression': '#ts, speed, ignition',
+            'ExpressionAttributeNames': {'#ts': 'timestamp'}
+        },
+        ANALYSIS_SCHEDULE_TABLE: {'Keys': [{'vehicle_id': vehicle_id}]}
+    })
+    items = response.get('Responses', {})
+    
+    # Unprocessed keys simply count as missing: the scheduler then errs on analyzing
+    latest_items = items.get(LATEST_STATE_TABLE) or [None]
+    schedule_items = items.get(ANALYSIS_SCHEDULE_TABLE) or [{}]
+    last_runs = {name: schedule_items[0][name] for name in ANALYSES if name in schedule_items[0]}
+    return latest_items[0], last_runs
+
+def get_recent_alert_severities(vehicle_id, now):
+    """
+    Severities of the vehicle's alerts within the recent window
+    """
+    if not ALERTS_TABLE:
+        return ()
+    
+    response = dynamodb.Table(ALERTS_TABLE).query(
+        IndexName='VehicleIndex',
+        KeyConditionExpression=Key('vehicle_id').eq(vehicle_id) & Key('timestamp').gte(int(now) - RECENT_ALERT_WINDOW_SECONDS),
+        ProjectionExpression='severity'
+    )
+    return tuple(str(item.get('severity', '')).lower() for item in response.get('Items', []))
+
+def record_analysis_runs(vehicle_id, results):
+    """
+    Remember when each successful analysis ran so the next frames can skip it
+    """
+    if not ANALYSIS_SCHEDULE_TABLE or vehicle_id == 'unknown':
+        return
+    
+    analyses = results.get('analyses', {})
+    completed = [
+        name for name in results.get('analyses_run', ())
+        if not analysis_failed(name, analyses)
+    ]
+    if not completed:
+        return
+    
+    now = int(time.time())
+    try:
+        dynamodb.Table(ANALYSIS_SCHEDULE_TABLE).update_item(
+            Key={'vehicle_id': vehicle_id},
+            UpdateExpression='SET ' + ', '.join(f"#{name} = :now" for name in completed) + ', #ttl = :ttl',
+            ExpressionAttributeNames={**{f"#{name}": name for name in completed}, '#ttl': 'ttl'},
+            ExpressionAttributeValues={':now': now, ':ttl': now + 86400}
+        )
+    except Exception as e:
+        logger.warning(f"Error recording analysis runs for {vehicle_id}: {str(e)}")
+
+def compute_frame_hash(bucket, key):
+    """
+    dHash of the frame, or None when suppression is disabled or unavailable
+    """
+    if not FRAME_DEDUP_ENABLED or not dhash_available():
+        return None
+    
+    try:
+        image_bytes = s3.get_object(Bucket=bucket, Key=key)['Body'].read()
+        return dhash(image_bytes)
+    except Exception as e:
+        logger.warning(f"Could not hash frame s3://{bucket}/{key}: {str(e)}")
+        return None
+
+def reuse_analysis_results(bucket, key, metadata, cached_results, frame_hash):
+    """
+    Results for a suppressed frame, copied from the last analyzed frame.
+    Alerts are not re-sent: they were raised for the original frame.
+    """
+    logger.info(f"Suppressed near-duplicate frame s3://{bucket}/{key} "
+                f"(reusing {cached_results['analysis_id']})")
+    
+    return {
+        'analysis_id': str(uuid.uuid4()),
+        'vehicle_id': metadata['vehicle_id'],
+        'timestamp': metadata['timestamp'],
+        's3_location': f"s3://{bucket}/{key}",
+        'ttl': int((datetime.now() + timedelta(days=90)).timestamp()),
+        'analyses': cached_results['analyses'],
+        'frame_hash': f"{frame_hash:016x}",
+        'duplicate_of': cached_results['analysis_id'],
+        'rekognition_calls': 0
+    }
+
+def analysis_failed(name, analyses):
+    """
+    True if the Rekognition call behind an analysis failed
+    """
+    if name == 'labels':
+        # A failed detect_labels call puts the error in every post-processor
+        outputs = [analyses.get(processor) for processor in LABEL_POSTPROCESSORS]
+        return all(isinstance(output, dict) and 'error' in output for output in outputs)
+    return 'error' in (analyses.get(name) or {})
+
+def publish_frame_metrics(outcomes):
+    """
+    Suppression rate, scheduler skips and Rekognition calls saved for this invocation
+    """
+    if not outcomes:
+        return
+    
+    suppressed = sum(1 for outcome in outcomes if outcome['suppressed'])
+    skipped = sum(1 for outcome in outcomes if outcome['skipped'])
+    calls_saved = sum(outcome['calls_saved'] for outcome in outcomes)
+    calls_skipped = sum(outcome['calls_skipped'] for outcome in outcomes)
+    
+    try:
+        cloudwatch.put_metric_data(
+            Namespace=METRICS_NAMESPACE,
+            MetricData=[
+                {'MetricName': 'FramesProcessed', 'Value': len(outcomes), 'Unit': 'Count'},
+                {'MetricName': 'FramesSuppressed', 'Value': suppressed, 'Unit': 'Count'},
+                {'MetricName': 'SuppressionRate', 'Value': 100.0 * suppressed / len(outcomes), 'Unit': 'Percent'},
+                {'MetricName': 'RekognitionCallsSaved', 'Value': calls_saved, 'Unit': 'Count'},
+                {'MetricName': 'FramesSkippedByScheduler', 'Value': skipped, 'Unit': 'Count'},
+                {'MetricName': 'AnalysesSkippedByScheduler', 'Value': calls_skipped, 'Unit': 'Count'}
+            ]
+        )
+    except Exception as e:
+        logger.warning(f"Error publishing frame metrics: {str(e)}")
+
 def extract_metadata_from_key(s3_key):
     """
     Extract vehicle and timestamp info from S3 key
@@ -63,6 +334,11 @@ def extract_metadata_from_key(s3_key):
     try:
         parts = s3_key.split('/')
         
+        # Hora exacta del frame si el nombre la trae (frame_103000.jpg, panic_103000_01.jpg)
+        frame_time = FRAME_TIME_PATTERN.search(parts[6])
+        time_of_day = f"{frame_time.group(1)}:{frame_time.group(2)}:{frame_time.group(3)}" if frame_time \
+            else f"{parts[5]}:30:00"
+        
         return {
             'vehicle_id': parts[1],
             'year': parts[2],
@@ -70,7 +346,7 @@ def extract_metadata_from_key(s3_key):
             'day': parts[4],
             'hour': parts[5],
             'filename': parts[6],
-            'timestamp': f"{parts[2]}-{parts[3]}-{parts[4]}T{parts[5]}:30:00Z"
+            'timestamp': f"{parts[2]}-{parts[3]}-{parts[4]}T{time_of_day}Z"
         }
     except Exception as e:
         logger.error(f"Error extracting metadata from key {s3_key}: {str(e)}")
@@ -79,9 +355,9 @@ def extract_metadata_from_key(s3_key):
             'timestamp': datetime.now().isoformat()
         }
 
-def process_image(bucket, key, metadata):
+def process_image(bucket, key, metadata, analyses_to_run=ANALYSES):
     """
-    Process image with multiple Rekognition services
+    Process image with the selected Rekognition services (all by default)
     """
     analysis_id = str(uuid.uuid4())
     
@@ -95,21 +371,28 @@ def process_image(bucket, key, metadata):
     }
     
     try:
-        # 1. Driver Behavior Analysis - Face Detection
-        face_analysis = analyze_driver_behavior(bucket, key)
-        results['analyses']['driver_behavior'] = face_analysis
-        
-        # 2. Safety Analysis - Object Detection
-        safety_analysis = analyze_safety_conditions(bucket, key)
-        results['analyses']['safety'] = safety_analysis
+        tasks = {
+            # 1. Driver Behavior Analysis - Face Detection
+            'driver_behavior': (analyze_driver_behavior, (bucket, key)),
+            # 2. Label Detection - one call feeds safety, scene and emergency post-processors
+            'labels': (analyze_labels, (bucket, key)),
+            # 3. Text Recognition - License plates, signs
+            'text': (analyze_text_content, (bucket, key))
+        }
         
-        # 3. Text Recognition - License plates, signs
-        text_analysis = analyze_text_content(bucket, key)
-        results['analyses']['text'] = text_analysis
+        # Independent analyses run in parallel: latency ~ slowest call, not the sum
+        analyses = rekognition_executor.run_parallel(
+            {name: task for name, task in tasks.items() if name in analyses_to_run}
+        )
         
-        # 4. Scene Analysis - General labels
-        scene_analysis = analyze_scene_content(bucket, key)
-        results['analyses']['scene'] = scene_analysis
+        if 'driver_behavior' in analyses:
+            results['analyses']['driver_behavior'] = analyses['driver_behavior']
+        if 'labels' in analyses:
+            results['analyses'].update(analyses['labels'])
+        if 'text' in analyses:
+            results['analyses']['text'] = analyses['text']
+        results['analyses_run'] = sorted(analyses)
+        results['rekognition_calls'] = len(analyses)
         
         logger.info(f"Completed analysis for {analysis_id}")
         
@@ -124,7 +407,8 @@ def analyze_driver_behavior(bucket, key):
     Analyze driver behavior using face detection
     """
     try:
-        response = rekognition.detect_faces(
+        response = rekognition_executor.call(
+            'detect_faces',
             Image={
                 'S3Object': {
                     'Bucket': bucket,
@@ -176,80 +460,36 @@ def analyze_driver_behavior(bucket, key):
         logger.error(f"Error in driver behavior analysis: {str(e)}")
         return {'error': str(e)}
 
-def analyze_safety_conditions(bucket, key):
+def analyze_labels(bucket, key):
     """
-    Analyze safety conditions using object detection
+    Single label detection pass shared by all label post-processors
+    (safety, scene, emergency)
     """
     try:
-        response = rekognition.detect_labels(
+        response = rekognition_executor.call(
+            'detect_labels',
             Image={
                 'S3Object': {
                     'Bucket': bucket,
                     'Name': key
                 }
             },
-            MaxLabels=50,
-            MinConfidence=70
+            **LABEL_DETECTION_PARAMS
         )
         
-        safety_analysis = {
-            'safety_alerts': [],
-            'detected_objects': []
-        }
-        
-        for label in response['Labels']:
-            label_name = label['Name'].lower()
-            confidence = label['Confidence']
-            
-            # Store all detected objects
-            safety_analysis['detected_objects'].append({
-                'name': label['Name'],
-                'confidence': confidence
-            })
-            
-            # Check for safety violations
-            if label_name in ['mobile phone', 'cell phone', 'smartphone']:
-                safety_analysis['safety_alerts'].append({
-                    'type': 'phone_usage',
-                    'confidence': confidence,
-                    'severity': 'high'
-                })
-            
-            elif label_name in ['alcohol', 'beer', 'wine']:
-                safety_analysis['safety_alerts'].append({
-                    'type': 'alcohol_detected',
-                    'confidence': confidence,
-                    'severity': 'critical'
-                })
-            
-            elif label_name in ['cigarette', 'smoking']:
-                safety_analysis['safety_alerts'].append({
-                    'type': 'smoking',
-                    'confidence': confidence,
-                    'severity': 'medium'
-                })
-            
-            # Check for emergency situations
-            elif label_name in ['fire', 'smoke', 'accident']:
-                safety_analysis['safety_alerts'].append({
-                    'type': 'emergency_situation',
-                    'detected': label['Name'],
-                    'confidence': confidence,
-                    'severity': 'critical'
-                })
-        
-        return safety_analysis
+        return run_label_postprocessors(response['Labels'])
         
     except Exception as e:
-        logger.error(f"Error in safety analysis: {str(e)}")
-        return {'error': str(e)}
+        logger.error(f"Error in label analysis: {str(e)}")
+        return {name: {'error': str(e)} for name in LABEL_POSTPROCESSORS}
 
 def analyze_text_content(bucket, key):
     """
     Analyze text content for license plates, signs, etc.
     """
     try:
-        response = rekognition.detect_text(
+        response = rekognition_executor.call(
+            'detect_text',
             Image={
                 'S3Object': {
                     'Bucket': bucket,
@@ -258,110 +498,12 @@ def analyze_text_content(bucket, key):
             }
         )
         
-        text_analysis = {
-            'license_plates': [],
-            'traffic_signs': [],
-            'other_text': []
-        }
-        
-        for text_detection in response['TextDetections']:
-            if text_detection['Type'] == 'LINE':
-                detected_text = text_detection['DetectedText']
-                confidence = text_detection['Confidence']
-                
-                # License plate pattern detection (simplified)
-                if is_license_plate_pattern(detected_text):
-                    text_analysis['license_plates'].append({
-                        'text': detected_text,
-                        'confidence': confidence,
-                        'bounding_box': text_detection['Geometry']['BoundingBox']
-                    })
-                
-                # Traffic sign keywords
-                elif any(keyword in detected_text.upper() for keyword in ['STOP', 'SPEED', 'LIMIT', 'YIELD', 'NO']):
-                    text_analysis['traffic_signs'].append({
-                        'text': detected_text,
-                        'confidence': confidence
-                    })
-                
-                else:
-                    text_analysis['other_text'].append({
-                        'text': detected_text,
-                        'confidence': confidence
-                    })
-        
-        return text_analysis
+        return classify_text_detections(response['TextDetections'])
         
     except Exception as e:
         logger.error(f"Error in text analysis: {str(e)}")
         return {'error': str(e)}
 
-def analyze_scene_content(bucket, key):
-    """
-    General scene analysis for context
-    """
-    try:
-        response = rekognition.detect_labels(
-            Image={
-                'S3Object': {
-                    'Bucket': bucket,
-                    'Name': key
-                }
-            },
-            MaxLabels=20,
-            MinConfidence=80
-        )
-        
-        scene_analysis = {
-            'environment': 'unknown',
-            'weather_conditions': [],
-            'road_conditions': [],
-            'time_of_day': 'unknown'
-        }
-        
-        for label in response['Labels']:
-            label_name = label['Name'].lower()
-            
-            # Environment detection
-            if label_name in ['highway', 'road', 'street']:
-                scene_analysis['environment'] = 'urban'
-            elif label_name in ['countryside', 'field', 'mountain']:
-                scene_analysis['environment'] = 'rural'
-            
-            # Weather conditions
-            if label_name in ['rain', 'snow', 'fog']:
-                scene_analysis['weather_conditions'].append(label['Name'])
-            
-            # Time of day
-            if label_name in ['sunset', 'sunrise', 'night']:
-                scene_analysis['time_of_day'] = label['Name']
-        
-        return scene_analysis
-        
-    except Exception as e:
-        logger.error(f"Error in scene analysis: {str(e)}")
-        return {'error': str(e)}
-
-def is_license_plate_pattern(text):
-    """
-    Simple license plate pattern detection
-    """
-    import re
-    
-    # Common license plate patterns (adjust for your region)
-    patterns = [
-        r'^[A-Z]{3}-\d{3}$',  # ABC-123
-        r'^\d{3}-[A-Z]{3}$',  # 123-ABC
-        r'^[A-Z]{2}\d{4}$',   # AB1234
-        r'^\d{3}[A-Z]{3}$'    # 123ABC
-    ]
-    
-    for pattern in patterns:
-        if re.match(pattern, text.upper()):
-            return True
-    
-    return False
-
 def store_analysis_results(results):
     """
     Store analysis results in DynamoDB
@@ -369,6 +511,7 @@ def store_analysis_results(results):
     try:
         # Convert any float values to Decimal for DynamoDB
         item = json.loads(json.dumps(results), parse_float=Decimal)
+        item.update(alert_index_attributes(results))
         
         results_table.put_item(Item=item)
         logger.info(f"Stored analysis results for {results['analysis_id']}")
@@ -377,34 +520,57 @@ def store_analysis_results(results):
         logger.error(f"Error storing results: {str(e)}")
         raise
 
-def check_and_send_alerts(results):
+def collect_alerts(results, severities=None):
     """
-    Check analysis results and send alerts if needed
+    Driver behavior and safety alerts of the analysis, optionally filtered by severity
     """
-    try:
-        alerts_to_send = []
-        
-        # Check driver behavior alerts
-        driver_behavior = results['analyses'].get('driver_behavior', {})
-        for alert in driver_behavior.get('driver_alerts', []):
-            if alert['severity'] in ['high', 'critical']:
-                alerts_to_send.append({
-                    'type': 'driver_behavior',
-                    'subtype': alert['type'],
-                    'severity': alert['severity'],
-                    'confidence': alert['confidence']
-                })
-        
-        # Check safety alerts
-        safety = results['analyses'].get('safety', {})
-        for alert in safety.get('safety_alerts', []):
-            if alert['severity'] in ['high', 'critical']:
-                alerts_to_send.append({
-                    'type': 'safety_violation',
+    alerts = []
+    analyses = results.get('analyses', {})
+    for alert_type, analysis, field in ALERT_SOURCES:
+        for alert in (analyses.get(analysis) or {}).get(field, []):
+            if severities is None or alert['severity'] in severities:
+                alerts.append({
+                    'type': alert_type,
                     'subtype': alert['type'],
                     'severity': alert['severity'],
                     'confidence': alert['confidence']
                 })
+    return alerts
+
+def alert_index_attributes(results):
+    """
+    Attributes that place the item in the sparse alert indexes.
+    Frames without alerts, and suppressed duplicates (whose alerts belong to
+    the original frame), get none and stay out of those indexes.
+    """
+    if results.get('duplicate_of'):
+        return {}
+    
+    alerts = collect_alerts(results)
+    if not alerts:
+        return {}
+    
+    timestamp = results['timestamp']
+    alert_types = sorted({alert['type'] for alert in alerts})
+    top_severity = max((alert['severity'] for alert in alerts), key=lambda severity: SEVERITY_RANK.get(severity, 0))
+    
+    attributes = {
+        'alert_types': alert_types,
+        'alert_count': len(alerts),
+        'alert_severity': top_severity,
+        # Range key of SeverityIndex: one vehicle's alerts of a severity, in time order
+        'severity_alert_at': f"{top_severity}#{timestamp}"
+    }
+    for alert_type in alert_types:
+        attributes[ALERT_TYPE_INDEXES[alert_type][1]] = timestamp
+    return attributes
+
+def check_and_send_alerts(results):
+    """
+    Check analysis results and send alerts if needed
+    """
+    try:
+        alerts_to_send = collect_alerts(results, severities=('high', 'critical'))
         
         # Send alerts via SNS
         if alerts_to_send:
@@ -427,3 +593,114 @@ def check_and_send_alerts(results):
     except Exception as e:
         logger.error(f"Error sending alerts: {str(e)}")
         raise
+
+def handle_results_query(event):
+    """
+    Direct invocation: {"action": "query_results", "vehicle_id": ..., "start": ..., "end": ...,
+    "alert_type": ..., "severity": ..., "limit": ..., "next_token": ...}
+    """
+    try:
+        page = query_analysis_results(
+            event.get('vehicle_id'),
+            start=event.get('start'),
+            end=event.get('end'),
+            alert_type=event.get('alert_type'),
+            severity=event.get('severity'),
+            limit=event.get('limit'),
+            next_token=event.get('next_token')
+        )
+        return {'statusCode': 200, 'body': json.dumps(page)}
+    
+    except ValueError as e:
+        return {'statusCode': 400, 'body': json.dumps({'error': str(e)})}
+
+def query_analysis_results(vehicle_id, start=None, end=None, alert_type=None, severity=None, limit=None,
+                           next_token=None):
+    """
+    One page of a vehicle's analysis results, newest first.
+    
+    start/end are ISO 8601 timestamps (or prefixes such as '2025-01-25'), both
+    inclusive. alert_type ('driver_behavior', 'safety_violation') and severity
+    (highest alert severity of the frame) read the sparse alert indexes, so only
+    frames that raised alerts are touched. Pass the returned next_token to get
+    the following page; it is None on the last one.
+    """
+    if not vehicle_id:
+        raise ValueError("vehicle_id is required")
+    if alert_type and alert_type not in ALERT_TYPE_INDEXES:
+        raise ValueError(f"Unsupported alert_type: {alert_type}")
+    if severity and severity not in SEVERITY_RANK:
+        raise ValueError(f"Unsupported severity: {severity}")
+    
+    limit = max(1, min(int(limit or RESULTS_QUERY_DEFAULT_LIMIT), RESULTS_QUERY_MAX_LIMIT))
+    
+    if severity:
+        index_name, range_attribute, prefix = 'SeverityIndex', 'severity_alert_at', f"{severity}#"
+    elif alert_type:
+        index_name, range_attribute = ALERT_TYPE_INDEXES[alert_type]
+        prefix = ''
+    else:
+        index_name, range_attribute, prefix = 'VehicleIndex', 'timestamp', ''
+    
+    key_condition = Key('vehicle_id').eq(vehicle_id)
+    range_key = Key(range_attribute)
+    # '~' sorts after every timestamp character, so a date prefix as end covers the whole day.
+    # DynamoDB rejects empty key values, so only the bounds actually given are used.
+    if start and end:
+        key_condition &= range_key.between(f"{prefix}{start}", f"{prefix}{end}~")
+    elif prefix:
+        # Severity partition: stay inside '<severity>#'
+        if start:
+            key_condition &= range_key.between(f"{prefix}{start}", f"{prefix}~")
+        elif end:
+            key_condition &= range_key.between(prefix, f"{prefix}{end}~")
+        else:
+            key_condition &= range_key.begins_with(prefix)
+    elif start:
+        key_condition &= range_key.gte(start)
+    elif end:
+        key_condition &= range_key.lte(f"{end}~")
+    
+    query_params = {
+        'IndexName': index_name,
+        'KeyConditionExpression': key_condition,
+        'ScanIndexForward': False,
+        'Limit': limit
+    }
+    if severity and alert_type:
+        # Both filters: read the narrower severity partition and check the type
+        query_params['FilterExpression'] = Attr(ALERT_TYPE_INDEXES[alert_type][1]).exists()
+    if next_token:
+        query_params['ExclusiveStartKey'] = decode_next_token(next_token)
+    
+    response = results_table.query(**query_params)
+    items = convert_decimals(response.get('Items', []))
+    
+    return {
+        'items': items,
+        'count': len(items),
+        'next_token': encode_next_token(response.get('LastEvaluatedKey'))
+    }
+
+def encode_next_token(last_evaluated_key):
+    if not last_evaluated_key:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(last_evaluated_key).encode('utf-8')).decode('ascii')
+
+def decode_next_token(next_token):
+    try:
+        return json.loads(base64.urlsafe_b64decode(next_token.encode('ascii')))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid next_token")
+
+def convert_decimals(obj):
+    """
+    Convert DynamoDB Decimal values to int/float for JSON serialization
+    """
+    if isinstance(obj, list):
+        return [convert_decimals(item) for item in obj]
+    if isinstance(obj, dict):
+        return {key: convert_decimals(value) for key, value in obj.items()}
+    if isinstance(obj, Decimal):
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    return obj
@@ -5,6 +5,9 @@ from datetime import datetime, timedelta
 import logging
 import uuid
 
+from approver_workload import ApproverWorkload
+from manager_directory import ManagerDirectory
+
 # Configurar logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -14,10 +17,23 @@ dynamodb = boto3.resource('dynamodb')
 sns = boto3.client('sns')
 cognito = boto3.client('cognito-idp')
 
+approver_workload = ApproverWorkload(
+    dynamodb,
+    os.environ.get('APPROVER_WORKLOAD_TABLE', ''),
+    os.environ.get('APPROVALS_TABLE', '')
+)
+
+# Directorio sincronizado desde Cognito por manager_directory_sync, en caché por contenedor
+manager_directory = ManagerDirectory(dynamodb, os.environ.get('MANAGER_DIRECTORY_TABLE', ''))
+
 def handler(event, context):
     """
     Solicitar aprobación del manager para contratos de más de 50 vehículos
     """
+    if event.get('action') == 'rebuild_workload':
+        counts = approver_workload.rebuild()
+        return {'approvers_rebuilt': len(counts)}
+
     try:
         logger.info(f"Solicitando aprobación del manager: {json.dumps(event)}")
         
@@ -34,21 +50,10 @@ def handler(event, context):
         # Generar ID único para la aprobación
         approval_id = str(uuid.uuid4())
         
-        # Obtener managers disponibles
-        managers = get_available_managers()
-        
-        if not managers:
-            raise Exception("No hay managers disponibles para aprobación")
-        
-        # Crear registro de aprobación en DynamoDB
-        approvals_table = dynamodb.Table(os.environ['APPROVALS_TABLE'])
-        
+        # Crear registro de aprobación en DynamoDB; el aprobador se asigna al guardarlo
         approval_item = {
             'approval_id': approval_id,
             'contract_id': contract_id,
-            'approver_id': managers[0]['user_id'],  # Asignar al primer manager disponible
-            'approver_name': managers[0]['name'],
-            'approver_email': managers[0]['email'],
             'status': 'PENDING',
             'created_at': int(datetime.utcnow().timestamp()),
             'expires_at': int((datetime.utcnow() + timedelta(hours=72)).timestamp()),  # 72 horas para aprobar
@@ -64,7 +69,11 @@ def handler(event, context):
             'rejected_at': None
         }
         
-        approvals_table.put_item(Item=approval_item)
+        # Manager con menos aprobaciones pendientes, en la misma transacción que su contador
+        manager = approver_workload.assign(manager_directory.managers_for(total_contract_value), approval_item)
+        
+        if not manager:
+            raise Exception("No hay managers disponibles para aprobación")
         
         # Actualizar estado del contrato
         contracts_table = dynamodb.Table(os.environ['CONTRACTS_TABLE'])
@@ -81,7 +90,7 @@ def handler(event, context):
         
         # Enviar notificación al manager
         notification_sent = send_manager_notification(
-            manager=managers[0],
+            manager=manager,
             contract_id=contract_id,
             customer_name=customer_name,
             vehicle_count=vehicle_count,
@@ -96,9 +105,10 @@ def handler(event, context):
         response = {
             'approval_id': approval_id,
             'contract_id': contract_id,
-            'approver_id': managers[0]['user_id'],
-            'approver_name': managers[0]['name'],
-            'approver_email': managers[0]['email'],
+            'approver_id': manager['user_id'],
+            'approver_name': manager['name'],
+            'approver_email': manager['email'],
+            'approver_pending_approvals': manager['pending_approvals'] + 1,
             'approval_status': 'PENDING',
             'expires_at': approval_item['expires_at'],
             'notification_sent': notification_sent,
@@ -133,67 +143,6 @@ def handler(event, context):
             'contract_id': event.get('contract_id', 'unknown')
         }
 
-def get_available_managers():
-    """Obtener lista de managers disponibles para aprobación"""
-    try:
-        # En un entorno real, esto consultaría Cognito para obtener usuarios del grupo FleetManagers
-        # Por ahora, devolvemos una lista simulada
-        
-        managers = [
-            {
-                'user_id': 'manager-001',
-                'name': 'Carlos Rodriguez',
-                'email': 'carlos.rodriguez@vehicletracking.com',
-                'phone': '+51999123456',
-                'department': 'Fleet Operations',
-                'approval_limit': 1000000  # $1M
-            },
-            {
-                'user_id': 'manager-002',
-                'name': 'Ana Martinez',
-                'email': 'ana.martinez@vehicletracking.com',
-                'phone': '+51999654321',
-                'department': 'Sales',
-                'approval_limit': 500000   # $500K
-            }
-        ]
-        
-        # Filtrar managers activos y disponibles
-        available_managers = []
-        for manager in managers:
-            # Verificar si el manager no tiene demasiadas aprobaciones pendientes
-            pending_approvals = count_pending_approvals(manager['user_id'])
-            if pending_approvals < 5:  # Máximo 5 aprobaciones pendientes
-                available_managers.append(manager)
-        
-        return available_managers
-        
-    except Exception as e:
-        logger.error(f"Error obteniendo managers: {str(e)}")
-        return []
-
-def count_pending_approvals(manager_id):
-    """Contar aprobaciones pendientes de un manager"""
-    try:
-        approvals_table = dynamodb.Table(os.environ['APPROVALS_TABLE'])
-        
-        response = approvals_table.query(
-            IndexName='ApproverIndex',
-            KeyConditionExpression='approver_id = :approver_id',
-            FilterExpression='#status = :status',
-            ExpressionAttributeNames={'#status': 'status'},
-            ExpressionAttributeValues={
-                ':approver_id': manager_id,
-                ':status': 'PENDING'
-            }
-        )
-        
-        return len(response.get('Items', []))
-        
-    except Exception as e:
-        logger.error(f"Error contando aprobaciones pendientes: {str(e)}")
-        return 0
-
 def send_manager_notification(manager, contract_id, customer_name, vehicle_count, total_value, risk_level, approval_url):
     """Enviar notificación al manager para aprobación"""
     try:
@@ -1,9 +1,16 @@
 import json
+import os
+import time
 import boto3
 import logging
+from collections import defaultdict
 from datetime import datetime, timedelta
 from decimal import Decimal
 
+from geo_index import encode as geohash_encode
+from geofence_engine import Geofence, GeofenceIndex, diff_transitions
+from trip_segmenter import TripSegmenter
+
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -15,18 +22,49 @@ s3 = boto3.client('s3')
 # Table references
 hot_table = dynamodb.Table('vehicle-tracking-telemetry-hot')
 warm_table = dynamodb.Table('vehicle-tracking-telemetry-warm')
+latest_table = dynamodb.Table(os.environ.get('LATEST_STATE_TABLE', 'vehicle-tracking-vehicle-latest'))
+geo_index_table = dynamodb.Table(os.environ.get('GEO_INDEX_TABLE', 'vehicle-tracking-vehicle-geo-index'))
+vehicles_table = dynamodb.Table(os.environ.get('VEHICLES_TABLE', 'vehicle-tracking-vehicles'))
+geofences_table = dynamodb.Table(os.environ.get('GEOFENCES_TABLE', 'vehicle-tracking-geofences'))
+geofence_state_table = dynamodb.Table(os.environ.get('GEOFENCE_STATE_TABLE', 'vehicle-tracking-geofence-state'))
+
+# Per-container geofence caches; membership state is read per batch instead,
+# since Lambda does not pin a shard to one container
+GEOFENCE_RELOAD_SECONDS = int(os.environ.get('GEOFENCE_RELOAD_SECONDS', 300))
+_geofence_indexes = {}   # tenant_id -> (loaded_at, GeofenceIndex)
+_vehicle_tenants = {}    # vehicle_id -> tenant_id
+
+# Index entries of vehicles that stopped reporting expire instead of lingering in old cells
+GEO_INDEX_TTL_HOURS = int(os.environ.get('GEO_INDEX_TTL_HOURS', 48))
+
+trips_table = dynamodb.Table(os.environ.get('TRIPS_TABLE', 'vehicle-tracking-trips'))
+trip_state_table = dynamodb.Table(os.environ.get('TRIP_STATE_TABLE', 'vehicle-tracking-trip-state'))
+
+# Open trips are reloaded from trip_state on every batch: another container may
+# have processed the vehicle since this one last saw it
+trip_segmenter = TripSegmenter()
+
+BATCH_GET_MAX_KEYS = 100
 
 def lambda_handler(event, context):
     """
     Process IoT telemetry data with hot/warm/cold storage strategy
     """
     try:
+        payloads = []
         for record in event['Records']:
             # Parse IoT message from Kinesis
             payload = json.loads(record['kinesis']['data'])
             
             # Process telemetry data
             process_telemetry(payload)
+            payloads.append(payload)
+        
+        # Geofence enter/exit transitions for the whole batch
+        process_geofences(payloads)
+        
+        # Trip segmentation; closed trips become one row in the trips table
+        process_trips(payloads)
             
         return {
             'statusCode': 200,
@@ -47,14 +85,17 @@ def process_telemetry(payload):
     # 1. Hot Storage - Real-time access (48h TTL)
     store_hot_data(payload)
     
-    # 2. Warm Storage - Recent analysis (30d TTL)
+    # 2. Last known state - one item per vehicle for point lookups
+    update_latest_state(payload)
+    
+    # 3. Warm Storage - Recent analysis (30d TTL)
     store_warm_data(payload)
     
-    # 3. Cold Storage - Historical analysis (S3)
+    # 4. Cold Storage - Historical analysis (S3)
     if should_archive_to_cold(payload):
         store_cold_data(payload)
     
-    # 4. Process alerts if needed
+    # 5. Process alerts if needed
     check_for_alerts(payload)
 
 def store_hot_data(payload):
@@ -85,6 +126,120 @@ def store_hot_data(payload):
         logger.error(f"Error storing hot data: {str(e)}")
         raise
 
+def to_epoch_millis(payload):
+    """
+    Device timestamp as epoch milliseconds, falling back to the IoT rule timestamp
+    """
+    try:
+        dt = datetime.fromisoformat(payload['timestamp'].replace('Z', '+00:00'))
+        return int(dt.timestamp() * 1000)
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return int(payload.get('aws_timestamp') or datetime.utcnow().timestamp() * 1000)
+
+def extract_position(payload):
+    """
+    Normalize position fields; devices send speed either at top level or under location
+    """
+    location = payload.get('location', {}) or {}
+    engine = payload.get('engine', {}) or {}
+    
+    return {
+        'lat': location.get('lat'),
+        'lng': location.get('lng'),
+        'speed': payload.get('speed', location.get('speed', 0)),
+        'fuel_level': payload.get('fuel_level', engine.get('fuel_level', 0)),
+        'engine_temp': payload.get('engine_temp', engine.get('temperature', 0))
+    }
+
+def update_latest_state(payload):
+    """
+    Upsert the last known state of the vehicle; only newer timestamps win.
+    Also keeps the geohash cell index in sync with the accepted position.
+    """
+    try:
+        position = extract_position(payload)
+        ts = to_epoch_millis(payload)
+        has_position = position['lat'] is not None and position['lng'] is not None
+        geo_cell = geohash_encode(position['lat'], position['lng']) if has_position else None
+        
+        item = {
+            'timestamp': ts,
+            'reported_at': payload.get('timestamp'),
+            'location': {'lat': position['lat'], 'lng': position['lng']},
+            'speed': position['speed'],
+            'fuel_level': position['fuel_level'],
+            'engine_temp': position['engine_temp'],
+            'geo_cell': geo_cell,
+            'ignition': extract_ignition(payload)
+        }
+        
+        # Convert floats to Decimal for DynamoDB
+        item = json.loads(json.dumps(item), parse_float=Decimal)
+        
+        # prev_geo_cell keeps the cell being replaced, so a retry after a failed
+        # index update can still remove the vehicle from it
+        names = {'#prev_cell': 'prev_geo_cell', '#cell': 'geo_cell'}
+        values = {':no_cell': ''}
+        set_actions = ['#prev_cell = if_not_exists(#cell, :no_cell)']
+        remove_actions = []
+        for index, (name, value) in enumerate(item.items()):
+            placeholder = '#cell' if name == 'geo_cell' else f"#f{index}"
+            names[placeholder] = name
+            if value is None:
+                remove_actions.append(placeholder)
+            else:
+                values[f":v{index}"] = value
+                set_actions.append(f"{placeholder} = :v{index}")
+        
+        update_expression = 'SET ' + ', '.join(set_actions)
+        if remove_actions:
+            update_expression += ' REMOVE ' + ', '.join(remove_actions)
+        
+        response = latest_table.update_item(
+            Key={'vehicle_id': payload['vehicle_id']},
+            UpdateExpression=update_expression,
+            ConditionExpression='attribute_not_exists(vehicle_id) OR #ts < :ts',
+            ExpressionAttributeNames=dict(names, **{'#ts': 'timestamp'}),
+            ExpressionAttributeValues=dict(values, **{':ts': ts}),
+            ReturnValues='ALL_NEW'
+        )
+        
+        latest_item = response['Attributes']
+        update_geo_index(latest_item, latest_item.get('prev_geo_cell'))
+        
+    except latest_table.meta.client.exceptions.ConditionalCheckFailedException:
+        stored = latest_table.get_item(Key={'vehicle_id': payload['vehicle_id']}, ConsistentRead=True).get('Item')
+        if stored and stored.get('timestamp') == ts:
+            # Retry of a record already stored: its index update may not have completed
+            update_geo_index(stored, stored.get('prev_geo_cell'))
+        else:
+            # Out-of-order record: a newer state is already stored
+            logger.info(f"Skipped stale latest state for vehicle {payload['vehicle_id']}")
+    except Exception as e:
+        logger.error(f"Error updating latest state: {str(e)}")
+        raise
+
+def update_geo_index(latest_item, previous_cell):
+    """
+    Move the vehicle entry between geohash cells (hash: cell, range: vehicle_id)
+    """
+    geo_cell = latest_item.get('geo_cell')
+    vehicle_id = latest_item['vehicle_id']
+    
+    if geo_cell:
+        geo_index_table.put_item(Item={
+            'cell': geo_cell,
+            'vehicle_id': vehicle_id,
+            'lat': latest_item['location']['lat'],
+            'lng': latest_item['location']['lng'],
+            'speed': latest_item['speed'],
+            'timestamp': latest_item['timestamp'],
+            'ttl': int((datetime.now() + timedelta(hours=GEO_INDEX_TTL_HOURS)).timestamp())
+        })
+    
+    if previous_cell and previous_cell != geo_cell:
+        geo_index_table.delete_item(Key={'cell': previous_cell, 'vehicle_id': vehicle_id})
+
 def store_warm_data(payload):
     """
     Store aggregated data for recent analysis
@@ -223,3 +378,277 @@ def check_for_alerts(payload):
         )
         
         logger.info(f"Alert sent for vehicle {payload['vehicle_id']}: {events}")
+
+def process_geofences(payloads):
+    """
+    Evaluate the batch against each tenant's geofences and publish only
+    enter/exit transitions
+    """
+    try:
+        by_tenant = defaultdict(list)
+        for payload in payloads:
+            position = extract_position(payload)
+            if position['lat'] is None or position['lng'] is None:
+                continue
+            tenant_id = resolve_tenant(payload)
+            if tenant_id:
+                by_tenant[tenant_id].append((payload, float(position['lat']), float(position['lng'])))
+        
+        stored = load_geofence_states([payload['vehicle_id'] for entries in by_tenant.values()
+                                       for payload, _, _ in entries])
+        events = []
+        states = {}
+        for tenant_id, entries in by_tenant.items():
+            index = get_geofence_index(tenant_id)
+            if not len(index):
+                continue
+            
+            # Payloads arrive ordered per vehicle, so sequential diffs catch
+            # enter+exit within the same batch
+            memberships = index.evaluate_batch([(lat, lng) for _, lat, lng in entries])
+            changed = {}
+            last_seen = {}
+            for (payload, _, _), current in zip(entries, memberships):
+                vehicle_id = payload['vehicle_id']
+                previous = changed.get(vehicle_id)
+                if previous is None:
+                    previous = stored[vehicle_id]
+                if current != previous:
+                    events.extend(diff_transitions(vehicle_id, previous, current, index.fences, payload.get('timestamp')))
+                changed[vehicle_id] = current
+                last_seen[vehicle_id] = to_epoch_millis(payload)
+            
+            states.update({vehicle_id: (current, last_seen[vehicle_id]) for vehicle_id, current in changed.items()})
+        
+        # Publish before persisting: if the publish fails, the stored state is
+        # unchanged and the next batch detects the same transitions again
+        if events:
+            publish_geofence_events(events)
+        
+        for vehicle_id, (current, ts) in states.items():
+            if current != stored[vehicle_id]:
+                save_geofence_state(vehicle_id, current, ts)
+        
+    except Exception as e:
+        # Geofencing must never block telemetry ingestion
+        logger.error(f"Error evaluating geofences: {str(e)}")
+
+def resolve_tenant(payload):
+    """
+    Tenant that owns the vehicle, from the payload or the vehicles table
+    """
+    tenant_id = payload.get('tenant_id') or payload.get('owner_id')
+    if tenant_id:
+        return tenant_id
+    
+    vehicle_id = payload['vehicle_id']
+    if vehicle_id not in _vehicle_tenants:
+        response = vehicles_table.get_item(
+            Key={'vehicle_id': vehicle_id},
+            ProjectionExpression='owner_id'
+        )
+        _vehicle_tenants[vehicle_id] = response.get('Item', {}).get('owner_id')
+    
+    return _vehicle_tenants[vehicle_id]
+
+def get_geofence_index(tenant_id):
+    """
+    Load the tenant's polygons once per container and rebuild the index periodically
+    """
+    cached = _geofence_indexes.get(tenant_id)
+    if cached and time.monotonic() - cached[0] < GEOFENCE_RELOAD_SECONDS:
+        return cached[1]
+    
+    fences = []
+    query_kwargs = {
+        'KeyConditionExpression': 'tenant_id = :tenant_id',
+        'ExpressionAttributeValues': {':tenant_id': tenant_id}
+    }
+    while True:
+        response = geofences_table.query(**query_kwargs)
+        for item in response.get('Items', []):
+            if item.get('active', True) is False:
+                continue
+            try:
+                fences.append(Geofence(
+                    item['fence_id'],
+                    item.get('name', item['fence_id']),
+                    item.get('fence_type', 'CUSTOMER_SITE'),
+                    [(float(lat), float(lng)) for lat, lng in item['vertices']]
+                ))
+            except (KeyError, ValueError) as e:
+                logger.error(f"Invalid geofence {item.get('fence_id')}: {str(e)}")
+        if 'LastEvaluatedKey' not in response:
+            break
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    
+    index = GeofenceIndex(fences)
+    _geofence_indexes[tenant_id] = (time.monotonic(), index)
+    logger.info(f"Loaded {len(index)} geofences for tenant {tenant_id}")
+    return index
+
+def load_geofence_states(vehicle_ids):
+    """
+    Fences each vehicle was inside after its last evaluated position,
+    read with one BatchGetItem per 100 vehicles
+    """
+    vehicle_ids = list(dict.fromkeys(vehicle_ids))
+    states = {vehicle_id: set() for vehicle_id in vehicle_ids}
+    
+    for start in range(0, len(vehicle_ids), BATCH_GET_MAX_KEYS):
+        request = {
+            geofence_state_table.name: {
+                'Keys': [{'vehicle_id': vehicle_id} for vehicle_id in vehicle_ids[start:start + BATCH_GET_MAX_KEYS]],
+                'ProjectionExpression': 'vehicle_id, fences'
+            }
+        }
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            for item in response.get('Responses', {}).get(geofence_state_table.name, []):
+                states[item['vehicle_id']] = set(item.get('fences', []))
+            request = response.get('UnprocessedKeys')
+    
+    return states
+
+def save_geofence_state(vehicle_id, fences, ts):
+    """
+    Persist membership only when it changes; a state saved from a newer
+    position (another container) is never overwritten
+    """
+    try:
+        geofence_state_table.put_item(
+            Item={
+                'vehicle_id': vehicle_id,
+                'fences': sorted(fences),
+                'last_ts': ts,
+                'updated_at': datetime.utcnow().isoformat()
+            },
+            ConditionExpression='attribute_not_exists(last_ts) OR last_ts < :ts',
+            ExpressionAttributeValues={':ts': ts}
+        )
+    except geofence_state_table.meta.client.exceptions.ConditionalCheckFailedException:
+        logger.info(f"Skipped stale geofence state for vehicle {vehicle_id}")
+
+def publish_geofence_events(events):
+    """
+    Send geofence transitions to SNS in a single message per batch
+    """
+    sns = boto3.client('sns')
+    
+    sns.publish(
+        TopicArn='arn:aws:sns:us-east-1:123456789012:vehicle-alerts',
+        Message=json.dumps({'alert_type': 'GEOFENCE_TRANSITION', 'events': events}),
+        Subject=f"Geofence transitions: {len(events)}",
+        MessageAttributes={
+            'alert_type': {
+                'DataType': 'String',
+                'StringValue': 'GEOFENCE_TRANSITION'
+            }
+        }
+    )
+    
+    logger.info(f"Published {len(events)} geofence transitions")
+
+def extract_ignition(payload):
+    """
+    Ignition flag if the device reports one, otherwise None
+    """
+    for value in (payload.get('ignition'), payload.get('engine_on'), (payload.get('engine') or {}).get('ignition')):
+        if value is not None:
+            return bool(value)
+    return None
+
+def process_trips(payloads):
+    """
+    Feed the batch to the trip segmenter and write one summary row per closed trip.
+    Checkpoints are written only after the trips are stored, so a replayed
+    batch starts from the same open trip and reproduces the same close.
+    """
+    vehicle_ids = list(dict.fromkeys(payload['vehicle_id'] for payload in payloads))
+    loaded = load_open_trips(vehicle_ids)
+    closed_trips = []
+    
+    for payload in sorted(payloads, key=to_epoch_millis):
+        position = extract_position(payload)
+        closed_trips.extend(trip_segmenter.process(
+            payload['vehicle_id'],
+            to_epoch_millis(payload),
+            float(position['lat']) if position['lat'] is not None else None,
+            float(position['lng']) if position['lng'] is not None else None,
+            float(position['speed'] or 0),
+            ignition=extract_ignition(payload),
+            driver_id=payload.get('driver_id')
+        ))
+    
+    if closed_trips:
+        with trips_table.batch_writer(overwrite_by_pkeys=['trip_id']) as batch:
+            for trip in closed_trips:
+                # trip_id is deterministic, so Kinesis retries overwrite the same row
+                batch.put_item(Item=json.loads(json.dumps(trip), parse_float=Decimal))
+        logger.info(f"Stored {len(closed_trips)} completed trips")
+    
+    for vehicle_id in vehicle_ids:
+        checkpoint_open_trip(vehicle_id, loaded[vehicle_id])
+
+def load_open_trips(vehicle_ids):
+    """
+    Replace the segmenter state of the batch's vehicles with the stored
+    checkpoints (one BatchGetItem per 100 vehicles). Returns
+    {vehicle_id: last_ts of the stored trip, or None}.
+    """
+    loaded = {vehicle_id: None for vehicle_id in vehicle_ids}
+    for vehicle_id in vehicle_ids:
+        trip_segmenter.open_trips.pop(vehicle_id, None)
+    
+    for start in range(0, len(vehicle_ids), BATCH_GET_MAX_KEYS):
+        request = {
+            trip_state_table.name: {
+                'Keys': [{'vehicle_id': vehicle_id} for vehicle_id in vehicle_ids[start:start + BATCH_GET_MAX_KEYS]],
+                'ConsistentRead': True
+            }
+        }
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            for item in response.get('Responses', {}).get(trip_state_table.name, []):
+                trip = json.loads(json.dumps(item['trip'], default=float))
+                for key in ('start_ts', 'last_ts', 'last_moving_ts', 'point_count'):
+                    trip[key] = int(trip[key])
+                trip_segmenter.restore(trip)
+                loaded[item['vehicle_id']] = trip['last_ts']
+            request = response.get('UnprocessedKeys')
+    
+    return loaded
+
+def checkpoint_open_trip(vehicle_id, loaded_last_ts):
+    """
+    Store the open trip (or clear it once closed) if the batch changed it.
+    The write is conditioned on the checkpoint this batch started from.
+    """
+    trip = trip_segmenter.open_trips.get(vehicle_id)
+    if trip is None and loaded_last_ts is None:
+        return
+    if trip is not None and trip['last_ts'] == loaded_last_ts:
+        return
+    
+    if loaded_last_ts is None:
+        condition = {'ConditionExpression': 'attribute_not_exists(vehicle_id)'}
+    else:
+        condition = {
+            'ConditionExpression': '#trip.last_ts = :loaded_last_ts',
+            'ExpressionAttributeNames': {'#trip': 'trip'},
+            'ExpressionAttributeValues': {':loaded_last_ts': loaded_last_ts}
+        }
+    
+    try:
+        if trip is None:
+            trip_state_table.delete_item(Key={'vehicle_id': vehicle_id}, **condition)
+        else:
+            trip_state_table.put_item(Item={
+                'vehicle_id': vehicle_id,
+                'trip': json.loads(json.dumps(trip), parse_float=Decimal),
+                'updated_at': datetime.utcnow().isoformat()
+            }, **condition)
+    except trip_state_table.meta.client.exceptions.ConditionalCheckFailedException:
+        # Another invocation moved the trip on; its checkpoint wins
+        trip_segmenter.open_trips.pop(vehicle_id, None)
+        logger.warning(f"Trip checkpoint for vehicle {vehicle_id} changed concurrently; keeping the stored one")
@@ -0,0 +1,100 @@
+"""
+Post-processing of Rekognition DetectText results.
+
+License plate grammars are grouped by region and compiled once into a
+single anchored pattern; traffic-sign detection is a word lookup in a
+precomputed keyword set. Bundled with rekognition_processor.
+"""
+
+import os
+import re
+
+# Plate grammars per region (matched against the upper-cased OCR line)
+PLATE_GRAMMARS = {
+    'generic': [
+        r'[A-Z]{3}-\d{3}',   # ABC-123
+        r'\d{3}-[A-Z]{3}',   # 123-ABC
+        r'[A-Z]{2}\d{4}',    # AB1234
+        r'\d{3}[A-Z]{3}'     # 123ABC
+    ],
+    'PE': [
+        r'[A-Z][A-Z0-9]{2}-\d{3}'      # ABC-123, A1B-234
+    ],
+    'MX': [
+        r'[A-Z]{3}-\d{2}-\d{2}',       # ABC-12-34
+        r'[A-Z]{3}-\d{3}-[A-Z]'        # ABC-123-D
+    ]
+}
+
+DEFAULT_PLATE_REGIONS = os.environ.get('PLATE_REGIONS', 'generic')
+
+TRAFFIC_SIGN_KEYWORDS = frozenset(['STOP', 'SPEED', 'LIMIT', 'YIELD', 'NO'])
+
+_WORD_PATTERN = re.compile(r'[A-Z]+')
+
+def compile_plate_pattern(regions):
+    """
+    One anchored alternation over the grammars of the given regions
+    """
+    grammars = []
+    for region in regions:
+        if region not in PLATE_GRAMMARS:
+            raise ValueError(f"Unknown plate region: {region}")
+        grammars.extend(grammar for grammar in PLATE_GRAMMARS[region] if grammar not in grammars)
+    return re.compile('(?:' + '|'.join(grammars) + ')')
+
+def parse_regions(value):
+    return [region.strip() for region in value.split(',') if region.strip()]
+
+# Compiled once per container
+PLATE_PATTERN = compile_plate_pattern(parse_regions(DEFAULT_PLATE_REGIONS))
+
+def is_license_plate_pattern(text, pattern=PLATE_PATTERN):
+    """
+    True if the whole line matches one of the configured plate grammars
+    """
+    return pattern.fullmatch(text.upper()) is not None
+
+def is_traffic_sign_text(text):
+    """
+    True if any word of the line is a traffic-sign keyword
+    """
+    return not TRAFFIC_SIGN_KEYWORDS.isdisjoint(_WORD_PATTERN.findall(text.upper()))
+
+def classify_text_detections(text_detections, pattern=PLATE_PATTERN):
+    """
+    Split LINE detections into license plates, traffic signs and other text
+    """
+    text_analysis = {
+        'license_plates': [],
+        'traffic_signs': [],
+        'other_text': []
+    }
+
+    for text_detection in text_detections:
+        if text_detection['Type'] != 'LINE':
+            continue
+
+        detected_text = text_detection['DetectedText']
+        confidence = text_detection['Confidence']
+
+        if is_license_plate_pattern(detected_text, pattern):
+            text_analysis['license_plates'].append({
+                'text': detected_text,
+                'confidence': confidence,
+                'bounding_box': text_detection['Geometry']['BoundingBox']
+            })
+
+        elif is_traffic_sign_text(detected_text):
+            text_analysis['traffic_signs'].append({
+                'text': detected_text,
+                'confidence': confidence
+            })
+
+        else:
+            text_analysis['other_text'].append({
+                'text': detected_text,
+                'confidence': confidence
+            })
+
+    return text_analysis
@@ -0,0 +1,153 @@
+"""
+Streaming trip segmentation for the telemetry pipeline.
+
+Keeps one open trip per vehicle and closes it on ignition off, a reporting
+gap or a prolonged stop. Closed trips become one summary row in the trips
+table. Bundled with telemetry_processor.
+"""
+
+import geo_index
+
+# Speed (km/h) above which the vehicle is considered moving
+MOVING_SPEED_KMH = 5.0
+
+# Close the trip when no telemetry arrives for this long
+MAX_GAP_SECONDS = 600
+
+# Close the trip when the vehicle stays stopped for this long
+STOP_IDLE_SECONDS = 300
+
+# Trips shorter than this are discarded as noise
+MIN_TRIP_SECONDS = 60
+
+# Ignore GPS jumps that imply an impossible speed
+MAX_PLAUSIBLE_SPEED_KMH = 250.0
+
+class TripSegmenter:
+    """
+    Per-vehicle trip state machine; feed points in timestamp order
+    """
+
+    def __init__(self, moving_speed_kmh=MOVING_SPEED_KMH, max_gap_seconds=MAX_GAP_SECONDS,
+                 stop_idle_seconds=STOP_IDLE_SECONDS):
+        self.moving_speed_kmh = moving_speed_kmh
+        self.max_gap_ms = max_gap_seconds * 1000
+        self.stop_idle_ms = stop_idle_seconds * 1000
+        self.open_trips = {}
+
+    def restore(self, trip):
+        """
+        Reload an open trip checkpointed by a previous container
+        """
+        self.open_trips[trip['vehicle_id']] = trip
+
+    def process(self, vehicle_id, ts, lat, lng, speed, ignition=None, driver_id=None):
+        """
+        Feed one point (ts in epoch ms). Returns the list of trips closed by it.
+        """
+        closed = []
+        trip = self.open_trips.get(vehicle_id)
+
+        if trip and ts <= trip['last_ts']:
+            # Duplicate or out-of-order point
+            return closed
+
+        if trip and ts - trip['last_ts'] > self.max_gap_ms:
+            self._close(vehicle_id, 'REPORTING_GAP', closed)
+            trip = None
+
+        moving = speed >= self.moving_speed_kmh and ignition is not False
+
+        if trip is None:
+            if moving:
+                self.open_trips[vehicle_id] = self._open(vehicle_id, ts, lat, lng, speed, driver_id)
+            return closed
+
+        self._extend(trip, ts, lat, lng, speed, moving)
+
+        if ignition is False:
+            self._close(vehicle_id, 'IGNITION_OFF', closed)
+        elif not moving and ts - trip['last_moving_ts'] >= self.stop_idle_ms:
+            self._close(vehicle_id, 'STOPPED', closed)
+
+        return closed
+
+    def _open(self, vehicle_id, ts, lat, lng, speed, driver_id):
+        return {
+            'vehicle_id': vehicle_id,
+            'driver_id': driver_id,
+            'start_ts': ts,
+            'start_lat': lat,
+            'start_lng': lng,
+            'last_ts': ts,
+            'last_lat': lat,
+            'last_lng': lng,
+            'last_moving_ts': ts,
+            'moving_lat': lat,
+            'moving_lng': lng,
+            'distance_m': 0.0,
+            'moving_distance_m': 0.0,
+            'max_speed': speed,
+            'point_count': 1
+        }
+
+    def _extend(self, trip, ts, lat, lng, speed, moving):
+        if lat is not None and lng is not None and trip['last_lat'] is not None and trip['last_lng'] is not None:
+            step_m = geo_index.haversine_m(trip['last_lat'], trip['last_lng'], lat, lng)
+            elapsed_h = (ts - trip['last_ts']) / 3600000.0
+            if elapsed_h > 0 and step_m / 1000.0 / elapsed_h <= MAX_PLAUSIBLE_SPEED_KMH:
+                trip['distance_m'] += step_m
+        if lat is not None and lng is not None:
+            trip['last_lat'] = lat
+            trip['last_lng'] = lng
+
+        trip['last_ts'] = ts
+        trip['max_speed'] = max(trip['max_speed'], speed)
+        trip['point_count'] += 1
+
+        if moving:
+            trip['last_moving_ts'] = ts
+            trip['moving_lat'] = trip['last_lat']
+            trip['moving_lng'] = trip['last_lng']
+            trip['moving_distance_m'] = trip['distance_m']
+
+    def _close(self, vehicle_id, reason, closed):
+        trip = self.open_trips.pop(vehicle_id)
+
+        # A trip that ends by standing still ends where it last moved
+        if reason == 'STOPPED':
+            end_ts, end_lat, end_lng = trip['last_moving_ts'], trip['moving_lat'], trip['moving_lng']
+            distance_m = trip['moving_distance_m']
+        else:
+            end_ts, end_lat, end_lng = trip['last_ts'], trip['last_lat'], trip['last_lng']
+            distance_m = trip['distance_m']
+
+        if end_ts - trip['start_ts'] >= MIN_TRIP_SECONDS * 1000:
+            closed.append(build_trip_summary(trip, end_ts, end_lat, end_lng, distance_m, reason))
+
+def build_trip_summary(trip, end_ts, end_lat, end_lng, distance_m, reason):
+    """
+    Row for the trips table (start_time/end_time in epoch seconds)
+    """
+    start_time = trip['start_ts'] // 1000
+    duration_s = max(0, (end_ts - trip['start_ts']) // 1000)
+
+    summary = {
+        'trip_id': f"{trip['vehicle_id']}#{trip['start_ts']}",
+        'vehicle_id': trip['vehicle_id'],
+        'start_time': start_time,
+        'end_time': end_ts // 1000,
+        'duration_seconds': duration_s,
+        'distance_km': round(distance_m / 1000.0, 3),
+        'max_speed': trip['max_speed'],
+        'avg_speed': round(distance_m / 1000.0 / (duration_s / 3600.0), 1) if duration_s else 0,
+        'point_count': trip['point_count'],
+        'start_location': {'lat': trip['start_lat'], 'lng': trip['start_lng']},
+        'end_location': {'lat': end_lat, 'lng': end_lng},
+        'end_reason': reason,
+        'status': 'COMPLETED'
+    }
+    # driver_id is a GSI key: omit it instead of writing an empty value
+    if trip.get('driver_id'):
+        summary['driver_id'] = trip['driver_id']
+    return summary
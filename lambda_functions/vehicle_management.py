@@ -3,7 +3,13 @@ import boto3
 import os
 from datetime import datetime
 import logging
+import threading
+import time
+from collections import OrderedDict
 from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+
+import geo_index
 
 # Configurar logging
 logger = logging.getLogger()
@@ -13,6 +19,53 @@ logger.setLevel(logging.INFO)
 dynamodb = boto3.resource('dynamodb')
 kinesis = boto3.client('kinesis')
 
+# Límites para consultas de estado en lote
+MAX_STATUS_BATCH = 500          # Máximo de vehículos por solicitud
+BATCH_GET_CHUNK = 100           # Límite de BatchGetItem en DynamoDB
+STATUS_QUERY_WORKERS = 16       # Consultas concurrentes a la tabla de estado
+DEFAULT_NEARBY_RADIUS_M = 5000  # Radio por defecto para /vehicles/nearby
+# A precisión 5, 30 km se cubren con <= 364 celdas hasta 60° de latitud
+# (geo_index.MAX_COVERING_CELLS = 400); 50 km requería hasta ~880
+MAX_NEARBY_RADIUS_M = 30000
+
+# Cache en memoria del contenedor para el último estado de cada vehículo
+LATEST_CACHE_MAX_ENTRIES = int(os.environ.get('LATEST_CACHE_MAX_ENTRIES', 5000))
+LATEST_CACHE_TTL_SECONDS = float(os.environ.get('LATEST_CACHE_TTL_SECONDS', 5))
+
+class LatestStateCache:
+    """
+    LRU con expiración para el último estado conocido de cada vehículo.
+    Absorbe las ráfagas de refresco del mapa dentro de un contenedor caliente.
+    """
+    
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, vehicle_id):
+        """Devuelve (encontrado, estado); estado puede ser None si el vehículo no reporta"""
+        with self._lock:
+            entry = self._entries.get(vehicle_id)
+            if entry is None:
+                return False, None
+            expires_at, state = entry
+            if expires_at < time.monotonic():
+                del self._entries[vehicle_id]
+                return False, None
+            self._entries.move_to_end(vehicle_id)
+            return True, state
+    
+    def put(self, vehicle_id, state):
+        with self._lock:
+            self._entries[vehicle_id] = (time.monotonic() + self.ttl_seconds, state)
+            self._entries.move_to_end(vehicle_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+latest_state_cache = LatestStateCache(LATEST_CACHE_MAX_ENTRIES, LATEST_CACHE_TTL_SECONDS)
+
 def handler(event, context):
     """
     API para gestión de vehículos
@@ -33,6 +86,10 @@ def handler(event, context):
         # Enrutar según el método y path
         if http_method == 'GET' and path == '/vehicles':
             return list_vehicles(user_info, query_parameters)
+        elif http_method == 'GET' and path == '/vehicles/status':
+            return get_vehicles_status_batch(user_info, query_parameters)
+        elif http_method == 'GET' and path == '/vehicles/nearby':
+            return get_nearby_vehicles(user_info, query_parameters)
         elif http_method == 'GET' and path.startswith('/vehicles/') and len(path.split('/')) == 3:
             vehicle_id = path_parameters.get('vehicleId')
             return get_vehicle_by_id(user_info, vehicle_id)
@@ -289,18 +346,9 @@ def delete_vehicle(user_info, vehicle_id):
 def get_vehicle_real_time_status(vehicle_id):
     """Obtener estado en tiempo real del vehículo"""
     try:
-        # Consultar tabla de estado en tiempo real
-        status_table = dynamodb.Table(f"{os.environ['DYNAMODB_TABLE'].replace('vehicles', 'vehicle-status')}")
+        latest_status = get_latest_state(vehicle_id)
         
-        response = status_table.query(
-            KeyConditionExpression='vehicle_id = :vehicle_id',
-            ExpressionAttributeValues={':vehicle_id': vehicle_id},
-            ScanIndexForward=False,  # Orden descendente por timestamp
-            Limit=1
-        )
-        
-        if response['Items']:
-            latest_status = convert_decimals(response['Items'][0])
+        if latest_status:
             return {
                 'is_online': True,
                 'last_seen': latest_status.get('timestamp'),
@@ -329,6 +377,274 @@ def get_vehicle_real_time_status(vehicle_id):
             'error': 'No se pudo obtener estado'
         }
 
+def get_vehicles_status_batch(user_info, query_params):
+    """
+    Obtener la última posición de muchos vehículos en una sola llamada.
+    Con ?ids=VH1,VH2,... consulta esos vehículos; sin ids devuelve toda la
+    flota del usuario. La respuesta es columnar (arreglos paralelos) para
+    reducir el tamaño del JSON que procesa el mapa web.
+    """
+    try:
+        ids_param = query_params.get('ids')
+        
+        if ids_param:
+            requested_ids = list(dict.fromkeys(
+                vehicle_id.strip() for vehicle_id in ids_param.split(',') if vehicle_id.strip()
+            ))
+            if len(requested_ids) > MAX_STATUS_BATCH:
+                return create_response(400, {
+                    'error': f'Máximo {MAX_STATUS_BATCH} vehículos por solicitud'
+                })
+            vehicle_ids = filter_owned_vehicle_ids(user_info, requested_ids)
+        else:
+            vehicle_ids = list_owner_vehicle_ids(user_info)[:MAX_STATUS_BATCH]
+        
+        latest_by_vehicle = get_latest_status_batch(vehicle_ids)
+        
+        # Construir payload columnar
+        columns = {'ids': [], 'lat': [], 'lng': [], 'speed': [], 'ts': []}
+        for vehicle_id in vehicle_ids:
+            latest_status = latest_by_vehicle.get(vehicle_id)
+            location = (latest_status or {}).get('location') or {}
+            columns['ids'].append(vehicle_id)
+            columns['lat'].append(location.get('lat'))
+            columns['lng'].append(location.get('lng'))
+            columns['speed'].append(latest_status.get('speed', 0) if latest_status else None)
+            columns['ts'].append(latest_status.get('timestamp') if latest_status else None)
+        
+        columns['count'] = len(vehicle_ids)
+        
+        return create_response(200, columns)
+        
+    except Exception as e:
+        logger.error(f"Error obteniendo estado en lote: {str(e)}")
+        return create_response(500, {'error': 'Error obteniendo estado de vehículos'})
+
+def list_owner_vehicle_ids(user_info):
+    """Listar IDs de vehículos del usuario usando OwnerIndex"""
+    table = dynamodb.Table(os.environ['DYNAMODB_TABLE'])
+    
+    query_kwargs = {
+        'IndexName': 'OwnerIndex',
+        'KeyConditionExpression': 'owner_id = :owner_id',
+        'ExpressionAttributeValues': {':owner_id': user_info['user_id']},
+        'ProjectionExpression': 'vehicle_id, #status',
+        'ExpressionAttributeNames': {'#status': 'status'}
+    }
+    
+    vehicle_ids = []
+    while True:
+        response = table.query(**query_kwargs)
+        vehicle_ids.extend(
+            item['vehicle_id'] for item in response.get('Items', [])
+            if item.get('status') != 'deleted'
+        )
+        if 'LastEvaluatedKey' not in response or len(vehicle_ids) >= MAX_STATUS_BATCH:
+            break
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    
+    return vehicle_ids
+
+def filter_owned_vehicle_ids(user_info, vehicle_ids):
+    """Conservar solo los vehículos que pertenecen al usuario (BatchGetItem)"""
+    table_name = os.environ['DYNAMODB_TABLE']
+    owned = set()
+    
+    for start in range(0, len(vehicle_ids), BATCH_GET_CHUNK):
+        request_items = {
+            table_name: {
+                'Keys': [{'vehicle_id': vehicle_id} for vehicle_id in vehicle_ids[start:start + BATCH_GET_CHUNK]],
+                'ProjectionExpression': 'vehicle_id, owner_id'
+            }
+        }
+        
+        # Reintentar claves no procesadas por throttling
+        while request_items:
+            response = dynamodb.batch_get_item(RequestItems=request_items)
+            for item in response.get('Responses', {}).get(table_name, []):
+                if item.get('owner_id') == user_info['user_id']:
+                    owned.add(item['vehicle_id'])
+            request_items = response.get('UnprocessedKeys') or {}
+    
+    # Mantener el orden solicitado por el cliente
+    return [vehicle_id for vehicle_id in vehicle_ids if vehicle_id in owned]
+
+def get_nearby_vehicles(user_info, query_params):
+    """
+    Vehículos dentro de un radio (?lat=&lng=&radius=metros) o de un bounding
+    box (?bbox=minLat,minLng,maxLat,maxLng). Solo se leen las celdas geohash
+    que cubren el área en la tabla vehicle-geo-index.
+    """
+    try:
+        try:
+            if query_params.get('bbox'):
+                min_lat, min_lng, max_lat, max_lng = [float(v) for v in query_params['bbox'].split(',')]
+                center = None
+                cells = geo_index.cells_for_bbox(min_lat, min_lng, max_lat, max_lng)
+            else:
+                center = (float(query_params['lat']), float(query_params['lng']))
+                radius_m = min(float(query_params.get('radius', DEFAULT_NEARBY_RADIUS_M)), MAX_NEARBY_RADIUS_M)
+                cells = geo_index.cells_for_radius(center[0], center[1], radius_m)
+        except (KeyError, ValueError) as e:
+            return create_response(400, {'error': f'Parámetros de ubicación inválidos: {str(e)}'})
+        
+        candidates = query_geo_cells(cells)
+        
+        # Filtrado exacto sobre los candidatos de las celdas
+        matches = []
+        for entry in candidates:
+            lat, lng = entry['lat'], entry['lng']
+            if center:
+                distance_m = geo_index.haversine_m(center[0], center[1], lat, lng)
+                if distance_m <= radius_m:
+                    matches.append((distance_m, entry))
+            elif geo_index.in_bbox(lat, lng, min_lat, min_lng, max_lat, max_lng):
+                matches.append((None, entry))
+        
+        if center:
+            matches.sort(key=lambda match: match[0])
+        
+        owned = set(filter_owned_vehicle_ids(user_info, [entry['vehicle_id'] for _, entry in matches]))
+        matches = [match for match in matches if match[1]['vehicle_id'] in owned]
+        
+        columns = {
+            'ids': [entry['vehicle_id'] for _, entry in matches],
+            'lat': [entry['lat'] for _, entry in matches],
+            'lng': [entry['lng'] for _, entry in matches],
+            'speed': [entry.get('speed', 0) for _, entry in matches],
+            'ts': [entry.get('timestamp') for _, entry in matches],
+            'count': len(matches),
+            'cells_scanned': len(cells)
+        }
+        if center:
+            columns['distance_m'] = [round(distance_m, 1) for distance_m, _ in matches]
+        
+        return create_response(200, columns)
+        
+    except Exception as e:
+        logger.error(f"Error en búsqueda geoespacial: {str(e)}")
+        return create_response(500, {'error': 'Error buscando vehículos cercanos'})
+
+def query_geo_cells(cells):
+    """Leer en paralelo las entradas de cada celda del índice geoespacial"""
+    if not cells:
+        return []
+    
+    geo_table_name = os.environ.get(
+        'GEO_INDEX_TABLE',
+        os.environ['DYNAMODB_TABLE'].replace('vehicles', 'vehicle-geo-index')
+    )
+    client = dynamodb.meta.client
+    
+    def fetch_cell(cell):
+        query_kwargs = {
+            'TableName': geo_table_name,
+            'KeyConditionExpression': 'cell = :cell',
+            'ExpressionAttributeValues': {':cell': cell}
+        }
+        items = []
+        while True:
+            response = client.query(**query_kwargs)
+            items.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                return convert_decimals(items)
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    
+    workers = min(STATUS_QUERY_WORKERS, len(cells))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return [entry for cell_items in executor.map(fetch_cell, cells) for entry in cell_items]
+
+def get_latest_state(vehicle_id):
+    """
+    Último estado conocido de un vehículo: cache del contenedor, luego un
+    GetItem sobre la tabla vehicle-latest que mantiene el procesador de
+    telemetría, y como respaldo la consulta sobre vehicle-status.
+    """
+    found, state = latest_state_cache.get(vehicle_id)
+    if found:
+        return state
+    
+    latest_table = dynamodb.Table(get_latest_state_table_name())
+    response = latest_table.get_item(Key={'vehicle_id': vehicle_id})
+    
+    if 'Item' in response:
+        state = convert_decimals(response['Item'])
+    else:
+        state = query_latest_status(vehicle_id)
+    
+    latest_state_cache.put(vehicle_id, state)
+    return state
+
+def get_latest_status_batch(vehicle_ids):
+    """Obtener el último estado de varios vehículos con BatchGetItem y cache"""
+    results = {}
+    misses = []
+    
+    for vehicle_id in vehicle_ids:
+        found, state = latest_state_cache.get(vehicle_id)
+        if found:
+            results[vehicle_id] = state
+        else:
+            misses.append(vehicle_id)
+    
+    if not misses:
+        return results
+    
+    latest_table_name = get_latest_state_table_name()
+    fetched = {}
+    
+    for start in range(0, len(misses), BATCH_GET_CHUNK):
+        request_items = {
+            latest_table_name: {
+                'Keys': [{'vehicle_id': vehicle_id} for vehicle_id in misses[start:start + BATCH_GET_CHUNK]]
+            }
+        }
+        
+        # Reintentar claves no procesadas por throttling
+        while request_items:
+            response = dynamodb.batch_get_item(RequestItems=request_items)
+            for item in response.get('Responses', {}).get(latest_table_name, []):
+                fetched[item['vehicle_id']] = convert_decimals(item)
+            request_items = response.get('UnprocessedKeys') or {}
+    
+    # Vehículos sin registro en vehicle-latest: consultar vehicle-status en paralelo
+    not_found = [vehicle_id for vehicle_id in misses if vehicle_id not in fetched]
+    if not_found:
+        workers = min(STATUS_QUERY_WORKERS, len(not_found))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            fetched.update(zip(not_found, executor.map(query_latest_status, not_found)))
+    
+    for vehicle_id in misses:
+        state = fetched.get(vehicle_id)
+        latest_state_cache.put(vehicle_id, state)
+        results[vehicle_id] = state
+    
+    return results
+
+def query_latest_status(vehicle_id):
+    """Consultar el último registro de vehicle-status (respaldo para vehicle-latest)"""
+    try:
+        # El cliente de bajo nivel es thread-safe; los objetos Table no
+        response = dynamodb.meta.client.query(
+            TableName=os.environ['DYNAMODB_TABLE'].replace('vehicles', 'vehicle-status'),
+            KeyConditionExpression='vehicle_id = :vehicle_id',
+            ExpressionAttributeValues={':vehicle_id': vehicle_id},
+            ScanIndexForward=False,  # Orden descendente por timestamp
+            Limit=1
+        )
+        items = response.get('Items', [])
+        return convert_decimals(items[0]) if items else None
+    except Exception as e:
+        logger.error(f"Error obteniendo estado de {vehicle_id}: {str(e)}")
+        return None
+
+def get_latest_state_table_name():
+    """Nombre de la tabla de último estado por vehículo"""
+    return os.environ.get(
+        'LATEST_STATE_TABLE',
+        os.environ['DYNAMODB_TABLE'].replace('vehicles', 'vehicle-latest')
+    )
+
 def get_recent_telemetry(vehicle_id, limit=10):
     """Obtener telemetría reciente del vehículo"""
     try:
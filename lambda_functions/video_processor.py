@@ -5,51 +5,71 @@ from datetime import datetime
 import logging
 import base64
 
+from botocore.config import Config
+
+from label_analysis import identify_emergency_indicators
+from video_storage import build_video_key, build_video_metadata, storage_class_for
+from multipart_upload import upload_bytes
+from keyframe_extractor import extract_and_store_keyframes
+from lane_sla import LaneSlaTracker, lane_for, now_millis
+
 # Configurar logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Clientes AWS
-s3 = boto3.client('s3')
+# Subida multipart: umbral, tamaño de parte y partes concurrentes por tipo de video
+MULTIPART_THRESHOLD = int(os.environ.get('MULTIPART_THRESHOLD', 8 * 1024 * 1024))
+MULTIPART_PART_SIZE = int(os.environ.get('MULTIPART_PART_SIZE', 8 * 1024 * 1024))
+UPLOAD_CONCURRENCY = {
+    # Emergencia: partes mínimas y máxima concurrencia para terminar rápido
+    'PANIC': int(os.environ.get('EMERGENCY_UPLOAD_CONCURRENCY', 16)),
+    'EVENT': int(os.environ.get('EVENT_UPLOAD_CONCURRENCY', 8)),
+    'CONTINUOUS': int(os.environ.get('CONTINUOUS_UPLOAD_CONCURRENCY', 4))
+}
+
+# Extracción de keyframes hacia analysis-required/ (CONTINUOUS va a GLACIER: no se puede leer al subir)
+KEYFRAME_VIDEO_TYPES = [t.strip() for t in os.environ.get('KEYFRAME_VIDEO_TYPES', 'PANIC,EVENT').split(',') if t.strip()]
+KEYFRAME_SETTINGS = {
+    # Pánico: más frames y más seguidos, por cambio de escena
+    'PANIC': {
+        'mode': os.environ.get('PANIC_KEYFRAME_MODE', 'scene'),
+        'max_frames': int(os.environ.get('PANIC_KEYFRAME_MAX_FRAMES', 20)),
+        'min_interval': float(os.environ.get('PANIC_KEYFRAME_MIN_INTERVAL_SECONDS', 1))
+    },
+    'EVENT': {
+        'mode': os.environ.get('KEYFRAME_MODE', 'keyframes'),
+        'max_frames': int(os.environ.get('KEYFRAME_MAX_FRAMES', 10)),
+        'min_interval': float(os.environ.get('KEYFRAME_MIN_INTERVAL_SECONDS', 2))
+    }
+}
+
+# Clientes AWS (el pool de conexiones cubre la concurrencia máxima de partes)
+s3 = boto3.client('s3', config=Config(max_pool_connections=max(UPLOAD_CONCURRENCY.values())))
 rekognition = boto3.client('rekognition')
+cloudwatch = boto3.client('cloudwatch')
+
+# Latencias por carril de la invocación en curso
+sla_tracker = LaneSlaTracker()
 
 def handler(event, context):
     """
-    Procesa datos de video de vehículos y realiza análisis con Rekognition
+    Procesa datos de video de vehículos y realiza análisis con Rekognition.
+    Recibe lotes SQS de su carril de prioridad o eventos directos.
     """
+    if event.get('Records') and event['Records'][0].get('eventSource') == 'aws:sqs':
+        return process_lane_batch(event['Records'])
+    
     try:
-        logger.info(f"Procesando datos de video: {json.dumps(event)}")
-        
-        # Extraer datos del evento IoT
-        vehicle_id = event.get('vehicle_id')
-        video_data = event.get('video_data', {})
-        timestamp = event.get('timestamp', datetime.utcnow().isoformat())
-        video_type = event.get('video_type', 'CONTINUOUS')  # CONTINUOUS, EVENT, PANIC
-        
-        if not vehicle_id:
-            raise ValueError("vehicle_id es requerido")
-        
-        bucket_name = os.environ['S3_BUCKET']
-        
-        # Procesar según el tipo de video
-        if video_type == 'PANIC':
-            # Video de emergencia - procesamiento prioritario
-            result = process_emergency_video(vehicle_id, video_data, timestamp, bucket_name)
-        elif video_type == 'EVENT':
-            # Video de evento específico (frenado brusco, accidente, etc.)
-            result = process_event_video(vehicle_id, video_data, timestamp, bucket_name)
-        else:
-            # Video continuo - procesamiento estándar
-            result = process_continuous_video(vehicle_id, video_data, timestamp, bucket_name)
+        result = process_video_event(event)
         
         return {
             'statusCode': 200,
             'body': json.dumps({
                 'message': 'Video procesado exitosamente',
-                'vehicle_id': vehicle_id,
-                'video_type': video_type,
+                'vehicle_id': event.get('vehicle_id'),
+                'video_type': event.get('video_type', 'CONTINUOUS'),
                 'result': result,
-                'timestamp': timestamp
+                'timestamp': event.get('timestamp')
             })
         }
         
@@ -63,32 +83,76 @@ def handler(event, context):
             })
         }
 
+def process_lane_batch(records):
+    """
+    Procesar mensajes de la cola del carril; solo se reintentan los que fallan
+    """
+    failures = []
+    
+    for record in records:
+        started_at = now_millis()
+        try:
+            event = json.loads(record['body'])
+            process_video_event(event)
+            
+            # aws_timestamp: llegada a IoT Core; received_at: subida completada
+            sla_tracker.record(
+                lane_for(event.get('video_type', 'CONTINUOUS')),
+                queued_at_ms=int(record['attributes']['SentTimestamp']),
+                started_at_ms=started_at,
+                finished_at_ms=now_millis(),
+                received_at_ms=event.get('received_at') or event.get('aws_timestamp')
+            )
+        except Exception as e:
+            logger.error(f"Error procesando mensaje {record.get('messageId')}: {str(e)}")
+            failures.append({'itemIdentifier': record['messageId']})
+    
+    sla_tracker.flush(cloudwatch)
+    
+    return {'batchItemFailures': failures}
+
+def process_video_event(event):
+    """
+    Procesar un video según su tipo; lanza excepción si falla
+    """
+    # No registrar el base64 completo de los videos legados
+    logger.info(f"Procesando datos de video: vehicle_id={event.get('vehicle_id')}, "
+                f"video_type={event.get('video_type')}, "
+                f"s3_upload={event.get('video_data', {}).get('s3_upload')}")
+    
+    # Extraer datos del evento IoT
+    vehicle_id = event.get('vehicle_id')
+    video_data = event.get('video_data', {})
+    timestamp = event.get('timestamp', datetime.utcnow().isoformat())
+    video_type = event.get('video_type', 'CONTINUOUS')  # CONTINUOUS, EVENT, PANIC
+    
+    if not vehicle_id:
+        raise ValueError("vehicle_id es requerido")
+    
+    bucket_name = os.environ['S3_BUCKET']
+    
+    # Procesar según el tipo de video
+    if video_type == 'PANIC':
+        # Video de emergencia - procesamiento prioritario
+        return process_emergency_video(vehicle_id, video_data, timestamp, bucket_name)
+    elif video_type == 'EVENT':
+        # Video de evento específico (frenado brusco, accidente, etc.)
+        return process_event_video(vehicle_id, video_data, timestamp, bucket_name)
+    else:
+        # Video continuo - procesamiento estándar
+        return process_continuous_video(vehicle_id, video_data, timestamp, bucket_name)
+
 def process_emergency_video(vehicle_id, video_data, timestamp, bucket_name):
     """
     Procesa video de emergencia con análisis inmediato
     """
     try:
         # Generar clave S3 para video de emergencia
-        s3_key = f"emergency/{vehicle_id}/{timestamp}/video.mp4"
+        s3_key = resolve_video_key(vehicle_id, 'PANIC', timestamp, video_data)
         
-        # Si hay datos de video en base64, decodificar y subir
+        # Si hay datos de video en base64 (dispositivos legados), decodificar y subir
         if video_data.get('base64_data'):
-            video_bytes = base64.b64decode(video_data['base64_data'])
-            
-            # Subir a S3 con metadatos de emergencia
-            s3.put_object(
-                Bucket=bucket_name,
-                Key=s3_key,
-                Body=video_bytes,
-                ContentType='video/mp4',
-                Metadata={
-                    'vehicle_id': vehicle_id,
-                    'video_type': 'EMERGENCY',
-                    'timestamp': timestamp,
-                    'priority': 'CRITICAL'
-                },
-                StorageClass='STANDARD_IA'  # Acceso inmediato pero costo optimizado
-            )
+            upload_legacy_video(bucket_name, s3_key, video_data, vehicle_id, 'PANIC', timestamp)
             
             logger.info(f"Video de emergencia subido: s3://{bucket_name}/{s3_key}")
         
@@ -119,9 +183,13 @@ def process_emergency_video(vehicle_id, video_data, timestamp, bucket_name):
             
             logger.info(f"Análisis de emergencia completado: {analysis_result}")
         
+        # Varios frames del clip se analizan en rekognition_processor (sin límite por ser pánico)
+        keyframes = extract_keyframes_for_analysis(bucket_name, s3_key, vehicle_id, timestamp, 'PANIC', video_data)
+        
         return {
             's3_location': f"s3://{bucket_name}/{s3_key}",
             'analysis': analysis_result,
+            'keyframes': keyframes,
             'processing_type': 'EMERGENCY_PRIORITY'
         }
         
@@ -135,29 +203,18 @@ def process_event_video(vehicle_id, video_data, timestamp, bucket_name):
     """
     try:
         event_type = video_data.get('event_type', 'UNKNOWN')
-        s3_key = f"events/{vehicle_id}/{event_type}/{timestamp}/video.mp4"
+        s3_key = resolve_video_key(vehicle_id, 'EVENT', timestamp, video_data)
         
         # Subir video si está disponible
         if video_data.get('base64_data'):
-            video_bytes = base64.b64decode(video_data['base64_data'])
-            
-            s3.put_object(
-                Bucket=bucket_name,
-                Key=s3_key,
-                Body=video_bytes,
-                ContentType='video/mp4',
-                Metadata={
-                    'vehicle_id': vehicle_id,
-                    'video_type': 'EVENT',
-                    'event_type': event_type,
-                    'timestamp': timestamp
-                },
-                StorageClass='STANDARD_IA'
-            )
+            upload_legacy_video(bucket_name, s3_key, video_data, vehicle_id, 'EVENT', timestamp)
+        
+        keyframes = extract_keyframes_for_analysis(bucket_name, s3_key, vehicle_id, timestamp, 'EVENT', video_data)
         
         return {
             's3_location': f"s3://{bucket_name}/{s3_key}",
             'event_type': event_type,
+            'keyframes': keyframes,
             'processing_type': 'EVENT_ANALYSIS'
         }
         
@@ -170,24 +227,11 @@ def process_continuous_video(vehicle_id, video_data, timestamp, bucket_name):
     Procesa video continuo con archivado optimizado
     """
     try:
-        s3_key = f"continuous/{vehicle_id}/{timestamp[:10]}/{timestamp}/video.mp4"
+        s3_key = resolve_video_key(vehicle_id, 'CONTINUOUS', timestamp, video_data)
         
-        # Para video continuo, usar almacenamiento más económico
+        # Para video continuo, usar almacenamiento más económico (GLACIER)
         if video_data.get('base64_data'):
-            video_bytes = base64.b64decode(video_data['base64_data'])
-            
-            s3.put_object(
-                Bucket=bucket_name,
-                Key=s3_key,
-                Body=video_bytes,
-                ContentType='video/mp4',
-                Metadata={
-                    'vehicle_id': vehicle_id,
-                    'video_type': 'CONTINUOUS',
-                    'timestamp': timestamp
-                },
-                StorageClass='GLACIER'  # Archivado a largo plazo
-            )
+            upload_legacy_video(bucket_name, s3_key, video_data, vehicle_id, 'CONTINUOUS', timestamp)
         
         return {
             's3_location': f"s3://{bucket_name}/{s3_key}",
@@ -198,21 +242,54 @@ def process_continuous_video(vehicle_id, video_data, timestamp, bucket_name):
         logger.error(f"Error procesando video continuo: {str(e)}")
         raise
 
-def identify_emergency_indicators(labels):
+def resolve_video_key(vehicle_id, video_type, timestamp, video_data):
+    """
+    Clave del video: la de la subida multipart ya completada o la calculada
     """
-    Identifica indicadores de emergencia en las etiquetas detectadas
+    s3_upload = video_data.get('s3_upload')
+    if s3_upload:
+        # El dispositivo ya subió el video con URLs prefirmadas (video_upload_manager)
+        return s3_upload['key']
+    return build_video_key(vehicle_id, video_type, timestamp, video_data.get('event_type', 'UNKNOWN'))
+
+def upload_legacy_video(bucket_name, s3_key, video_data, vehicle_id, video_type, timestamp):
     """
-    emergency_keywords = [
-        'Fire', 'Smoke', 'Accident', 'Crash', 'Blood', 'Weapon',
-        'Police', 'Ambulance', 'Emergency', 'Danger', 'Violence'
-    ]
+    Camino legado: video en base64 dentro del mensaje IoT
+    """
+    video_bytes = base64.b64decode(video_data['base64_data'])
     
-    indicators = []
-    for label in labels:
-        if any(keyword.lower() in label['Name'].lower() for keyword in emergency_keywords):
-            indicators.append({
-                'indicator': label['Name'],
-                'confidence': label['Confidence']
-            })
+    # Multipart con partes concurrentes por encima del umbral (vistas del buffer, sin copias)
+    upload_bytes(
+        s3,
+        bucket_name,
+        s3_key,
+        video_bytes,
+        threshold=MULTIPART_THRESHOLD,
+        part_size=5 * 1024 * 1024 if video_type == 'PANIC' else MULTIPART_PART_SIZE,
+        concurrency=UPLOAD_CONCURRENCY[video_type],
+        ContentType='video/mp4',
+        Metadata=build_video_metadata(vehicle_id, video_type, timestamp, video_data.get('event_type', 'UNKNOWN')),
+        StorageClass=storage_class_for(video_type)
+    )
+
+def extract_keyframes_for_analysis(bucket_name, s3_key, vehicle_id, timestamp, video_type, video_data):
+    """
+    Extraer keyframes del clip hacia analysis-required/; un fallo no afecta al video
+    """
+    if video_type not in KEYFRAME_VIDEO_TYPES:
+        return []
+    if not video_data.get('base64_data') and not video_data.get('s3_upload'):
+        # No hay clip en S3 (solo metadatos)
+        return []
     
-    return indicators
+    settings = KEYFRAME_SETTINGS.get(video_type, KEYFRAME_SETTINGS['EVENT'])
+    try:
+        return extract_and_store_keyframes(
+            s3, bucket_name, s3_key, vehicle_id, timestamp, video_type,
+            mode=settings['mode'],
+            max_frames=settings['max_frames'],
+            min_interval=settings['min_interval']
+        )
+    except Exception as e:
+        logger.error(f"Error extrayendo keyframes de s3://{bucket_name}/{s3_key}: {str(e)}")
+        return []
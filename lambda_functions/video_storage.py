@@ -0,0 +1,80 @@
+"""
+Ubicación y parámetros de almacenamiento de los videos de vehículos en S3.
+
+Compartido por video_processor (subida directa) y video_upload_manager
+(subida multipart prefirmada desde el dispositivo) para que ambos caminos
+escriban exactamente las mismas claves, metadatos y clases de almacenamiento.
+"""
+
+# Configuración por tipo de video
+VIDEO_STORAGE = {
+    'PANIC': {
+        'prefix': 'emergency',
+        'video_type': 'EMERGENCY',
+        'storage_class': 'STANDARD_IA',  # Acceso inmediato pero costo optimizado
+        'priority': 'CRITICAL'
+    },
+    'EVENT': {
+        'prefix': 'events',
+        'video_type': 'EVENT',
+        'storage_class': 'STANDARD_IA'
+    },
+    'CONTINUOUS': {
+        'prefix': 'continuous',
+        'video_type': 'CONTINUOUS',
+        'storage_class': 'GLACIER'  # Archivado a largo plazo
+    }
+}
+
+VIDEO_PREFIXES = tuple(config['prefix'] for config in VIDEO_STORAGE.values())
+
+def normalize_video_type(video_type):
+    return video_type if video_type in VIDEO_STORAGE else 'CONTINUOUS'
+
+def build_video_key(vehicle_id, video_type, timestamp, event_type='UNKNOWN'):
+    """
+    Clave S3 del video según su tipo
+    """
+    video_type = normalize_video_type(video_type)
+    if video_type == 'PANIC':
+        return f"emergency/{vehicle_id}/{timestamp}/video.mp4"
+    if video_type == 'EVENT':
+        return f"events/{vehicle_id}/{event_type}/{timestamp}/video.mp4"
+    return f"continuous/{vehicle_id}/{timestamp[:10]}/{timestamp}/video.mp4"
+
+def build_video_metadata(vehicle_id, video_type, timestamp, event_type='UNKNOWN'):
+    """
+    Metadatos S3 del video (los mismos en put_object y en multipart)
+    """
+    config = VIDEO_STORAGE[normalize_video_type(video_type)]
+    metadata = {
+        'vehicle_id': vehicle_id,
+        'video_type': config['video_type'],
+        'timestamp': timestamp
+    }
+    if video_type == 'EVENT':
+        metadata['event_type'] = event_type
+    if config.get('priority'):
+        metadata['priority'] = config['priority']
+    return metadata
+
+def storage_class_for(video_type):
+    return VIDEO_STORAGE[normalize_video_type(video_type)]['storage_class']
+
+def video_type_from_key(s3_key):
+    """
+    (video_type, event_type) a partir de una clave construida por build_video_key
+    """
+    parts = s3_key.split('/')
+    for video_type, config in VIDEO_STORAGE.items():
+        if parts[0] == config['prefix']:
+            event_type = parts[2] if video_type == 'EVENT' and len(parts) > 2 else 'UNKNOWN'
+            return video_type, event_type
+    raise ValueError(f"Clave de video desconocida: {s3_key}")
+
+def key_belongs_to_vehicle(s3_key, vehicle_id):
+    """
+    Verifica que una clave enviada por el dispositivo sea de su propio vehículo
+    """
+    parts = s3_key.split('/')
+    return len(parts) >= 3 and parts[0] in VIDEO_PREFIXES and parts[1] == vehicle_id and '..' not in parts
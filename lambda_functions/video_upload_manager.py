@@ -0,0 +1,290 @@
+import json
+import boto3
+import os
+import math
+import time
+from datetime import datetime
+import logging
+
+from video_storage import (
+    build_video_key, build_video_metadata, key_belongs_to_vehicle, normalize_video_type, storage_class_for,
+    video_type_from_key
+)
+
+# Configurar logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Clientes AWS
+s3 = boto3.client('s3')
+sqs = boto3.client('sqs')
+iot_data = boto3.client('iot-data', endpoint_url=os.environ['IOT_DATA_ENDPOINT']) \
+    if os.environ.get('IOT_DATA_ENDPOINT') else boto3.client('iot-data')
+
+# Tamaño de parte: mínimo de S3 (5 MiB) salvo la última; partes chicas para enlaces celulares
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PARTS = 10000
+PART_SIZE = max(MIN_PART_SIZE, int(os.environ.get('UPLOAD_PART_SIZE', MIN_PART_SIZE)))
+
+# Vigencia de las URLs prefirmadas y cuántas se entregan por respuesta
+URL_EXPIRES_SECONDS = int(os.environ.get('UPLOAD_URL_EXPIRES_SECONDS', 3600))
+URLS_PER_RESPONSE = int(os.environ.get('UPLOAD_URLS_PER_RESPONSE', 50))
+
+RESPONSE_TOPIC = 'vehicles/{vehicle_id}/video/upload/response'
+
+# Cola SQS del carril de prioridad de cada tipo de video
+LANE_QUEUE_URLS = {
+    'PANIC': os.environ.get('VIDEO_PANIC_QUEUE_URL'),
+    'EVENT': os.environ.get('VIDEO_EVENT_QUEUE_URL'),
+    'CONTINUOUS': os.environ.get('VIDEO_CONTINUOUS_QUEUE_URL')
+}
+
+def handler(event, context):
+    """
+    Gestiona subidas multipart prefirmadas de video desde los vehículos.
+    Acciones (topic vehicles/{id}/video/upload): start, resume, complete, abort.
+    El dispositivo sube las partes directo a S3; esta función nunca toca los bytes.
+    """
+    vehicle_id = event.get('vehicle_id')
+    action = event.get('action')
+
+    try:
+        if not vehicle_id:
+            raise ValueError("vehicle_id es requerido")
+
+        bucket_name = os.environ['S3_BUCKET']
+
+        if action == 'start':
+            response = start_upload(vehicle_id, event, bucket_name)
+        elif action == 'resume':
+            response = resume_upload(vehicle_id, event, bucket_name)
+        elif action == 'complete':
+            response = complete_upload(vehicle_id, event, bucket_name)
+        elif action == 'abort':
+            response = abort_upload(vehicle_id, event, bucket_name)
+        else:
+            raise ValueError(f"Acción no soportada: {action}")
+
+    except Exception as e:
+        logger.error(f"Error en subida de video ({action}) para {vehicle_id}: {str(e)}")
+        response = {'status': 'ERROR', 'error': str(e)}
+
+    response['action'] = action
+    response['request_id'] = event.get('request_id')
+    if vehicle_id:
+        publish_response(vehicle_id, response)
+
+    return {
+        'statusCode': 500 if response['status'] == 'ERROR' else 200,
+        'body': json.dumps(response)
+    }
+
+def start_upload(vehicle_id, event, bucket_name):
+    """
+    Crear la subida multipart y entregar las primeras URLs de partes
+    """
+    video_type = normalize_video_type(event.get('video_type', 'CONTINUOUS'))
+    timestamp = event.get('timestamp', datetime.utcnow().isoformat())
+    event_type = event.get('event_type', 'UNKNOWN')
+    size_bytes = int(event['size_bytes'])
+
+    if size_bytes <= 0:
+        raise ValueError("size_bytes debe ser mayor a 0")
+
+    part_size = choose_part_size(size_bytes)
+    total_parts = math.ceil(size_bytes / part_size)
+    s3_key = build_video_key(vehicle_id, video_type, timestamp, event_type)
+
+    upload = s3.create_multipart_upload(
+        Bucket=bucket_name,
+        Key=s3_key,
+        ContentType=event.get('content_type', 'video/mp4'),
+        Metadata=build_video_metadata(vehicle_id, video_type, timestamp, event_type),
+        StorageClass=storage_class_for(video_type)
+    )
+
+    logger.info(f"Subida multipart iniciada: s3://{bucket_name}/{s3_key} "
+                f"({total_parts} partes de {part_size} bytes)")
+
+    part_numbers = range(1, total_parts + 1)
+    return {
+        'status': 'STARTED',
+        'upload_id': upload['UploadId'],
+        's3_key': s3_key,
+        'video_type': video_type,
+        'timestamp': timestamp,
+        'event_type': event_type,
+        'part_size': part_size,
+        'total_parts': total_parts,
+        'parts': presign_parts(bucket_name, s3_key, upload['UploadId'], part_numbers),
+        'expires_in': URL_EXPIRES_SECONDS
+    }
+
+def resume_upload(vehicle_id, event, bucket_name):
+    """
+    Partes que faltan (según S3) con URLs nuevas; permite retomar tras un corte
+    """
+    s3_key, upload_id, total_parts = validate_upload_reference(vehicle_id, event)
+
+    uploaded = list_uploaded_parts(bucket_name, s3_key, upload_id)
+    missing = [number for number in range(1, total_parts + 1) if number not in uploaded]
+
+    return {
+        'status': 'IN_PROGRESS' if missing else 'READY_TO_COMPLETE',
+        'upload_id': upload_id,
+        's3_key': s3_key,
+        'uploaded_parts': len(uploaded),
+        'missing_parts': len(missing),
+        'parts': presign_parts(bucket_name, s3_key, upload_id, missing),
+        'expires_in': URL_EXPIRES_SECONDS
+    }
+
+def complete_upload(vehicle_id, event, bucket_name):
+    """
+    Completar la subida con las partes registradas en S3 y notificar a video_processor
+    """
+    s3_key, upload_id, total_parts = validate_upload_reference(vehicle_id, event)
+
+    uploaded = list_uploaded_parts(bucket_name, s3_key, upload_id)
+    missing = [number for number in range(1, total_parts + 1) if number not in uploaded]
+    if missing:
+        # El dispositivo debe retomar: se responde como resume
+        response = resume_upload(vehicle_id, event, bucket_name)
+        response['status'] = 'INCOMPLETE'
+        return response
+
+    # S3 ensambla el objeto del lado del servidor (sin copiar bytes por Lambda)
+    s3.complete_multipart_upload(
+        Bucket=bucket_name,
+        Key=s3_key,
+        UploadId=upload_id,
+        MultipartUpload={'Parts': [
+            {'PartNumber': number, 'ETag': uploaded[number]['ETag']}
+            for number in range(1, total_parts + 1)
+        ]}
+    )
+    size_bytes = sum(uploaded[number]['Size'] for number in range(1, total_parts + 1))
+
+    logger.info(f"Subida multipart completada: s3://{bucket_name}/{s3_key} ({size_bytes} bytes)")
+
+    notify_video_processor(vehicle_id, event, s3_key, bucket_name, size_bytes)
+
+    return {
+        'status': 'COMPLETED',
+        'upload_id': upload_id,
+        's3_key': s3_key,
+        's3_location': f"s3://{bucket_name}/{s3_key}",
+        'size_bytes': size_bytes
+    }
+
+def abort_upload(vehicle_id, event, bucket_name):
+    """
+    Cancelar la subida y liberar las partes ya almacenadas
+    """
+    s3_key, upload_id, _ = validate_upload_reference(vehicle_id, event, require_parts=False)
+
+    s3.abort_multipart_upload(Bucket=bucket_name, Key=s3_key, UploadId=upload_id)
+
+    return {
+        'status': 'ABORTED',
+        'upload_id': upload_id,
+        's3_key': s3_key
+    }
+
+def validate_upload_reference(vehicle_id, event, require_parts=True):
+    """
+    upload_id/s3_key enviados por el dispositivo; la clave debe ser de su vehículo
+    """
+    s3_key = event.get('s3_key')
+    upload_id = event.get('upload_id')
+
+    if not s3_key or not upload_id:
+        raise ValueError("upload_id y s3_key son requeridos")
+    if not key_belongs_to_vehicle(s3_key, vehicle_id):
+        raise ValueError(f"La clave {s3_key} no pertenece al vehículo {vehicle_id}")
+
+    total_parts = int(event.get('total_parts', 0))
+    if require_parts and not 1 <= total_parts <= MAX_PARTS:
+        raise ValueError("total_parts inválido")
+
+    return s3_key, upload_id, total_parts
+
+def choose_part_size(size_bytes):
+    """
+    Tamaño de parte configurado, ampliado si el video superaría 10.000 partes
+    """
+    return max(PART_SIZE, math.ceil(size_bytes / MAX_PARTS))
+
+def presign_parts(bucket_name, s3_key, upload_id, part_numbers):
+    """
+    URLs prefirmadas de PUT para las primeras partes pendientes (firma local, sin llamadas a AWS)
+    """
+    return [
+        {
+            'part_number': number,
+            'url': s3.generate_presigned_url(
+                'upload_part',
+                Params={
+                    'Bucket': bucket_name,
+                    'Key': s3_key,
+                    'UploadId': upload_id,
+                    'PartNumber': number
+                },
+                ExpiresIn=URL_EXPIRES_SECONDS
+            )
+        }
+        for number in list(part_numbers)[:URLS_PER_RESPONSE]
+    ]
+
+def list_uploaded_parts(bucket_name, s3_key, upload_id):
+    """
+    Partes ya recibidas por S3: {part_number: {'ETag', 'Size'}}
+    """
+    uploaded = {}
+    paginator = s3.get_paginator('list_parts')
+    for page in paginator.paginate(Bucket=bucket_name, Key=s3_key, UploadId=upload_id):
+        for part in page.get('Parts', []):
+            uploaded[part['PartNumber']] = {'ETag': part['ETag'], 'Size': part['Size']}
+    return uploaded
+
+def notify_video_processor(vehicle_id, event, s3_key, bucket_name, size_bytes):
+    """
+    Notificación de finalización a la cola del carril de video_processor (solo referencia al objeto)
+    """
+    # Tipo de video según la clave, no según lo que reporte el dispositivo
+    video_type, event_type = video_type_from_key(s3_key)
+    video_data = {
+        'event_type': event_type,
+        's3_upload': {
+            'bucket': bucket_name,
+            'key': s3_key,
+            'size_bytes': size_bytes
+        }
+    }
+    # Un frame JPEG pequeño puede acompañar la notificación de pánico para el análisis inmediato
+    if event.get('frame_image'):
+        video_data['frame_image'] = event['frame_image']
+
+    sqs.send_message(
+        QueueUrl=LANE_QUEUE_URLS[video_type],
+        MessageBody=json.dumps({
+            'vehicle_id': vehicle_id,
+            'video_type': video_type,
+            'timestamp': event.get('timestamp', datetime.utcnow().isoformat()),
+            'received_at': int(time.time() * 1000),
+            'video_data': video_data
+        })
+    )
+
+def publish_response(vehicle_id, response):
+    """
+    Responder al dispositivo por su topic de subida
+    """
+    try:
+        iot_data.publish(
+            topic=RESPONSE_TOPIC.format(vehicle_id=vehicle_id),
+            qos=1,
+            payload=json.dumps(response)
+        )
+    except Exception as e:
+        logger.error(f"Error publicando respuesta de subida para {vehicle_id}: {str(e)}")
@@ -41,6 +41,20 @@ resource "aws_api_gateway_resource" "vehicles" {
   path_part   = "vehicles"
 }
 
+# /vehicles/status - Estado en lote para el mapa
+resource "aws_api_gateway_resource" "vehicles_status" {
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  parent_id   = aws_api_gateway_resource.vehicles.id
+  path_part   = "status"
+}
+
+# /vehicles/nearby - Búsqueda por radio o bounding box
+resource "aws_api_gateway_resource" "vehicles_nearby" {
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  parent_id   = aws_api_gateway_resource.vehicles.id
+  path_part   = "nearby"
+}
+
 # /vehicles/{vehicleId}
 resource "aws_api_gateway_resource" "vehicle_by_id" {
   rest_api_id = aws_api_gateway_rest_api.main.id
@@ -178,9 +192,11 @@ resource "aws_lambda_function" "vehicle_management" {
 
   environment {
     variables = {
-      DYNAMODB_TABLE = "${var.project_name}-${var.environment}-vehicles"
-      KINESIS_STREAM = "${var.project_name}-${var.environment}-telemetry"
-      ENVIRONMENT    = var.environment
+      DYNAMODB_TABLE     = "${var.project_name}-${var.environment}-vehicles"
+      LATEST_STATE_TABLE = "${var.project_name}-${var.environment}-vehicle-latest"
+      GEO_INDEX_TABLE    = "${var.project_name}-${var.environment}-vehicle-geo-index"
+      KINESIS_STREAM     = "${var.project_name}-${var.environment}-telemetry"
+      ENVIRONMENT        = var.environment
     }
   }
 
@@ -336,6 +352,55 @@ resource "aws_api_gateway_integration" "get_vehicle_by_id_integration" {
   uri                    = aws_lambda_function.vehicle_management.invoke_arn
 }
 
+# GET /vehicles/status - Última posición de varios vehículos (payload columnar)
+resource "aws_api_gateway_method" "get_vehicles_status" {
+  rest_api_id   = aws_api_gateway_rest_api.main.id
+  resource_id   = aws_api_gateway_resource.vehicles_status.id
+  http_method   = "GET"
+  authorization = "COGNITO_USER_POOLS"
+  authorizer_id = aws_api_gateway_authorizer.cognito_authorizer.id
+
+  request_parameters = {
+    "method.request.querystring.ids" = false
+  }
+}
+
+resource "aws_api_gateway_integration" "get_vehicles_status_integration" {
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  resource_id = aws_api_gateway_resource.vehicles_status.id
+  http_method = aws_api_gateway_method.get_vehicles_status.http_method
+
+  integration_http_method = "POST"
+  type                   = "AWS_PROXY"
+  uri                    = aws_lambda_function.vehicle_management.invoke_arn
+}
+
+# GET /vehicles/nearby - Vehículos dentro de un radio o viewport
+resource "aws_api_gateway_method" "get_vehicles_nearby" {
+  rest_api_id   = aws_api_gateway_rest_api.main.id
+  resource_id   = aws_api_gateway_resource.vehicles_nearby.id
+  http_method   = "GET"
+  authorization = "COGNITO_USER_POOLS"
+  authorizer_id = aws_api_gateway_authorizer.cognito_authorizer.id
+
+  request_parameters = {
+    "method.request.querystring.lat"    = false
+    "method.request.querystring.lng"    = false
+    "method.request.querystring.radius" = false
+    "method.request.querystring.bbox"   = false
+  }
+}
+
+resource "aws_api_gateway_integration" "get_vehicles_nearby_integration" {
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  resource_id = aws_api_gateway_resource.vehicles_nearby.id
+  http_method = aws_api_gateway_method.get_vehicles_nearby.http_method
+
+  integration_http_method = "POST"
+  type                   = "AWS_PROXY"
+  uri                    = aws_lambda_function.vehicle_management.invoke_arn
+}
+
 # GET /vehicles/{vehicleId}/telemetry - Obtener telemetría
 resource "aws_api_gateway_method" "get_vehicle_telemetry" {
   rest_api_id   = aws_api_gateway_rest_api.main.id
@@ -478,6 +543,8 @@ resource "aws_api_gateway_deployment" "main" {
   depends_on = [
     aws_api_gateway_integration.get_vehicles_integration,
     aws_api_gateway_integration.get_vehicle_by_id_integration,
+    aws_api_gateway_integration.get_vehicles_status_integration,
+    aws_api_gateway_integration.get_vehicles_nearby_integration,
     aws_api_gateway_integration.get_vehicle_telemetry_integration,
     aws_api_gateway_integration.get_fleet_dashboard_integration,
     aws_api_gateway_integration.get_reports_integration,
@@ -492,6 +559,8 @@ resource "aws_api_gateway_deployment" "main" {
       aws_api_gateway_resource.vehicles.id,
       aws_api_gateway_method.get_vehicles.id,
       aws_api_gateway_integration.get_vehicles_integration.id,
+      aws_api_gateway_integration.get_vehicles_status_integration.id,
+      aws_api_gateway_integration.get_vehicles_nearby_integration.id,
     ]))
   }
 
@@ -45,6 +45,8 @@ output "api_endpoints" {
     base_url = "https://${aws_api_gateway_rest_api.main.id}.execute-api.${data.aws_region.current.name}.amazonaws.com/${var.environment}"
     endpoints = {
       vehicles           = "/vehicles"
+      vehicles_status    = "/vehicles/status"
+      vehicles_nearby    = "/vehicles/nearby"
       vehicle_by_id      = "/vehicles/{vehicleId}"
       vehicle_telemetry  = "/vehicles/{vehicleId}/telemetry"
       vehicle_location   = "/vehicles/{vehicleId}/location"
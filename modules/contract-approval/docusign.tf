@@ -119,6 +119,7 @@ resource "aws_lambda_function" "docusign_signature_manager" {
       DOCUSIGN_PRIVATE_KEY     = aws_ssm_parameter.docusign_private_key.name
       DOCUSIGN_BASE_URL        = aws_ssm_parameter.docusign_base_url.name
       CALLBACK_URL_BASE        = "https://${var.project_name}-${var.environment}.com/docusign/callback"
+      BULK_ENVELOPE_CONCURRENCY = "4"
       ENVIRONMENT              = var.environment
     }
   }
@@ -141,12 +142,7 @@ resource "aws_lambda_function" "docusign_webhook_handler" {
   layers = [aws_lambda_layer_version.docusign_layer.arn]
 
   environment {
-    variables = {
-      CONTRACTS_TABLE      = aws_dynamodb_table.contracts.name
-      SIGNATURES_TABLE     = aws_dynamodb_table.electronic_signatures.name
-      SNS_TOPIC_ARN       = aws_sns_topic.contract_notifications.arn
-      ENVIRONMENT         = var.environment
-    }
+    variables = local.docusign_webhook_environment
   }
 
   tags = {
@@ -155,6 +151,96 @@ resource "aws_lambda_function" "docusign_webhook_handler" {
   }
 }
 
+locals {
+  docusign_webhook_environment = {
+    CONTRACTS_TABLE      = aws_dynamodb_table.contracts.name
+    SIGNATURES_TABLE     = aws_dynamodb_table.electronic_signatures.name
+    SNS_TOPIC_ARN        = aws_sns_topic.contract_notifications.arn
+    WEBHOOK_EVENTS_TABLE = aws_dynamodb_table.docusign_webhook_events.name
+    WEBHOOK_QUEUE_URL    = aws_sqs_queue.docusign_webhook_events.url
+    ENVIRONMENT          = var.environment
+  }
+}
+
+# Lambda que aplica los eventos encolados por el webhook (mismo paquete)
+resource "aws_lambda_function" "docusign_webhook_processor" {
+  filename         = "docusign_webhook_handler.zip"
+  function_name    = "${var.project_name}-${var.environment}-docusign-webhook-processor"
+  role            = aws_iam_role.lambda_docusign_role.arn
+  handler         = "index.handler"
+  runtime         = "python3.9"
+  timeout         = 60
+
+  layers = [aws_lambda_layer_version.docusign_layer.arn]
+
+  environment {
+    variables = local.docusign_webhook_environment
+  }
+
+  tags = {
+    Name        = "${var.project_name}-${var.environment}-docusign-webhook-processor"
+    Environment = var.environment
+  }
+}
+
+# Idempotencia de webhooks: un registro por evento de DocuSign
+resource "aws_dynamodb_table" "docusign_webhook_events" {
+  name         = "${var.project_name}-${var.environment}-docusign-webhook-events"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "event_id"
+
+  attribute {
+    name = "event_id"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "ttl"
+    enabled        = true
+  }
+
+  tags = {
+    Name        = "${var.project_name}-${var.environment}-docusign-webhook-events"
+    Environment = var.environment
+  }
+}
+
+# Cola FIFO: los eventos de un mismo envelope se aplican en orden
+resource "aws_sqs_queue" "docusign_webhook_events" {
+  name                       = "${var.project_name}-${var.environment}-docusign-webhook-events.fifo"
+  fifo_queue                 = true
+  visibility_timeout_seconds = 360  # 6x el timeout de la Lambda
+  message_retention_seconds  = 345600
+
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.docusign_webhook_events_dlq.arn
+    maxReceiveCount     = 5
+  })
+
+  tags = {
+    Name        = "${var.project_name}-${var.environment}-docusign-webhook-events"
+    Environment = var.environment
+  }
+}
+
+resource "aws_sqs_queue" "docusign_webhook_events_dlq" {
+  name                      = "${var.project_name}-${var.environment}-docusign-webhook-events-dlq.fifo"
+  fifo_queue                = true
+  message_retention_seconds = 1209600
+
+  tags = {
+    Name        = "${var.project_name}-${var.environment}-docusign-webhook-events-dlq"
+    Environment = var.environment
+  }
+}
+
+resource "aws_lambda_event_source_mapping" "docusign_webhook_events" {
+  event_source_arn        = aws_sqs_queue.docusign_webhook_events.arn
+  function_name           = aws_lambda_function.docusign_webhook_processor.arn
+  batch_size              = 10
+  function_response_types = ["ReportBatchItemFailures"]
+}
+
 # API Gateway para webhook de DocuSign
 resource "aws_api_gateway_resource" "docusign_webhook" {
   rest_api_id = data.aws_api_gateway_rest_api.main.id
@@ -222,7 +308,9 @@ resource "aws_iam_role_policy" "lambda_docusign_policy" {
         Effect = "Allow"
         Action = [
           "dynamodb:GetItem",
+          "dynamodb:BatchGetItem",
           "dynamodb:PutItem",
+          "dynamodb:BatchWriteItem",
           "dynamodb:UpdateItem",
           "dynamodb:Query",
           "dynamodb:Scan"
@@ -234,6 +322,24 @@ resource "aws_iam_role_policy" "lambda_docusign_policy" {
           "${aws_dynamodb_table.electronic_signatures.arn}/index/*"
         ]
       },
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:PutItem",
+          "dynamodb:DeleteItem"
+        ]
+        Resource = aws_dynamodb_table.docusign_webhook_events.arn
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "sqs:SendMessage",
+          "sqs:ReceiveMessage",
+          "sqs:DeleteMessage",
+          "sqs:GetQueueAttributes"
+        ]
+        Resource = aws_sqs_queue.docusign_webhook_events.arn
+      },
       {
         Effect = "Allow"
         Action = [
@@ -102,6 +102,64 @@ resource "aws_iam_role_policy" "lambda_contract_policy" {
           "${aws_dynamodb_table.electronic_signatures.arn}/index/*"
         ]
       },
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:GetItem",
+          "dynamodb:BatchGetItem",
+          "dynamodb:PutItem",
+          "dynamodb:UpdateItem",
+          "dynamodb:BatchWriteItem",
+          "dynamodb:Scan"
+        ]
+        Resource = aws_dynamodb_table.contract_stats.arn
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:BatchGetItem"
+        ]
+        Resource = aws_dynamodb_table.contracts.arn
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "sqs:SendMessage"
+        ]
+        Resource = aws_sqs_queue.contract_stats_stream_dlq.arn
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:GetItem",
+          "dynamodb:BatchGetItem",
+          "dynamodb:PutItem",
+          "dynamodb:UpdateItem",
+          "dynamodb:BatchWriteItem",
+          "dynamodb:Scan"
+        ]
+        Resource = aws_dynamodb_table.approver_workload.arn
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:Scan",
+          "dynamodb:PutItem",
+          "dynamodb:DeleteItem",
+          "dynamodb:BatchWriteItem"
+        ]
+        Resource = aws_dynamodb_table.manager_directory.arn
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:DescribeStream",
+          "dynamodb:GetRecords",
+          "dynamodb:GetShardIterator",
+          "dynamodb:ListStreams"
+        ]
+        Resource = aws_dynamodb_table.contracts.stream_arn
+      },
       {
         Effect = "Allow"
         Action = [
@@ -148,11 +206,19 @@ resource "aws_iam_role_policy" "lambda_contract_policy" {
         ]
         Resource = aws_sfn_state_machine.contract_approval_workflow.arn
       },
+      {
+        Effect = "Allow"
+        Action = [
+          "lambda:InvokeFunction"
+        ]
+        Resource = aws_lambda_function.docusign_signature_manager.arn
+      },
       {
         Effect = "Allow"
         Action = [
           "cognito-idp:AdminGetUser",
-          "cognito-idp:AdminListGroupsForUser"
+          "cognito-idp:AdminListGroupsForUser",
+          "cognito-idp:ListUsersInGroup"
         ]
         Resource = "arn:aws:cognito-idp:${data.aws_region.current.name}:${data.aws_caller_identity.current.account_id}:userpool/*"
       },
@@ -6,6 +6,10 @@ resource "aws_dynamodb_table" "contracts" {
   billing_mode   = "PAY_PER_REQUEST"
   hash_key       = "contract_id"
 
+  # Alimenta los contadores del dashboard (contract_stats_updater)
+  stream_enabled   = true
+  stream_view_type = "NEW_AND_OLD_IMAGES"
+
   attribute {
     name = "contract_id"
     type = "S"
@@ -31,11 +35,17 @@ resource "aws_dynamodb_table" "contracts" {
     type = "N"
   }
 
+  attribute {
+    name = "envelope_id"
+    type = "S"
+  }
+
   # GSI para consultar contratos por cliente
   global_secondary_index {
     name     = "CustomerIndex"
     hash_key = "customer_id"
     range_key = "created_at"
+    projection_type = "ALL"
   }
 
   # GSI para consultar por estado
@@ -43,6 +53,7 @@ resource "aws_dynamodb_table" "contracts" {
     name     = "StatusIndex"
     hash_key = "status"
     range_key = "created_at"
+    projection_type = "ALL"
   }
 
   # GSI para consultar por cantidad de vehículos
@@ -52,12 +63,37 @@ resource "aws_dynamodb_table" "contracts" {
     range_key = "created_at"
   }
 
+  # GSI disperso para webhooks de DocuSign: solo contratos con envelope
+  global_secondary_index {
+    name            = "EnvelopeIndex"
+    hash_key        = "envelope_id"
+    projection_type = "KEYS_ONLY"
+  }
+
   tags = {
     Name        = "${var.project_name}-${var.environment}-contracts"
     Environment = var.environment
   }
 }
 
+# Contadores por estado del dashboard: ámbito GLOBAL y CUSTOMER#<customer_id>,
+# más el aporte ya contado de cada contrato (CONTRACT#<contract_id>)
+resource "aws_dynamodb_table" "contract_stats" {
+  name         = "${var.project_name}-${var.environment}-contract-stats"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "scope"
+
+  attribute {
+    name = "scope"
+    type = "S"
+  }
+
+  tags = {
+    Name        = "${var.project_name}-${var.environment}-contract-stats"
+    Environment = var.environment
+  }
+}
+
 # DynamoDB Table para aprobaciones
 resource "aws_dynamodb_table" "contract_approvals" {
   name           = "${var.project_name}-${var.environment}-contract-approvals"
@@ -103,11 +139,13 @@ resource "aws_dynamodb_table" "contract_approvals" {
     range_key = "created_at"
   }
 
-  # GSI para consultar por estado
+  # GSI para consultar por estado (approver_id: reconstrucción de la carga de aprobadores)
   global_secondary_index {
-    name     = "StatusIndex"
-    hash_key = "status"
-    range_key = "created_at"
+    name               = "StatusIndex"
+    hash_key           = "status"
+    range_key          = "created_at"
+    projection_type    = "INCLUDE"
+    non_key_attributes = ["approver_id"]
   }
 
   tags = {
@@ -116,6 +154,23 @@ resource "aws_dynamodb_table" "contract_approvals" {
   }
 }
 
+# Aprobaciones pendientes por aprobador (se actualiza en la misma transacción que cada aprobación)
+resource "aws_dynamodb_table" "approver_workload" {
+  name         = "${var.project_name}-${var.environment}-approver-workload"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "approver_id"
+
+  attribute {
+    name = "approver_id"
+    type = "S"
+  }
+
+  tags = {
+    Name        = "${var.project_name}-${var.environment}-approver-workload"
+    Environment = var.environment
+  }
+}
+
 # DynamoDB Table para firmas electrónicas
 resource "aws_dynamodb_table" "electronic_signatures" {
   name           = "${var.project_name}-${var.environment}-electronic-signatures"
@@ -142,6 +197,11 @@ resource "aws_dynamodb_table" "electronic_signatures" {
     type = "N"
   }
 
+  attribute {
+    name = "envelope_id"
+    type = "S"
+  }
+
   # GSI para consultar firmas por contrato
   global_secondary_index {
     name     = "ContractIndex"
@@ -156,6 +216,14 @@ resource "aws_dynamodb_table" "electronic_signatures" {
     range_key = "signed_at"
   }
 
+  # GSI para webhooks de DocuSign: envelope → (signature_id, contract_id) en una consulta
+  global_secondary_index {
+    name               = "EnvelopeIndex"
+    hash_key           = "envelope_id"
+    projection_type    = "INCLUDE"
+    non_key_attributes = ["contract_id"]
+  }
+
   tags = {
     Name        = "${var.project_name}-${var.environment}-electronic-signatures"
     Environment = var.environment
@@ -314,12 +382,16 @@ resource "aws_lambda_function" "contract_validator" {
   role            = aws_iam_role.lambda_contract_role.arn
   handler         = "index.handler"
   runtime         = "python3.9"
-  timeout         = 30
+  timeout         = 900  # La re-evaluación de la cartera (action = "rescore") recorre la tabla
+  memory_size     = 1024
+
+  layers = var.numpy_layer_arn != "" ? [var.numpy_layer_arn] : []
 
   environment {
     variables = {
-      CONTRACTS_TABLE = aws_dynamodb_table.contracts.name
-      ENVIRONMENT     = var.environment
+      CONTRACTS_TABLE           = aws_dynamodb_table.contracts.name
+      RESCORE_WRITE_CONCURRENCY = "16"
+      ENVIRONMENT               = var.environment
     }
   }
 
@@ -342,6 +414,10 @@ resource "aws_lambda_function" "request_manager_approval" {
     variables = {
       CONTRACTS_TABLE          = aws_dynamodb_table.contracts.name
       APPROVALS_TABLE         = aws_dynamodb_table.contract_approvals.name
+      APPROVER_WORKLOAD_TABLE = aws_dynamodb_table.approver_workload.name
+      MAX_PENDING_APPROVALS  = "5"
+      MANAGER_DIRECTORY_TABLE = aws_dynamodb_table.manager_directory.name
+      MANAGER_DIRECTORY_TTL_SECONDS = "300"
       SNS_TOPIC_ARN          = aws_sns_topic.manager_approval_requests.arn
       APPROVAL_URL_BASE      = "https://${var.project_name}-${var.environment}.com/approve"
       ENVIRONMENT            = var.environment
@@ -405,7 +481,7 @@ resource "aws_lambda_function" "process_approved_contract" {
   role            = aws_iam_role.lambda_contract_role.arn
   handler         = "index.handler"
   runtime         = "python3.9"
-  timeout         = 60
+  timeout         = 900  # Modo masivo: olas de contratos aprobados a fin de mes
 
   environment {
     variables = {
@@ -480,8 +556,10 @@ resource "aws_lambda_function" "contract_management_api" {
     variables = {
       CONTRACTS_TABLE           = aws_dynamodb_table.contracts.name
       APPROVALS_TABLE          = aws_dynamodb_table.contract_approvals.name
+      APPROVER_WORKLOAD_TABLE  = aws_dynamodb_table.approver_workload.name
       SIGNATURES_TABLE         = aws_dynamodb_table.electronic_signatures.name
       STEP_FUNCTIONS_ARN       = aws_sfn_state_machine.contract_approval_workflow.arn
+      CONTRACT_STATS_TABLE     = aws_dynamodb_table.contract_stats.name
       ENVIRONMENT              = var.environment
     }
   }
@@ -492,6 +570,83 @@ resource "aws_lambda_function" "contract_management_api" {
   }
 }
 
+# Contadores del dashboard desde el stream de contratos
+resource "aws_lambda_function" "contract_stats_updater" {
+  filename         = "contract_stats_updater.zip"
+  function_name    = "${var.project_name}-${var.environment}-contract-stats-updater"
+  role            = aws_iam_role.lambda_contract_role.arn
+  handler         = "index.handler"
+  runtime         = "python3.9"
+  timeout         = 300  # La reconstrucción completa recorre la tabla
+
+  environment {
+    variables = {
+      CONTRACTS_TABLE      = aws_dynamodb_table.contracts.name
+      CONTRACT_STATS_TABLE = aws_dynamodb_table.contract_stats.name
+      ENVIRONMENT          = var.environment
+    }
+  }
+
+  tags = {
+    Name        = "${var.project_name}-${var.environment}-contract-stats-updater"
+    Environment = var.environment
+  }
+}
+
+resource "aws_lambda_event_source_mapping" "contract_stats_stream" {
+  event_source_arn               = aws_dynamodb_table.contracts.stream_arn
+  function_name                  = aws_lambda_function.contract_stats_updater.arn
+  starting_position              = "TRIM_HORIZON"
+  batch_size                     = 100
+  maximum_retry_attempts         = 5
+  bisect_batch_on_function_error = true  # Aísla el registro que falla
+
+  destination_config {
+    on_failure {
+      destination_arn = aws_sqs_queue.contract_stats_stream_dlq.arn
+    }
+  }
+}
+
+# Lotes del stream descartados tras los reintentos (la reconstrucción diaria los corrige)
+resource "aws_sqs_queue" "contract_stats_stream_dlq" {
+  name                      = "${var.project_name}-${var.environment}-contract-stats-stream-dlq"
+  message_retention_seconds = 1209600
+
+  tags = {
+    Name        = "${var.project_name}-${var.environment}-contract-stats-stream-dlq"
+    Environment = var.environment
+  }
+}
+
+# Reconstrucción diaria de los contadores desde la tabla de contratos
+resource "aws_cloudwatch_event_rule" "contract_stats_rebuild" {
+  name        = "${var.project_name}-${var.environment}-contract-stats-rebuild"
+  description = "Recalcular los contadores del dashboard de contratos"
+
+  schedule_expression = "cron(0 6 * * ? *)"  # Diario, 06:00 UTC
+
+  tags = {
+    Name        = "${var.project_name}-${var.environment}-contract-stats-rebuild"
+    Environment = var.environment
+  }
+}
+
+resource "aws_cloudwatch_event_target" "contract_stats_rebuild_target" {
+  rule      = aws_cloudwatch_event_rule.contract_stats_rebuild.name
+  target_id = "ContractStatsRebuildLambdaTarget"
+  arn       = aws_lambda_function.contract_stats_updater.arn
+  input     = jsonencode({ action = "rebuild" })
+}
+
+resource "aws_lambda_permission" "allow_eventbridge_contract_stats_rebuild" {
+  statement_id  = "AllowExecutionFromEventBridge"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.contract_stats_updater.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.contract_stats_rebuild.arn
+}
+
 # SNS Topics para notificaciones
 resource "aws_sns_topic" "manager_approval_requests" {
   name = "${var.project_name}-${var.environment}-manager-approval-requests"
@@ -622,3 +777,70 @@ resource "aws_lambda_permission" "allow_eventbridge_approval_timeout" {
   principal     = "events.amazonaws.com"
   source_arn    = aws_cloudwatch_event_rule.approval_timeout.arn
 }
+
+# Directorio de managers (grupo FleetManagers) sincronizado desde Cognito
+resource "aws_dynamodb_table" "manager_directory" {
+  name         = "${var.project_name}-${var.environment}-manager-directory"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "user_id"
+
+  attribute {
+    name = "user_id"
+    type = "S"
+  }
+
+  tags = {
+    Name        = "${var.project_name}-${var.environment}-manager-directory"
+    Environment = var.environment
+  }
+}
+
+resource "aws_lambda_function" "manager_directory_sync" {
+  filename         = "manager_directory_sync.zip"
+  function_name    = "${var.project_name}-${var.environment}-manager-directory-sync"
+  role            = aws_iam_role.lambda_contract_role.arn
+  handler         = "index.handler"
+  runtime         = "python3.9"
+  timeout         = 120
+
+  environment {
+    variables = {
+      USER_POOL_ID            = var.user_pool_id
+      MANAGER_DIRECTORY_TABLE = aws_dynamodb_table.manager_directory.name
+      MANAGERS_GROUP          = "FleetManagers"
+      DEFAULT_APPROVAL_LIMIT  = "500000"
+      ENVIRONMENT             = var.environment
+    }
+  }
+
+  tags = {
+    Name        = "${var.project_name}-${var.environment}-manager-directory-sync"
+    Environment = var.environment
+  }
+}
+
+resource "aws_cloudwatch_event_rule" "manager_directory_sync" {
+  name        = "${var.project_name}-${var.environment}-manager-directory-sync"
+  description = "Sincronizar el grupo FleetManagers con el directorio de managers"
+
+  schedule_expression = "rate(15 minutes)"
+
+  tags = {
+    Name        = "${var.project_name}-${var.environment}-manager-directory-sync"
+    Environment = var.environment
+  }
+}
+
+resource "aws_cloudwatch_event_target" "manager_directory_sync_target" {
+  rule      = aws_cloudwatch_event_rule.manager_directory_sync.name
+  target_id = "ManagerDirectorySyncLambdaTarget"
+  arn       = aws_lambda_function.manager_directory_sync.arn
+}
+
+resource "aws_lambda_permission" "allow_eventbridge_manager_directory_sync" {
+  statement_id  = "AllowExecutionFromEventBridge"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.manager_directory_sync.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.manager_directory_sync.arn
+}
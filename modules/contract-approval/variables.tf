@@ -69,3 +69,9 @@ variable "notification_email" {
   type        = string
   default     = "notifications@vehicletracking.com"
 }
+
+variable "numpy_layer_arn" {
+  description = "ARN de un layer con NumPy para la re-evaluación de riesgo vectorizada (vacío: evaluación contrato por contrato)"
+  type        = string
+  default     = ""
+}
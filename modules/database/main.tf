@@ -226,6 +226,23 @@ resource "aws_dynamodb_table" "trips" {
   }
 }
 
+# DynamoDB Table para checkpoint de viajes abiertos (segmentación en streaming)
+resource "aws_dynamodb_table" "trip_state" {
+  name           = "${var.project_name}-${var.environment}-trip-state"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "vehicle_id"
+
+  attribute {
+    name = "vehicle_id"
+    type = "S"
+  }
+
+  tags = {
+    Name        = "${var.project_name}-${var.environment}-trip-state"
+    Environment = var.environment
+  }
+}
+
 # DynamoDB Table para alertas y notificaciones
 resource "aws_dynamodb_table" "alerts" {
   name           = "${var.project_name}-${var.environment}-alerts"
@@ -293,6 +310,46 @@ resource "aws_dynamodb_table" "alerts" {
   }
 }
 
+# DynamoDB Table para geocercas (depósitos, zonas restringidas, sitios de clientes)
+resource "aws_dynamodb_table" "geofences" {
+  name           = "${var.project_name}-${var.environment}-geofences"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "tenant_id"
+  range_key      = "fence_id"
+
+  attribute {
+    name = "tenant_id"
+    type = "S"
+  }
+
+  attribute {
+    name = "fence_id"
+    type = "S"
+  }
+
+  tags = {
+    Name        = "${var.project_name}-${var.environment}-geofences"
+    Environment = var.environment
+  }
+}
+
+# DynamoDB Table para pertenencia actual de cada vehículo a geocercas
+resource "aws_dynamodb_table" "geofence_state" {
+  name           = "${var.project_name}-${var.environment}-geofence-state"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "vehicle_id"
+
+  attribute {
+    name = "vehicle_id"
+    type = "S"
+  }
+
+  tags = {
+    Name        = "${var.project_name}-${var.environment}-geofence-state"
+    Environment = var.environment
+  }
+}
+
 # DynamoDB Table para configuración de notificaciones
 resource "aws_dynamodb_table" "notification_preferences" {
   name           = "${var.project_name}-${var.environment}-notification-preferences"
@@ -6,8 +6,13 @@ output "dynamodb_tables" {
     drivers                 = aws_dynamodb_table.drivers.name
     routes                  = aws_dynamodb_table.routes.name
     trips                   = aws_dynamodb_table.trips.name
+    trip_state              = aws_dynamodb_table.trip_state.name
     alerts                  = aws_dynamodb_table.alerts.name
     notification_preferences = aws_dynamodb_table.notification_preferences.name
+    vehicle_latest          = aws_dynamodb_table.vehicle_latest.name
+    vehicle_geo_index       = aws_dynamodb_table.vehicle_geo_index.name
+    geofences               = aws_dynamodb_table.geofences.name
+    geofence_state          = aws_dynamodb_table.geofence_state.name
   }
 }
 
@@ -19,8 +24,13 @@ output "dynamodb_table_arns" {
     drivers                 = aws_dynamodb_table.drivers.arn
     routes                  = aws_dynamodb_table.routes.arn
     trips                   = aws_dynamodb_table.trips.arn
+    trip_state              = aws_dynamodb_table.trip_state.arn
     alerts                  = aws_dynamodb_table.alerts.arn
     notification_preferences = aws_dynamodb_table.notification_preferences.arn
+    vehicle_latest          = aws_dynamodb_table.vehicle_latest.arn
+    vehicle_geo_index       = aws_dynamodb_table.vehicle_geo_index.arn
+    geofences               = aws_dynamodb_table.geofences.arn
+    geofence_state          = aws_dynamodb_table.geofence_state.arn
   }
 }
 
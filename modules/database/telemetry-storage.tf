@@ -36,6 +36,58 @@ resource "aws_dynamodb_table" "telemetry_hot" {
   }
 }
 
+# Latest Vehicle State - one item per vehicle, upserted by the telemetry processor
+# with a conditional write so only newer timestamps win
+resource "aws_dynamodb_table" "vehicle_latest" {
+  name           = "${var.project_name}-${var.environment}-vehicle-latest"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "vehicle_id"
+
+  attribute {
+    name = "vehicle_id"
+    type = "S"
+  }
+
+  tags = {
+    Name        = "Vehicle Latest State"
+    Environment = var.environment
+    DataType    = "IoT-Sensors"
+    Retention   = "latest-only"
+  }
+}
+
+# Vehicle Geo Index - latest position bucketed by geohash cell (precision 5)
+# so radius / bounding-box queries read only the covering cells
+resource "aws_dynamodb_table" "vehicle_geo_index" {
+  name           = "${var.project_name}-${var.environment}-vehicle-geo-index"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "cell"
+  range_key      = "vehicle_id"
+
+  # Entries of vehicles that stop reporting expire (GEO_INDEX_TTL_HOURS, 48h by default)
+  ttl {
+    attribute_name = "ttl"
+    enabled        = true
+  }
+
+  attribute {
+    name = "cell"
+    type = "S"
+  }
+
+  attribute {
+    name = "vehicle_id"
+    type = "S"
+  }
+
+  tags = {
+    Name        = "Vehicle Geo Index"
+    Environment = var.environment
+    DataType    = "IoT-Sensors"
+    Retention   = "latest-only"
+  }
+}
+
 # Telemetry Warm Storage - DynamoDB for recent analysis
 resource "aws_dynamodb_table" "telemetry_warm" {
   name           = "${var.project_name}-${var.environment}-telemetry-warm"
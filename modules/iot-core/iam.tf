@@ -158,6 +158,13 @@ resource "aws_iam_role_policy" "lambda_panic_policy" {
           "dynamodb:GetItem"
         ]
         Resource = aws_dynamodb_table.panic_events.arn
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:Query"
+        ]
+        Resource = "arn:aws:dynamodb:${data.aws_region.current.name}:${var.account_id}:table/${var.project_name}-${var.environment}-vehicle-geo-index"
       }
     ]
   })
@@ -198,7 +205,8 @@ resource "aws_iam_role_policy" "lambda_video_policy" {
         Action = [
           "s3:GetObject",
           "s3:PutObject",
-          "s3:DeleteObject"
+          "s3:DeleteObject",
+          "s3:AbortMultipartUpload"
         ]
         Resource = "${aws_s3_bucket.video_storage.arn}/*"
       },
@@ -210,6 +218,84 @@ resource "aws_iam_role_policy" "lambda_video_policy" {
           "rekognition:RecognizeCelebrities"
         ]
         Resource = "*"
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "sqs:ReceiveMessage",
+          "sqs:DeleteMessage",
+          "sqs:GetQueueAttributes"
+        ]
+        Resource = [for queue in aws_sqs_queue.video_lane : queue.arn]
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "cloudwatch:PutMetricData"
+        ]
+        Resource = "*"
+      }
+    ]
+  })
+}
+
+# Role para Lambda de subidas multipart de video
+resource "aws_iam_role" "lambda_video_upload_role" {
+  name = "${var.project_name}-${var.environment}-lambda-video-upload-role"
+
+  assume_role_policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Action = "sts:AssumeRole"
+        Effect = "Allow"
+        Principal = {
+          Service = "lambda.amazonaws.com"
+        }
+      }
+    ]
+  })
+}
+
+resource "aws_iam_role_policy_attachment" "lambda_video_upload_basic" {
+  policy_arn = "arn:aws:iam::aws:policy/service-role/AWSLambdaBasicExecutionRole"
+  role       = aws_iam_role.lambda_video_upload_role.name
+}
+
+resource "aws_iam_role_policy" "lambda_video_upload_policy" {
+  name = "${var.project_name}-${var.environment}-lambda-video-upload-policy"
+  role = aws_iam_role.lambda_video_upload_role.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        # Las URLs prefirmadas heredan estos permisos (s3:PutObject cubre UploadPart)
+        Effect = "Allow"
+        Action = [
+          "s3:PutObject",
+          "s3:ListMultipartUploadParts",
+          "s3:AbortMultipartUpload"
+        ]
+        Resource = [
+          "${aws_s3_bucket.video_storage.arn}/emergency/*",
+          "${aws_s3_bucket.video_storage.arn}/events/*",
+          "${aws_s3_bucket.video_storage.arn}/continuous/*"
+        ]
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "sqs:SendMessage"
+        ]
+        Resource = [for queue in aws_sqs_queue.video_lane : queue.arn]
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "iot:Publish"
+        ]
+        Resource = "arn:aws:iot:${data.aws_region.current.name}:${var.account_id}:topic/vehicles/*/video/upload/response"
       }
     ]
   })
@@ -224,10 +310,46 @@ resource "aws_lambda_permission" "allow_iot_panic" {
   source_arn    = aws_iot_topic_rule.panic_button_rule.arn
 }
 
-resource "aws_lambda_permission" "allow_iot_video" {
-  statement_id  = "AllowExecutionFromIoTVideo"
+# Role para que IoT encole videos en las colas de carril
+resource "aws_iam_role" "iot_sqs_role" {
+  name = "${var.project_name}-${var.environment}-iot-sqs-role"
+
+  assume_role_policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Action = "sts:AssumeRole"
+        Effect = "Allow"
+        Principal = {
+          Service = "iot.amazonaws.com"
+        }
+      }
+    ]
+  })
+}
+
+resource "aws_iam_role_policy" "iot_sqs_policy" {
+  name = "${var.project_name}-${var.environment}-iot-sqs-policy"
+  role = aws_iam_role.iot_sqs_role.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect = "Allow"
+        Action = [
+          "sqs:SendMessage"
+        ]
+        Resource = [for queue in aws_sqs_queue.video_lane : queue.arn]
+      }
+    ]
+  })
+}
+
+resource "aws_lambda_permission" "allow_iot_video_upload" {
+  statement_id  = "AllowExecutionFromIoTVideoUpload"
   action        = "lambda:InvokeFunction"
-  function_name = aws_lambda_function.video_processor.function_name
+  function_name = aws_lambda_function.video_upload_manager.function_name
   principal     = "iot.amazonaws.com"
-  source_arn    = aws_iot_topic_rule.video_data_rule.arn
+  source_arn    = aws_iot_topic_rule.video_upload_rule.arn
 }
@@ -22,6 +22,7 @@ resource "aws_iot_policy" "vehicle_policy" {
         Resource = [
           "arn:aws:iot:${data.aws_region.current.name}:${var.account_id}:topic/vehicles/+/telemetry",
           "arn:aws:iot:${data.aws_region.current.name}:${var.account_id}:topic/vehicles/+/video",
+          "arn:aws:iot:${data.aws_region.current.name}:${var.account_id}:topic/vehicles/+/video/upload",
           "arn:aws:iot:${data.aws_region.current.name}:${var.account_id}:topic/vehicles/+/panic",
           "arn:aws:iot:${data.aws_region.current.name}:${var.account_id}:topic/vehicles/+/diagnostics"
         ]
@@ -34,7 +35,9 @@ resource "aws_iot_policy" "vehicle_policy" {
         ]
         Resource = [
           "arn:aws:iot:${data.aws_region.current.name}:${var.account_id}:topicfilter/vehicles/+/commands",
-          "arn:aws:iot:${data.aws_region.current.name}:${var.account_id}:topic/vehicles/+/commands"
+          "arn:aws:iot:${data.aws_region.current.name}:${var.account_id}:topic/vehicles/+/commands",
+          "arn:aws:iot:${data.aws_region.current.name}:${var.account_id}:topicfilter/vehicles/+/video/upload/response",
+          "arn:aws:iot:${data.aws_region.current.name}:${var.account_id}:topic/vehicles/+/video/upload/response"
         ]
       }
     ]
@@ -100,17 +103,34 @@ resource "aws_iot_topic_rule" "panic_button_rule" {
   }
 }
 
-# Rule para datos de video
+# Rules para datos de video: cada tipo entra a la cola de su carril de prioridad
 resource "aws_iot_topic_rule" "video_data_rule" {
-  name        = "${replace(var.project_name, "-", "_")}_${replace(var.environment, "-", "_")}_video_rule"
-  description = "Procesa metadatos y referencias de video"
+  for_each = local.video_lanes
+
+  name        = "${replace(var.project_name, "-", "_")}_${replace(var.environment, "-", "_")}_video_${lower(each.key)}_rule"
+  description = "Encola videos ${each.key} en su carril de procesamiento"
+  enabled     = true
+  sql         = "SELECT *, timestamp() as aws_timestamp FROM 'vehicles/+/video' WHERE ${each.value.condition}"
+  sql_version = "2016-03-23"
+
+  sqs {
+    role_arn   = aws_iam_role.iot_sqs_role.arn
+    queue_url  = aws_sqs_queue.video_lane[each.key].url
+    use_base64 = false
+  }
+}
+
+# Rule para subidas multipart prefirmadas de video (start/resume/complete/abort)
+resource "aws_iot_topic_rule" "video_upload_rule" {
+  name        = "${replace(var.project_name, "-", "_")}_${replace(var.environment, "-", "_")}_video_upload_rule"
+  description = "Gestiona subidas de video directas a S3 desde los vehículos"
   enabled     = true
-  sql         = "SELECT *, timestamp() as aws_timestamp FROM 'vehicles/+/video'"
+  # vehicle_id se toma del topic para que un dispositivo no opere sobre otro vehículo
+  sql         = "SELECT *, topic(2) as vehicle_id FROM 'vehicles/+/video/upload'"
   sql_version = "2016-03-23"
 
-  # Procesar con Lambda para análisis de video
   lambda {
-    function_arn = aws_lambda_function.video_processor.arn
+    function_arn = aws_lambda_function.video_upload_manager.arn
   }
 }
 
@@ -205,8 +225,12 @@ resource "aws_lambda_function" "panic_processor" {
 
   environment {
     variables = {
-      SNS_TOPIC_ARN = aws_sns_topic.panic_alerts.arn
-      ENVIRONMENT   = var.environment
+      SNS_TOPIC_ARN          = aws_sns_topic.panic_alerts.arn
+      PANIC_EVENTS_TABLE     = aws_dynamodb_table.panic_events.name
+      GEO_INDEX_TABLE        = "${var.project_name}-${var.environment}-vehicle-geo-index"
+      PANIC_NEARBY_RADIUS_M  = "5000"
+      PANIC_NEARBY_MAX_AGE_S = "900"  # Solo vehículos que reportaron en los últimos 15 min
+      ENVIRONMENT            = var.environment
     }
   }
 
@@ -216,7 +240,98 @@ resource "aws_lambda_function" "panic_processor" {
   }
 }
 
-# Lambda para procesamiento de video
+# Carriles de prioridad de video: PANIC tiene su propia Lambda con concurrencia
+# reservada; EVENT y CONTINUOUS comparten otra, con CONTINUOUS limitado para no
+# desplazar a EVENT. Un pico de video continuo nunca retrasa un video de pánico.
+locals {
+  video_lanes = {
+    PANIC = {
+      condition       = "video_type = 'PANIC'"
+      batch_size      = 1
+      max_concurrency = 10
+    }
+    EVENT = {
+      condition       = "video_type = 'EVENT'"
+      batch_size      = 1
+      max_concurrency = 15
+    }
+    CONTINUOUS = {
+      condition       = "isUndefined(video_type) OR (video_type <> 'PANIC' AND video_type <> 'EVENT')"
+      batch_size      = 5
+      max_concurrency = 5
+    }
+  }
+
+  video_processor_environment = {
+    S3_BUCKET                           = aws_s3_bucket.video_storage.bucket
+    ENVIRONMENT                         = var.environment
+    MULTIPART_THRESHOLD                 = "8388608"
+    MULTIPART_PART_SIZE                 = "8388608"
+    EMERGENCY_UPLOAD_CONCURRENCY        = "16"
+    EVENT_UPLOAD_CONCURRENCY            = "8"
+    CONTINUOUS_UPLOAD_CONCURRENCY       = "4"
+    FFMPEG_PATH                         = "/opt/bin/ffmpeg"
+    KEYFRAME_VIDEO_TYPES                = "PANIC,EVENT"
+    KEYFRAME_MODE                       = "keyframes"
+    KEYFRAME_MAX_FRAMES                 = "10"
+    KEYFRAME_MIN_INTERVAL_SECONDS       = "2"
+    KEYFRAME_SCENE_THRESHOLD            = "0.3"
+    PANIC_KEYFRAME_MODE                 = "scene"
+    PANIC_KEYFRAME_MAX_FRAMES           = "20"
+    PANIC_KEYFRAME_MIN_INTERVAL_SECONDS = "1"
+    PANIC_SLA_SECONDS                   = "10"
+    EVENT_SLA_SECONDS                   = "120"
+    CONTINUOUS_SLA_SECONDS              = "1800"
+    VIDEO_METRICS_NAMESPACE             = "VehicleTracking/VideoLanes"
+  }
+}
+
+# Colas SQS por carril
+resource "aws_sqs_queue" "video_lane" {
+  for_each = local.video_lanes
+
+  name                       = "${var.project_name}-${var.environment}-video-${lower(each.key)}"
+  visibility_timeout_seconds = 1800  # 6x el timeout de la Lambda
+  message_retention_seconds  = 345600
+  receive_wait_time_seconds  = 20
+
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.video_lane_dlq.arn
+    maxReceiveCount     = 3
+  })
+
+  tags = {
+    Name        = "${var.project_name}-${var.environment}-video-${lower(each.key)}"
+    Environment = var.environment
+    Lane        = each.key
+  }
+}
+
+resource "aws_sqs_queue" "video_lane_dlq" {
+  name                      = "${var.project_name}-${var.environment}-video-lanes-dlq"
+  message_retention_seconds = 1209600
+
+  tags = {
+    Name        = "${var.project_name}-${var.environment}-video-lanes-dlq"
+    Environment = var.environment
+  }
+}
+
+# Carriles EVENT y CONTINUOUS → Lambda estándar; PANIC → Lambda dedicada
+resource "aws_lambda_event_source_mapping" "video_lane" {
+  for_each = local.video_lanes
+
+  event_source_arn        = aws_sqs_queue.video_lane[each.key].arn
+  function_name           = each.key == "PANIC" ? aws_lambda_function.video_processor_panic.arn : aws_lambda_function.video_processor.arn
+  batch_size              = each.value.batch_size
+  function_response_types = ["ReportBatchItemFailures"]
+
+  scaling_config {
+    maximum_concurrency = each.value.max_concurrency
+  }
+}
+
+# Lambda para procesamiento de video (carriles EVENT y CONTINUOUS)
 resource "aws_lambda_function" "video_processor" {
   filename         = "video_processor.zip"
   function_name    = "${var.project_name}-${var.environment}-video-processor"
@@ -224,16 +339,110 @@ resource "aws_lambda_function" "video_processor" {
   handler         = "index.handler"
   runtime         = "python3.9"
   timeout         = 300
+  memory_size     = 1024
+
+  # Tope de la Lambda compartida: el resto de la cuenta queda para otros carriles
+  reserved_concurrent_executions = 20
+
+  # ffmpeg para extraer keyframes de los clips
+  layers = [aws_lambda_layer_version.ffmpeg_layer.arn]
+
+  ephemeral_storage {
+    size = 2048  # Clip descargado + frames en /tmp
+  }
+
+  environment {
+    variables = local.video_processor_environment
+  }
+
+  tags = {
+    Name        = "${var.project_name}-${var.environment}-video-processor"
+    Environment = var.environment
+  }
+}
+
+# Lambda dedicada al carril PANIC (mismo código, concurrencia reservada propia)
+resource "aws_lambda_function" "video_processor_panic" {
+  filename         = "video_processor.zip"
+  function_name    = "${var.project_name}-${var.environment}-video-processor-panic"
+  role            = aws_iam_role.lambda_video_role.arn
+  handler         = "index.handler"
+  runtime         = "python3.9"
+  timeout         = 300
+  memory_size     = 2048  # Más CPU para ffmpeg y subidas concurrentes
+
+  # Capacidad garantizada: nunca compite con el video de archivo
+  reserved_concurrent_executions = 10
+
+  layers = [aws_lambda_layer_version.ffmpeg_layer.arn]
+
+  ephemeral_storage {
+    size = 2048
+  }
+
+  environment {
+    variables = local.video_processor_environment
+  }
+
+  tags = {
+    Name        = "${var.project_name}-${var.environment}-video-processor-panic"
+    Environment = var.environment
+  }
+}
+
+# Alarmas de SLA por carril (latencia recepción → análisis)
+resource "aws_cloudwatch_metric_alarm" "video_lane_sla" {
+  for_each = local.video_lanes
+
+  alarm_name          = "${var.project_name}-${var.environment}-video-${lower(each.key)}-sla"
+  comparison_operator = "GreaterThanThreshold"
+  evaluation_periods  = each.key == "PANIC" ? 1 : 3
+  metric_name         = "SLABreaches"
+  namespace           = local.video_processor_environment.VIDEO_METRICS_NAMESPACE
+  period              = 300
+  statistic           = "Sum"
+  threshold           = 0
+  alarm_description   = "Videos ${each.key} que superaron el objetivo de latencia del carril"
+  treat_missing_data  = "notBreaching"
+
+  dimensions = {
+    Lane = each.key
+  }
+}
+
+# Lambda Layer con ffmpeg estático (bin/ffmpeg → /opt/bin/ffmpeg)
+resource "aws_lambda_layer_version" "ffmpeg_layer" {
+  filename            = "ffmpeg_layer.zip"
+  layer_name          = "${var.project_name}-${var.environment}-ffmpeg-layer"
+  description         = "ffmpeg para extracción de keyframes de video"
+  compatible_runtimes = ["python3.9"]
+}
+
+# Lambda para subidas multipart prefirmadas (el dispositivo sube directo a S3)
+resource "aws_lambda_function" "video_upload_manager" {
+  filename         = "video_upload_manager.zip"
+  function_name    = "${var.project_name}-${var.environment}-video-upload-manager"
+  role            = aws_iam_role.lambda_video_upload_role.arn
+  handler         = "index.handler"
+  runtime         = "python3.9"
+  timeout         = 30
 
   environment {
     variables = {
-      S3_BUCKET     = aws_s3_bucket.video_storage.bucket
-      ENVIRONMENT   = var.environment
+      S3_BUCKET                  = aws_s3_bucket.video_storage.bucket
+      VIDEO_PANIC_QUEUE_URL      = aws_sqs_queue.video_lane["PANIC"].url
+      VIDEO_EVENT_QUEUE_URL      = aws_sqs_queue.video_lane["EVENT"].url
+      VIDEO_CONTINUOUS_QUEUE_URL = aws_sqs_queue.video_lane["CONTINUOUS"].url
+      IOT_DATA_ENDPOINT          = "https://${data.aws_iot_endpoint.data.endpoint_address}"
+      UPLOAD_PART_SIZE           = "5242880"
+      UPLOAD_URL_EXPIRES_SECONDS = "3600"
+      UPLOAD_URLS_PER_RESPONSE   = "50"
+      ENVIRONMENT                = var.environment
     }
   }
 
   tags = {
-    Name        = "${var.project_name}-${var.environment}-video-processor"
+    Name        = "${var.project_name}-${var.environment}-video-upload-manager"
     Environment = var.environment
   }
 }
@@ -272,5 +481,27 @@ resource "aws_s3_bucket_server_side_encryption_configuration" "video_storage_enc
   }
 }
 
+# Liberar partes de subidas multipart abandonadas por cortes de conexión
+resource "aws_s3_bucket_lifecycle_configuration" "video_storage_lifecycle" {
+  bucket = aws_s3_bucket.video_storage.id
+
+  rule {
+    id     = "abort_incomplete_uploads"
+    status = "Enabled"
+
+    filter {
+      prefix = ""
+    }
+
+    abort_incomplete_multipart_upload {
+      days_after_initiation = 7
+    }
+  }
+}
+
 # Data sources
 data "aws_region" "current" {}
+
+data "aws_iot_endpoint" "data" {
+  endpoint_type = "iot:Data-ATS"
+}
@@ -28,6 +28,16 @@ output "video_storage_bucket" {
   value       = aws_s3_bucket.video_storage.bucket
 }
 
+output "video_upload_manager_function_name" {
+  description = "Nombre de la Lambda de subidas multipart prefirmadas de video"
+  value       = aws_lambda_function.video_upload_manager.function_name
+}
+
+output "video_lane_queue_urls" {
+  description = "URLs de las colas SQS por carril de prioridad de video"
+  value       = { for lane, queue in aws_sqs_queue.video_lane : lane => queue.url }
+}
+
 output "vehicle_status_table_name" {
   description = "Nombre de la tabla DynamoDB para estado de vehículos"
   value       = aws_dynamodb_table.vehicle_status.name
@@ -12,8 +12,15 @@ resource "aws_lambda_function" "telemetry_processor" {
 
   environment {
     variables = {
-      ENVIRONMENT = var.environment
-      PROJECT_NAME = var.project_name
+      ENVIRONMENT          = var.environment
+      PROJECT_NAME         = var.project_name
+      LATEST_STATE_TABLE   = "${var.project_name}-${var.environment}-vehicle-latest"
+      GEO_INDEX_TABLE      = "${var.project_name}-${var.environment}-vehicle-geo-index"
+      VEHICLES_TABLE       = "${var.project_name}-${var.environment}-vehicles"
+      GEOFENCES_TABLE      = "${var.project_name}-${var.environment}-geofences"
+      GEOFENCE_STATE_TABLE = "${var.project_name}-${var.environment}-geofence-state"
+      TRIPS_TABLE          = "${var.project_name}-${var.environment}-trips"
+      TRIP_STATE_TABLE     = "${var.project_name}-${var.environment}-trip-state"
     }
   }
 
@@ -150,6 +157,47 @@ resource "aws_iam_role_policy" "lambda_policy" {
           "sns:Publish"
         ]
         Resource = "*"
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:GetItem",
+          "dynamodb:PutItem",
+          "dynamodb:UpdateItem",
+          "dynamodb:DeleteItem"
+        ]
+        Resource = [
+          "arn:aws:dynamodb:${var.aws_region}:*:table/${var.project_name}-${var.environment}-vehicle-latest",
+          "arn:aws:dynamodb:${var.aws_region}:*:table/${var.project_name}-${var.environment}-vehicle-geo-index"
+        ]
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:GetItem",
+          "dynamodb:BatchGetItem",
+          "dynamodb:Query",
+          "dynamodb:PutItem"
+        ]
+        Resource = [
+          "arn:aws:dynamodb:${var.aws_region}:*:table/${var.project_name}-${var.environment}-vehicles",
+          "arn:aws:dynamodb:${var.aws_region}:*:table/${var.project_name}-${var.environment}-geofences",
+          "arn:aws:dynamodb:${var.aws_region}:*:table/${var.project_name}-${var.environment}-geofence-state"
+        ]
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:GetItem",
+          "dynamodb:BatchGetItem",
+          "dynamodb:PutItem",
+          "dynamodb:DeleteItem",
+          "dynamodb:BatchWriteItem"
+        ]
+        Resource = [
+          "arn:aws:dynamodb:${var.aws_region}:*:table/${var.project_name}-${var.environment}-trips",
+          "arn:aws:dynamodb:${var.aws_region}:*:table/${var.project_name}-${var.environment}-trip-state"
+        ]
       }
     ]
   })